@@ -22,6 +22,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import atexit
 import os
 import re
 import threading
@@ -34,7 +35,9 @@ from werkzeug import wrappers
 
 from tensorboard.backend import http_util
 from tensorboard.backend.event_processing import event_accumulator
+from tensorboard.backend.event_processing import event_file_loader
 from tensorboard.backend.event_processing import event_multiplexer
+from tensorboard.backend.event_processing import reload_scheduler
 from tensorboard.plugins import base_plugin
 from tensorboard.plugins.core import core_plugin
 
@@ -62,7 +65,21 @@ def standard_tensorboard_wsgi(
     logdir,
     purge_orphaned_data,
     reload_interval,
-    plugins):
+    plugins,
+    max_reload_threads=1,
+    record_reader=event_file_loader.PYWRAP_RECORD_READER,
+    payload_views=False,
+    decode_processes=0,
+    max_payload_bytes_per_tag=0,
+    max_payload_bytes_per_run=0,
+    max_memory_bytes=0,
+    max_resident_runs=0,
+    stale_run_secs=0,
+    stale_run_reload_secs=event_multiplexer.DEFAULT_STALE_RUN_RELOAD_SECS,
+    max_reload_interval=0,
+    discovery_interval=0,
+    watch_changes=False,
+    response_cache_bytes=http_util.DEFAULT_RESPONSE_CACHE_BYTES):
   """Construct a TensorBoardWSGIApp with standard plugins and multiplexer.
 
   Args:
@@ -71,22 +88,69 @@ def standard_tensorboard_wsgi(
     reload_interval: The interval at which the backend reloads more data in
         seconds.
     plugins: A list of constructor functions for TBPlugin subclasses.
+    max_reload_threads: The number of runs to reload concurrently.
+    record_reader: One of `event_file_loader.RECORD_READERS`, selecting how
+        event files are read.
+    payload_views: Whether image and audio payloads are kept as views into
+        the records they were read from.
+    decode_processes: The number of worker processes to decode event files in,
+        or 0 to decode them in the server process.
+    max_payload_bytes_per_tag: The maximum number of bytes of images, audio or
+        tensors to keep per tag, or 0 for no maximum.
+    max_payload_bytes_per_run: The maximum number of bytes of images, audio
+        and tensors to keep per run, or 0 for no maximum.
+    max_memory_bytes: The estimated number of bytes of memory all runs may
+        hold together, or 0 for no maximum.
+    max_resident_runs: If positive, runs are only loaded once they are viewed,
+        and only this many runs, the ones viewed most recently, stay loaded.
+    stale_run_secs: If positive, runs not viewed for this many seconds are
+        reloaded after the other runs, and only every stale_run_reload_secs.
+    stale_run_reload_secs: How often, in seconds, stale runs are reloaded.
+    max_reload_interval: The longest interval in seconds between two reloads
+        of a run that is not being written to. See
+        `start_reloading_multiplexer`.
+    discovery_interval: How often in seconds to look for new runs, or 0 to
+        look every reload_interval.
+    watch_changes: Whether to watch a local logdir for changes with inotify
+        and only reload runs that changed.
+    response_cache_bytes: The most bytes of response bodies to keep in memory
+        for repeated requests, or 0 to keep none.
 
   Returns:
     The new TensorBoard WSGI application.
   """
+  http_util.SetResponseCacheBytes(response_cache_bytes)
   multiplexer = event_multiplexer.EventMultiplexer(
       size_guidance=DEFAULT_SIZE_GUIDANCE,
-      purge_orphaned_data=purge_orphaned_data)
+      purge_orphaned_data=purge_orphaned_data,
+      max_reload_threads=max_reload_threads,
+      record_reader=record_reader,
+      payload_views=payload_views,
+      decode_processes=decode_processes,
+      payload_bytes_guidance={
+          event_accumulator.IMAGES: max_payload_bytes_per_tag,
+          event_accumulator.AUDIO: max_payload_bytes_per_tag,
+          event_accumulator.TENSORS: max_payload_bytes_per_tag,
+      },
+      max_payload_bytes_per_run=max_payload_bytes_per_run,
+      max_memory_bytes=max_memory_bytes,
+      max_resident_runs=max_resident_runs,
+      stale_run_secs=stale_run_secs,
+      stale_run_reload_secs=stale_run_reload_secs,
+      watch_changes=watch_changes)
+  atexit.register(multiplexer.Close)
   context = base_plugin.TBContext(
       assets_zip_provider=get_default_assets_zip_provider(),
       logdir=logdir,
       multiplexer=multiplexer)
   plugins = [constructor(context) for constructor in plugins]
-  return TensorBoardWSGIApp(logdir, plugins, multiplexer, reload_interval)
+  return TensorBoardWSGIApp(logdir, plugins, multiplexer, reload_interval,
+                            max_reload_interval=max_reload_interval,
+                            discovery_interval=discovery_interval)
 
 
-def TensorBoardWSGIApp(logdir, plugins, multiplexer, reload_interval):
+def TensorBoardWSGIApp(logdir, plugins, multiplexer, reload_interval,
+                       max_reload_interval=0, discovery_interval=0):
   """Constructs the TensorBoard application.
 
   Args:
@@ -96,6 +160,10 @@ def TensorBoardWSGIApp(logdir, plugins, multiplexer, reload_interval):
     plugins: A list of base_plugin.TBPlugin subclass instances.
     multiplexer: The EventMultiplexer with TensorBoard data to serve
     reload_interval: How often (in seconds) to reload the Multiplexer
+    max_reload_interval: How long (in seconds) runs that are not written to
+      may go without being reloaded, or 0 to always use reload_interval.
+    discovery_interval: How often (in seconds) to look for new runs, or 0 to
+      use reload_interval.
 
   Returns:
     A WSGI application that implements the TensorBoard backend.
@@ -105,7 +173,9 @@ def TensorBoardWSGIApp(logdir, plugins, multiplexer, reload_interval):
   """
   path_to_run = parse_event_files_spec(logdir)
   if reload_interval:
-    start_reloading_multiplexer(multiplexer, path_to_run, reload_interval)
+    start_reloading_multiplexer(multiplexer, path_to_run, reload_interval,
+                                max_load_interval=max_reload_interval,
+                                discovery_interval=discovery_interval)
   else:
     reload_multiplexer(multiplexer, path_to_run)
   return TensorBoardWSGI(plugins)
@@ -275,18 +345,26 @@ def reload_multiplexer(multiplexer, path_to_run):
   tf.logging.info('TensorBoard done reloading. Load took %0.3f secs', duration)
 
 
-def start_reloading_multiplexer(multiplexer, path_to_run, load_interval):
+def start_reloading_multiplexer(multiplexer, path_to_run, load_interval,
+                                max_load_interval=0, discovery_interval=0):
   """Starts a thread to automatically reload the given multiplexer.
 
-  The thread will reload the multiplexer by calling `ReloadMultiplexer` every
-  `load_interval` seconds, starting immediately.
+  The thread looks for new runs every `discovery_interval` seconds and reloads
+  each run on its own schedule, starting immediately. Runs that loaded new
+  events are reloaded again after `load_interval` seconds. Runs that did not
+  are reloaded less and less often, down to once every `max_load_interval`
+  seconds. See `reload_scheduler.ReloadScheduler`.
 
   Args:
     multiplexer: The `EventMultiplexer` to add runs to and reload.
     path_to_run: A dict mapping from paths to run names, where `None` as the run
       name is interpreted as a run name equal to the path.
-    load_interval: How many seconds to wait after one load before starting the
-      next load.
+    load_interval: How many seconds to wait before reloading a run that is
+      being written to.
+    max_load_interval: The most seconds to wait before reloading any run, or 0
+      to use load_interval.
+    discovery_interval: How many seconds to wait between looking for new runs,
+      or 0 to use load_interval.
 
   Returns:
     A started `threading.Thread` that reloads the multiplexer.
@@ -294,12 +372,17 @@ def start_reloading_multiplexer(multiplexer, path_to_run, load_interval):
 
   # We don't call multiplexer.Reload() here because that would make
   # AddRunsFromDirectory block until the runs have all loaded.
-  def _reload_forever():
-    while True:
-      reload_multiplexer(multiplexer, path_to_run)
-      time.sleep(load_interval)
-
-  thread = threading.Thread(target=_reload_forever)
+  def _discover():
+    for (path, name) in six.iteritems(path_to_run):
+      multiplexer.AddRunsFromDirectory(path, name)
+
+  scheduler = reload_scheduler.ReloadScheduler(
+      multiplexer,
+      _discover,
+      min_interval_secs=load_interval,
+      max_interval_secs=max(max_load_interval, load_interval),
+      discovery_interval_secs=discovery_interval or load_interval)
+  thread = threading.Thread(target=scheduler.Run)
   thread.daemon = True
   thread.start()
   return thread
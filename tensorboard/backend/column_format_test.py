@@ -0,0 +1,120 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for column_format."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import json
+import struct
+
+import numpy as np
+import tensorflow as tf
+from werkzeug import test as wtest
+from werkzeug import wrappers
+
+from tensorboard.backend import column_format
+
+
+class ColumnFormatTest(tf.test.TestCase):
+
+  def testRoundTrip(self):
+    body = column_format.Serialize([
+        ('wall_time', np.array([1.5, 2.5])),
+        ('step', np.array([1, 2], dtype=np.int32)),
+        ('value', np.array([0.5, np.nan], dtype=np.float32)),
+        ('empty', []),
+    ])
+    columns = column_format.Parse(body)
+    self.assertEqual(list(columns), ['wall_time', 'step', 'value', 'empty'])
+    self.assertEqual(columns['wall_time'].dtype, np.dtype('<f8'))
+    self.assertEqual(columns['step'].dtype, np.dtype('<i8'))
+    self.assertEqual(columns['value'].dtype, np.dtype('<f4'))
+    self.assertAllEqual(columns['wall_time'], [1.5, 2.5])
+    self.assertAllEqual(columns['step'], [1, 2])
+    self.assertEqual(columns['value'][0], 0.5)
+    self.assertTrue(np.isnan(columns['value'][1]))
+    self.assertEqual(len(columns['empty']), 0)
+
+  def testLayout(self):
+    body = column_format.Serialize([('step', np.array([7], dtype='>i8'))])
+    self.assertEqual(body[:4], b'TBC1')
+    (header_length,) = struct.unpack_from('<I', body, 4)
+    header = json.loads(body[8:8 + header_length].decode('utf-8'))
+    self.assertEqual(header, {'columns': [
+        {'name': 'step', 'dtype': '<i8', 'length': 1}]})
+    self.assertEqual(len(body) % 8, 0)
+    self.assertEqual(body[-8:], struct.pack('<q', 7))
+
+  def testRejectsInvalidColumns(self):
+    with self.assertRaises(ValueError):
+      column_format.Serialize([('matrix', np.zeros((2, 2)))])
+    with self.assertRaises(ValueError):
+      column_format.Serialize([('names', np.array(['a', 'b']))])
+
+  def testRejectsInvalidBodies(self):
+    with self.assertRaises(ValueError):
+      column_format.Parse(b'[1, 2, 3]')
+    body = column_format.Serialize([('step', np.arange(4))])
+    with self.assertRaises(ValueError):
+      column_format.Parse(body[:-8])
+
+  def testIsRequested(self):
+    def Request(accept):
+      return wrappers.Request(
+          wtest.EnvironBuilder(headers={'Accept': accept}).get_environ())
+
+    self.assertTrue(column_format.IsRequested(Request(
+        column_format.MIME_TYPE + ', application/json;q=0.5')))
+    self.assertFalse(column_format.IsRequested(Request('*/*')))
+    self.assertFalse(column_format.IsRequested(Request('application/json')))
+    self.assertFalse(column_format.IsRequested(Request(
+        column_format.MIME_TYPE + ';q=0')))
+
+  def testNegotiate(self):
+    def Request(accept):
+      return wrappers.Request(
+          wtest.EnvironBuilder(headers={'Accept': accept}).get_environ())
+
+    self.assertEqual(
+        column_format.Negotiate(Request(column_format.MIME_TYPE), 'text/csv'),
+        column_format.MIME_TYPE)
+    self.assertEqual(column_format.Negotiate(Request('*/*'), 'text/csv'),
+                     'text/csv')
+    self.assertEqual(
+        column_format.Negotiate(
+            Request('application/json, %s;q=0.1' % column_format.MIME_TYPE),
+            'application/json'),
+        'application/json')
+    self.assertEqual(
+        column_format.Negotiate(
+            Request('%s, */*;q=0.5' % column_format.MIME_TYPE),
+            'application/json'),
+        column_format.MIME_TYPE)
+
+  def testColumn(self):
+    point = collections.namedtuple('Point', ['step', 'value'])
+    points = [point(step=1, value=0.5), point(step=2, value=1.5)]
+    step = column_format.Column(points, 'step', np.int64)
+    self.assertEqual(step.dtype, np.int64)
+    self.assertAllEqual(step, [1, 2])
+    self.assertAllEqual(column_format.Column(iter(points), 'value', np.float64),
+                        [0.5, 1.5])
+
+
+if __name__ == '__main__':
+  tf.test.main()
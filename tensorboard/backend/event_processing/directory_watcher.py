@@ -41,7 +41,8 @@ class DirectoryWatcher(object):
   false negatives. However, it should have no false positives.
   """
 
-  def __init__(self, directory, loader_factory, path_filter=lambda x: True):
+  def __init__(self, directory, loader_factory, path_filter=lambda x: True,
+               change_tracker=None, skip_unchanged=False):
     """Constructs a new DirectoryWatcher.
 
     Args:
@@ -49,7 +50,16 @@ class DirectoryWatcher(object):
       loader_factory: A factory for creating loaders. The factory should take a
         path and return an object that has a Load method returning an
         iterator that will yield all events that have not been yielded yet.
+        If the object also has a Close method, it is called once the watcher
+        has moved on to the next path.
       path_filter: If specified, only paths matching this filter are loaded.
+      change_tracker: An optional `inotify_tracker.InotifyChangeTracker`
+        watching the directory. `Load` does no I/O at all while it reports
+        that nothing in the directory changed.
+      skip_unchanged: Whether `Load` first checks a cheap fingerprint of the
+        paths, and returns right away if it is the same as after the last
+        `Load`. Writes to older paths are then only detected as out-of-order
+        once the newest path changes as well.
 
     Raises:
       ValueError: If path_provider or loader_factory are None.
@@ -63,9 +73,16 @@ class DirectoryWatcher(object):
     self._loader_factory = loader_factory
     self._loader = None
     self._path_filter = path_filter
+    self._change_tracker = change_tracker
+    self._generation = None
+    self._skip_unchanged = skip_unchanged
+    self._fingerprint = None
     self._ooo_writes_detected = False
     # The file size for each file at the time it was finalized.
     self._finalized_sizes = {}
+    # The paths matching the filter found so far, sorted, and as a set.
+    self._sorted_paths = []
+    self._known_paths = set()
 
   def Load(self):
     """Loads new values.
@@ -84,9 +101,24 @@ class DirectoryWatcher(object):
       DirectoryDeletedError: If the directory has been permanently deleted
         (as opposed to being temporarily unavailable).
     """
+    if self._change_tracker is not None:
+      # Read the generation first, so that changes made while loading are
+      # loaded next time.
+      generation = self._change_tracker.Generation(self._directory)
+      if generation == self._generation:
+        return
     try:
+      # Likewise, take the fingerprint before loading.
+      fingerprint = None
+      if self._skip_unchanged and self._change_tracker is None:
+        fingerprint = self._Fingerprint()
+        if fingerprint is not None and fingerprint == self._fingerprint:
+          return
       for event in self._LoadInternal():
         yield event
+      if self._change_tracker is not None:
+        self._generation = generation
+      self._fingerprint = fingerprint
     except tf.errors.OpError:
       if not tf.gfile.Exists(self._directory):
         raise DirectoryDeletedError(
@@ -187,9 +219,32 @@ class DirectoryWatcher(object):
       except tf.errors.OpError as e:
         tf.logging.error('Unable to get size of %s: %s', old_path, e)
 
+    if self._loader is not None and hasattr(self._loader, 'Close'):
+      self._loader.Close()
     self._path = path
     self._loader = self._loader_factory(path)
 
+  def _Fingerprint(self):
+    """Returns a cheap summary of the paths that changes when they do.
+
+    The fingerprint consists of the number of paths and the name, size and
+    modification time of the last path, which is the only one the data source
+    writes to. Checking it costs one listing and one stat, instead of sorting
+    the paths, statting the older ones for out-of-order writes and trying to
+    read more records.
+
+    Returns:
+      A hashable fingerprint, or None if there are no paths yet.
+    """
+    paths = [path
+             for path in io_wrapper.ListDirectoryAbsolute(self._directory)
+             if self._path_filter(path)]
+    if not paths:
+      return None
+    last_path = max(paths)
+    stat = tf.gfile.Stat(last_path)
+    return (len(paths), last_path, stat.length, stat.mtime_nsec)
+
   def _GetNextPath(self):
     """Gets the next path to load from.
 
@@ -199,9 +254,8 @@ class DirectoryWatcher(object):
     Returns:
       The next path to load events from, or None if there are no more paths.
     """
-    paths = sorted(path
-                   for path in io_wrapper.ListDirectoryAbsolute(self._directory)
-                   if self._path_filter(path))
+    new_paths = self._UpdatePathIndex()
+    paths = self._sorted_paths
     if not paths:
       return None
 
@@ -211,38 +265,72 @@ class DirectoryWatcher(object):
     # Don't bother checking if the paths are GCS (which we can't check) or if
     # we've already detected an OOO write.
     if not io_wrapper.IsGCSPath(paths[0]) and not self._ooo_writes_detected:
-      # Check the previous _OOO_WRITE_CHECK_COUNT paths for out of order writes.
-      current_path_index = bisect.bisect_left(paths, self._path)
-      ooo_check_start = max(0, current_path_index - self._OOO_WRITE_CHECK_COUNT)
-      for path in paths[ooo_check_start:current_path_index]:
-        if self._HasOOOWrite(path):
-          self._ooo_writes_detected = True
-          break
-
-    next_paths = list(path
-                      for path in paths
-                      if self._path is None or path > self._path)
-    if next_paths:
-      return min(next_paths)
+      # A path that appeared before the current one was created out of order,
+      # which the index tells us without a stat.
+      if any(path < self._path for path in new_paths):
+        self._ReportOOOWrite(min(new_paths), None)
+      else:
+        # Check the previous _OOO_WRITE_CHECK_COUNT paths for out of order
+        # writes.
+        current_path_index = bisect.bisect_left(paths, self._path)
+        ooo_check_start = max(0,
+                              current_path_index - self._OOO_WRITE_CHECK_COUNT)
+        for path in paths[ooo_check_start:current_path_index]:
+          if self._HasOOOWrite(path):
+            break
+
+    next_index = bisect.bisect_right(paths, self._path)
+    if next_index < len(paths):
+      return paths[next_index]
     else:
       return None
 
+  def _UpdatePathIndex(self):
+    """Merges a new listing of the directory into the sorted path index.
+
+    Only paths that were not listed before are sorted; in the common case they
+    all sort after the known paths and are simply appended.
+
+    Returns:
+      The paths that were not known before, sorted.
+    """
+    listed = set(path
+                 for path in io_wrapper.ListDirectoryAbsolute(self._directory)
+                 if self._path_filter(path))
+    new_paths = sorted(listed - self._known_paths)
+    if len(listed) != len(self._known_paths) + len(new_paths):
+      # Some paths were deleted.
+      self._sorted_paths = [path for path in self._sorted_paths
+                            if path in listed]
+    if new_paths:
+      if self._sorted_paths and new_paths[0] < self._sorted_paths[-1]:
+        # Merging two sorted runs is linear in Python's sort.
+        self._sorted_paths = sorted(self._sorted_paths + new_paths)
+      else:
+        self._sorted_paths.extend(new_paths)
+    self._known_paths = listed
+    return new_paths
+
   def _HasOOOWrite(self, path):
     """Returns whether the path has had an out-of-order write."""
     # Check the sizes of each path before the current one.
     size = tf.gfile.Stat(path).length
     old_size = self._finalized_sizes.get(path, None)
     if size != old_size:
-      if old_size is None:
-        tf.logging.error('File %s created after file %s even though it\'s '
-                         'lexicographically earlier', path, self._path)
-      else:
-        tf.logging.error('File %s updated even though the current file is %s',
-                         path, self._path)
+      self._ReportOOOWrite(path, old_size)
       return True
     else:
       return False
 
+  def _ReportOOOWrite(self, path, old_size):
+    self._ooo_writes_detected = True
+    if old_size is None:
+      tf.logging.error('File %s created after file %s even though it\'s '
+                       'lexicographically earlier', path, self._path)
+    else:
+      tf.logging.error('File %s updated even though the current file is %s',
+                       path, self._path)
+
 
 class DirectoryDeletedError(Exception):
   """Thrown by Load() when the directory is *permanently* gone.
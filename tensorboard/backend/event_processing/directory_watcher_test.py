@@ -34,6 +34,7 @@ class _ByteLoader(object):
   def __init__(self, path):
     self._f = open(path)
     self.bytes_read = 0
+    self.closed = False
 
   def Load(self):
     while True:
@@ -45,6 +46,21 @@ class _ByteLoader(object):
       else:
         return
 
+  def Close(self):
+    self._f.close()
+    self.closed = True
+
+
+class _FakeChangeTracker(object):
+  """A change tracker whose generation is set by the test."""
+
+  def __init__(self):
+    self.generation = 0
+
+  def Generation(self, directory):
+    del directory  # Unused.
+    return self.generation
+
 
 class DirectoryWatcherTest(tf.test.TestCase):
 
@@ -121,6 +137,20 @@ class DirectoryWatcherTest(tf.test.TestCase):
     self.assertWatcherYields(['b', 'c'])
     self.assertFalse(self._watcher.OutOfOrderWritesDetected())
 
+  def testClosesLoaderWhenSwitchingToNewFile(self):
+    loaders = []
+
+    def _Factory(path):
+      loaders.append(_ByteLoader(path))
+      return loaders[-1]
+
+    self._watcher = directory_watcher.DirectoryWatcher(self._directory,
+                                                       _Factory)
+    self._WriteToFile('a', 'a')
+    self._WriteToFile('b', 'b')
+    self.assertWatcherYields(['a', 'b'])
+    self.assertEqual([loader.closed for loader in loaders], [True, False])
+
   def testIntermediateEmptyFiles(self):
     self._WriteToFile('a', 'a')
     self._WriteToFile('b', '')
@@ -203,6 +233,68 @@ class DirectoryWatcherTest(tf.test.TestCase):
     with self.assertRaises((IOError, OSError)):
       self._LoadAllEvents()
 
+  def testMergesNewPathsIntoIndex(self):
+    listing = io_wrapper.ListDirectoryAbsolute
+    self.stubs.Set(io_wrapper, 'ListDirectoryAbsolute',
+                   lambda directory: sorted(listing(directory), reverse=True))
+    self._WriteToFile('b', 'b')
+    self.assertWatcherYields(['b'])
+    self._WriteToFile('d', 'd')
+    self._WriteToFile('c', 'c')
+    self.assertWatcherYields(['c', 'd'])
+    self.assertEqual(self._watcher._sorted_paths,
+                     [os.path.join(self._directory, name)
+                      for name in ('b', 'c', 'd')])
+
+    os.remove(os.path.join(self._directory, 'b'))
+    self._WriteToFile('e', 'e')
+    self.assertWatcherYields(['e'])
+    self.assertEqual(self._watcher._sorted_paths,
+                     [os.path.join(self._directory, name)
+                      for name in ('c', 'd', 'e')])
+    self.assertFalse(self._watcher.OutOfOrderWritesDetected())
+
+    self._WriteToFile('a', 'a')
+    self.assertWatcherYields([])
+    self.assertTrue(self._watcher.OutOfOrderWritesDetected())
+
+  def testSkipsLoadingWhileFingerprintIsUnchanged(self):
+    self._watcher = directory_watcher.DirectoryWatcher(
+        self._directory, _ByteLoader, skip_unchanged=True)
+    self._WriteToFile('a', 'a')
+    self._WriteToFile('b', 'b')
+    self.assertWatcherYields(['a', 'b'])
+
+    self.stubs.Set(self._watcher, '_HasOOOWrite',
+                   lambda _: self.fail('Checked an unchanged directory'))
+    self.stubs.Set(self._watcher._loader, 'Load',
+                   lambda: self.fail('Read an unchanged file'))
+    self.assertWatcherYields([])
+    self.stubs.CleanUp()
+
+    self._WriteToFile('b', 'c')
+    self.assertWatcherYields(['c'])
+    self._WriteToFile('c', 'd')
+    self.assertWatcherYields(['d'])
+    self.assertFalse(self._watcher.OutOfOrderWritesDetected())
+
+  def testSkipsLoadingWhileChangeTrackerReportsNoChange(self):
+    tracker = _FakeChangeTracker()
+    self._watcher = directory_watcher.DirectoryWatcher(
+        self._directory, _ByteLoader, change_tracker=tracker)
+    self._WriteToFile('a', 'a')
+    self.assertWatcherYields(['a'])
+
+    # Writes the tracker hasn't reported yet aren't read.
+    self._WriteToFile('a', 'b')
+    self.stubs.Set(io_wrapper, 'ListDirectoryAbsolute',
+                   lambda _: self.fail('Listed an unchanged directory'))
+    self.assertWatcherYields([])
+    self.stubs.CleanUp()
+
+    tracker.generation += 1
+    self.assertWatcherYields(['b'])
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -18,21 +18,29 @@ from __future__ import division
 from __future__ import print_function
 
 import collections
+import functools
+import itertools
 import os
 import re
 import threading
 
+import numpy as np
+import six
 import tensorflow as tf
 
 from tensorboard.backend.event_processing import directory_watcher
 from tensorboard.backend.event_processing import event_file_loader
 from tensorboard.backend.event_processing import plugin_asset_util
+from tensorboard.backend.event_processing import process_pool_loader
+from tensorboard.backend.event_processing import record_prefetcher
 from tensorboard.backend.event_processing import reservoir
 from tensorboard.plugins.distributions import compressor
 
 namedtuple = collections.namedtuple
 ScalarEvent = namedtuple('ScalarEvent', ['wall_time', 'step', 'value'])
 
+ScalarColumns = namedtuple('ScalarColumns', ['wall_times', 'steps', 'values'])
+
 HealthPillEvent = namedtuple('HealthPillEvent', [
     'wall_time', 'step', 'device_name', 'node_name', 'output_slot', 'dtype',
     'shape', 'value'])
@@ -111,6 +119,10 @@ STORE_EVERYTHING_SIZE_GUIDANCE = {
 # rely on how health pill values have this special tag value.
 HEALTH_PILL_EVENT_TAG_PREFIX = '__health_pill__/'
 
+# The maximum number of events whose scalars `Reload` holds back to add them
+# to the reservoirs together.
+_SCALAR_CHUNK_EVENTS = 1000
+
 
 def IsTensorFlowEventsFile(path):
   """Check the path name to see if it is probably a TF Events file.
@@ -157,7 +169,14 @@ class EventAccumulator(object):
                path,
                size_guidance=DEFAULT_SIZE_GUIDANCE,
                compression_bps=NORMAL_HISTOGRAM_BPS,
-               purge_orphaned_data=True):
+               purge_orphaned_data=True,
+               record_reader=event_file_loader.PYWRAP_RECORD_READER,
+               payload_views=False,
+               prefetch_queue_depth=0,
+               decoder_pool=None,
+               payload_bytes_guidance=None,
+               max_payload_bytes=0,
+               change_tracker=None):
     """Construct the `EventAccumulator`.
 
     Args:
@@ -168,13 +187,46 @@ class EventAccumulator(object):
         so as to avoid OOMing the client. The size_guidance should be a map
         from a `tagType` string to an integer representing the number of
         items to keep per tag for items of that `tagType`. If the size is 0,
-        all events are stored.
+        all events are stored. Instead of an integer, a
+        `reservoir.StepStratifiedSize` keeps items spread evenly over their
+        steps rather than sampled uniformly; see
+        `reservoir.StepStratifiedReservoir`. Only scalars can keep extrema.
       compression_bps: Information on how the `EventAccumulator` should compress
         histogram data for the `CompressedHistograms` tag (for details see
         `ProcessCompressedHistogram`).
       purge_orphaned_data: Whether to discard any events that were "orphaned" by
         a TensorFlow restart.
+      record_reader: One of `event_file_loader.RECORD_READERS`, selecting how
+        records are read from the event files.
+      payload_views: Whether to keep image and audio payloads as memoryviews
+        into the records they were read from instead of as copies. Combined
+        with `event_file_loader.MMAP_RECORD_READER`, this keeps them in the
+        page cache rather than on the Python heap.
+      prefetch_queue_depth: If positive, `Reload` reads and frames records on a
+        background thread, up to this many records ahead of the thread that
+        parses and accumulates them. See `PrefetchStats`.
+      decoder_pool: An optional `multiprocessing.Pool` to read and parse the
+        event files in. Its workers send back runs of scalar summaries as
+        compact arrays; see `process_pool_loader`. This cannot be combined with
+        `payload_views`, and `record_reader` and `prefetch_queue_depth` are
+        ignored.
+      payload_bytes_guidance: An optional map from `IMAGES`, `AUDIO` or
+        `TENSORS` to the maximum number of bytes of payload to keep per tag of
+        that `tagType`, in addition to the number of items in size_guidance.
+        0 means no maximum. See `reservoir.ByteBudgetedReservoir`.
+      max_payload_bytes: The maximum number of bytes of images, audio and
+        tensors to keep across all tags, or 0 for no maximum. Items are
+        evicted from the tags using the most bytes first. See `PayloadBytes`.
+      change_tracker: An optional `inotify_tracker.InotifyChangeTracker`
+        watching the directory at path, which lets `Reload` skip the directory
+        while nothing in it changes.
+
+    Raises:
+      ValueError: If both `payload_views` and `decoder_pool` are given, or if
+        the size guidance is invalid.
     """
+    if payload_views and decoder_pool is not None:
+      raise ValueError('payload_views cannot be used with a decoder_pool')
     sizes = {}
     for key in DEFAULT_SIZE_GUIDANCE:
       if key in size_guidance:
@@ -182,28 +234,74 @@ class EventAccumulator(object):
       else:
         sizes[key] = DEFAULT_SIZE_GUIDANCE[key]
 
+    payload_bytes_guidance = payload_bytes_guidance or {}
+    self._payload_byte_budget = reservoir.ByteBudget(max_payload_bytes)
+
+    def _PayloadReservoirFn(tag_type, size_fn):
+      return functools.partial(
+          reservoir.ByteBudgetedReservoir,
+          size_fn=size_fn,
+          max_bytes_per_key=payload_bytes_guidance.get(tag_type, 0),
+          byte_budget=self._payload_byte_budget,
+          memory_fn=_MEMORY_ESTIMATORS[tag_type])
+
     self._first_event_timestamp = None
-    self._scalars = reservoir.Reservoir(size=sizes[SCALARS])
+    # `simple_value` is a 32-bit float, so storing it as float32 is lossless.
+    self._scalars = _MakeReservoir(
+        sizes[SCALARS], SCALARS,
+        functools.partial(reservoir.ScalarReservoir, item_type=ScalarEvent,
+                          value_dtype=np.float32),
+        allow_extrema=True, value_dtype=np.float32)
 
     # Unlike the other reservoir, the reservoir for health pills is keyed by the
     # name of the op instead of the tag. This lets us efficiently obtain the
     # health pills per node.
-    self._health_pills = reservoir.Reservoir(size=sizes[HEALTH_PILLS])
+    self._health_pills = _MakeReservoir(sizes[HEALTH_PILLS], HEALTH_PILLS)
 
     self._graph = None
     self._graph_from_metagraph = False
     self._meta_graph = None
     self._tagged_metadata = {}
-    self._histograms = reservoir.Reservoir(size=sizes[HISTOGRAMS])
-    self._compressed_histograms = reservoir.Reservoir(
-        size=sizes[COMPRESSED_HISTOGRAMS], always_keep_last=False)
-    self._images = reservoir.Reservoir(size=sizes[IMAGES])
-    self._audio = reservoir.Reservoir(size=sizes[AUDIO])
-    self._tensors = reservoir.Reservoir(size=sizes[TENSORS])
+    self._histograms = _MakeReservoir(sizes[HISTOGRAMS], HISTOGRAMS)
+    self._compressed_histograms = _MakeReservoir(
+        sizes[COMPRESSED_HISTOGRAMS], COMPRESSED_HISTOGRAMS,
+        functools.partial(reservoir.Reservoir, always_keep_last=False,
+                          memory_fn=_MEMORY_ESTIMATORS[COMPRESSED_HISTOGRAMS]))
+    self._images = _MakeReservoir(
+        sizes[IMAGES], IMAGES, _PayloadReservoirFn(IMAGES, _ImageEventBytes))
+    self._audio = _MakeReservoir(
+        sizes[AUDIO], AUDIO, _PayloadReservoirFn(AUDIO, _AudioEventBytes))
+    self._tensors = _MakeReservoir(
+        sizes[TENSORS], TENSORS,
+        _PayloadReservoirFn(TENSORS, _TensorEventBytes))
 
     self._generator_mutex = threading.Lock()
+    self._num_loaded = 0
+    self._id = next(_ACCUMULATOR_IDS)
     self.path = path
-    self._generator = _GeneratorFromPath(path)
+    self._record_reader = record_reader
+    self._payload_views = payload_views
+    self._change_tracker = change_tracker
+    self._prefetcher = None
+    # A decoder pool already reads ahead, and its workers need the state of
+    # the accumulator as of the last processed event.
+    if prefetch_queue_depth and decoder_pool is None:
+      self._prefetcher = record_prefetcher.RecordPrefetcher(
+          prefetch_queue_depth)
+    # Whether the generator yields serialized events that we parse ourselves.
+    self._raw_records = decoder_pool is None and (
+        payload_views or self._prefetcher is not None)
+    # Whether the generator is bound to this accumulator, through the purge
+    # state of a decoder pool, and cannot be handed over by `TagIndex`.
+    self._owns_generator = decoder_pool is not None
+    if decoder_pool is not None:
+      self._generator = _GeneratorFromPath(
+          path, decoder_pool=decoder_pool, purge_state_fn=self._PurgeState,
+          change_tracker=change_tracker)
+    else:
+      self._generator = _GeneratorFromPath(path, record_reader,
+                                           raw_records=self._raw_records,
+                                           change_tracker=change_tracker)
 
     self._compression_bps = compression_bps
     self.purge_orphaned_data = purge_orphaned_data
@@ -226,10 +324,76 @@ class EventAccumulator(object):
       The `EventAccumulator`.
     """
     with self._generator_mutex:
-      for event in self._generator.Load():
-        self._ProcessEvent(event)
+      # Scalars are grouped by tag and added to the reservoir a chunk at a
+      # time, which amortizes the locking over many items.
+      pending_scalars = collections.defaultdict(list)
+      num_pending_events = 0
+      try:
+        for event, payloads in self._LoadEvents(prefetch=True):
+          self._num_loaded += 1
+          if self._CanDeferScalars(event):
+            self._DeferScalars(event, pending_scalars)
+            num_pending_events += 1
+            if num_pending_events >= _SCALAR_CHUNK_EVENTS:
+              self._AddPendingScalars(pending_scalars)
+              num_pending_events = 0
+          else:
+            self._AddPendingScalars(pending_scalars)
+            num_pending_events = 0
+            self._ProcessItem(event, payloads)
+      finally:
+        self._AddPendingScalars(pending_scalars)
     return self
 
+  def NumLoaded(self):
+    """Returns the number of events loaded by `Reload` so far.
+
+    A batch of scalar events read by a decoder pool counts as one event.
+    """
+    return self._num_loaded
+
+  def _LoadEvents(self, prefetch=False):
+    """Yields `(event, payloads)` for the new events from the generator.
+
+    `payloads` is None unless payload views are enabled, in which case it is
+    the result of `event_file_loader.ScanPayloadViews`. With a decoder pool,
+    `event` may also be a `process_pool_loader.ScalarBatch`.
+
+    Args:
+      prefetch: Whether records may be read on a background thread. This must
+        only be set when every event will be consumed, because records read
+        ahead are lost otherwise.
+
+    Yields:
+      `(event, payloads)` tuples.
+    """
+    if self._generator is None:
+      # `TagIndex` took over the generator.
+      return
+    items = self._generator.Load()
+    if prefetch and self._prefetcher is not None:
+      items = self._prefetcher.Prefetch(items)
+    for item in items:
+      if not self._raw_records:
+        yield item, None
+      elif self._payload_views:
+        yield (event_file_loader.ParseEvent(item),
+               event_file_loader.ScanPayloadViews(item))
+      else:
+        yield event_file_loader.ParseEvent(item), None
+
+  def PrefetchStats(self):
+    """Returns the counters of the record prefetcher used by `Reload`.
+
+    Returns:
+      A `record_prefetcher.PrefetchStats` tuple counting the records read by
+      the prefetcher and how often the reading and the processing side stalled
+      waiting for each other, or None if prefetching is disabled.
+    """
+    if self._prefetcher is None:
+      return None
+    return self._prefetcher.Stats()
+
   def PluginAssets(self, plugin_name):
     """Return a list of all plugin assets for the given plugin.
 
@@ -276,15 +440,102 @@ class EventAccumulator(object):
       return self._first_event_timestamp
     with self._generator_mutex:
       try:
-        event = next(self._generator.Load())
-        self._ProcessEvent(event)
+        event, payloads = next(self._LoadEvents())
+        self._ProcessItem(event, payloads)
         return self._first_event_timestamp
 
       except StopIteration:
         raise ValueError('No event timestamp could be found')
 
-  def _ProcessEvent(self, event):
-    """Called whenever an event is loaded."""
+  def _PurgeState(self):
+    """Returns the state a decoder pool worker needs to predict purges."""
+    return self.most_recent_step, self._PurgesByStep()
+
+  def _ProcessItem(self, item, payloads=None):
+    """Processes an item yielded by `_LoadEvents`."""
+    if isinstance(item, process_pool_loader.ScalarBatch):
+      self._ProcessScalarBatch(item)
+    else:
+      self._ProcessEvent(item, payloads)
+
+  def _CanDeferScalars(self, event):
+    """Returns whether `event` only holds scalars and purges no data.
+
+    Processing such an event only adds to the scalar reservoirs and updates
+    the bookkeeping for purges, so adding its scalars can be put off until
+    right before the next event that does anything else.
+
+    Args:
+      event: An item yielded by `_LoadEvents`.
+    """
+    if not isinstance(event, tf.Event) or not event.HasField('summary'):
+      return False
+    values = event.summary.value
+    if not values or not all(value.HasField('simple_value')
+                             for value in values):
+      return False
+    return not (self._PurgesByStep() and event.step < self.most_recent_step)
+
+  def _PurgesByStep(self):
+    """Returns whether out-of-order steps purge orphaned data."""
+    return self.purge_orphaned_data and not (self.file_version and
+                                             self.file_version >= 2)
+
+  def _DeferScalars(self, event, pending_scalars):
+    """Processes an event for which `_CanDeferScalars` is true.
+
+    This has the same effect as `_ProcessEvent`, except that the scalars are
+    appended to the lists in `pending_scalars` by tag.
+
+    Args:
+      event: The `tf.Event` to process.
+      pending_scalars: A dict of lists of `ScalarEvent`s by tag.
+    """
+    if self._first_event_timestamp is None:
+      self._first_event_timestamp = event.wall_time
+    if self._PurgesByStep():
+      self.most_recent_step = event.step
+      self.most_recent_wall_time = event.wall_time
+    for value in event.summary.value:
+      pending_scalars[value.tag].append(
+          ScalarEvent(wall_time=event.wall_time, step=event.step,
+                      value=value.simple_value))
+
+  def _AddPendingScalars(self, pending_scalars):
+    """Adds and clears the scalars gathered by `_DeferScalars`."""
+    for tag, scalars in six.iteritems(pending_scalars):
+      self._scalars.AddItems(tag, scalars)
+    pending_scalars.clear()
+
+  def _ProcessScalarBatch(self, batch):
+    """Processes a run of events holding only scalar summaries.
+
+    The worker that built the batch made sure none of its events would have
+    purged any data, so this has the same effect as processing the events one
+    at a time.
+
+    Args:
+      batch: A `process_pool_loader.ScalarBatch`.
+    """
+    if self._first_event_timestamp is None:
+      self._first_event_timestamp = batch.first_wall_time
+    for tag, (wall_times, steps, values) in six.iteritems(batch.series):
+      self._scalars.AddItems(
+          tag, map(ScalarEvent._make, zip(wall_times.tolist(), steps.tolist(),
+                                          values.tolist())))
+    if self._PurgesByStep():
+      self.most_recent_step = batch.last_step
+      self.most_recent_wall_time = batch.last_wall_time
+
+  def _ProcessEvent(self, event, payloads=None):
+    """Called whenever an event is loaded.
+
+    Args:
+      event: The `tf.Event` to process.
+      payloads: An optional dict mapping the index of a summary value to a
+        view of its image or audio payload, which is stored instead of the
+        copy in `event`.
+    """
     if self._first_event_timestamp is None:
       self._first_event_timestamp = event.wall_time
 
@@ -340,7 +591,7 @@ class EventAccumulator(object):
                         tag + '. Overwriting it with the newest event.')
       self._tagged_metadata[tag] = event.tagged_run_metadata.run_metadata
     elif event.HasField('summary'):
-      for value in event.summary.value:
+      for index, value in enumerate(event.summary.value):
         if (value.HasField('tensor') and
             value.tag.startswith(HEALTH_PILL_EVENT_TAG_PREFIX)):
           self._ProcessHealthPillSummary(value, event)
@@ -349,8 +600,11 @@ class EventAccumulator(object):
             if value.HasField(summary_type):
               datum = getattr(value, summary_type)
               tag = value.node_name if summary_type == 'tensor' else value.tag
+              kwargs = {}
+              if payloads and index in payloads:
+                kwargs['payload'] = payloads[index]
               getattr(self, summary_func)(tag, event.wall_time, event.step,
-                                          datum)
+                                          datum, **kwargs)
 
   def _ProcessHealthPillSummary(self, value, event):
     """Process summaries containing health pills.
@@ -404,6 +658,30 @@ class EventAccumulator(object):
         RUN_METADATA: list(self._tagged_metadata.keys())
     }
 
+  def TagIndex(self):
+    """Returns an `EventTagIndex` that keeps the tags of this accumulator.
+
+    The index takes over the generator, so that it goes on reading from where
+    the last `Reload` stopped, and the accumulator loads no more events. With a
+    decoder pool, the index reads the event files again from the start
+    instead, which only walks the events.
+
+    Returns:
+      The `EventTagIndex`.
+    """
+    with self._generator_mutex:
+      generator = None
+      if not self._owns_generator:
+        generator = self._generator
+        self._generator = None
+      return EventTagIndex(
+          self.path,
+          record_reader=self._record_reader,
+          change_tracker=self._change_tracker,
+          generator=generator,
+          tags=self.Tags(),
+          first_event_timestamp=self._first_event_timestamp)
+
   def Scalars(self, tag):
     """Given a summary tag, return all associated `ScalarEvent`s.
 
@@ -418,6 +696,134 @@ class EventAccumulator(object):
     """
     return self._scalars.Items(tag)
 
+  def ScalarColumns(self, tag):
+    """Given a summary tag, return its scalars as numpy arrays.
+
+    This holds the same data as `Scalars`, for consumers that work on whole
+    arrays rather than on individual `ScalarEvent`s.
+
+    Args:
+      tag: A string tag associated with the events.
+
+    Raises:
+      KeyError: If the tag is not found.
+
+    Returns:
+      A `ScalarColumns` tuple of float64 wall times, int64 steps and
+      floating-point values.
+    """
+    return ScalarColumns(*self._scalars.Columns(tag))
+
+  def PayloadBytes(self):
+    """Returns the number of bytes of payload kept for each tag.
+
+    Only uniformly sampled reservoirs keep track of this, so tag types whose
+    size guidance is a `reservoir.StepStratifiedSize` are left out.
+
+    Returns:
+      A `{tagType: {tag: num_bytes}}` dictionary for `IMAGES`, `AUDIO` and
+      `TENSORS`.
+    """
+    result = {}
+    for tag_type, payload_reservoir in ((IMAGES, self._images),
+                                        (AUDIO, self._audio),
+                                        (TENSORS, self._tensors)):
+      if isinstance(payload_reservoir, reservoir.ByteBudgetedReservoir):
+        result[tag_type] = {tag: payload_reservoir.NumBytes(tag)
+                            for tag in payload_reservoir.Keys()}
+    return result
+
+  def TotalPayloadBytes(self):
+    """Returns the total number of bytes of payload kept for all tags."""
+    return self._payload_byte_budget.NumBytes()
+
+  def Generation(self, tag_type, tag):
+    """Returns a value that changes whenever the data of a tag changes.
+
+    Values are unique across all accumulators in the process, so a run that
+    is loaded again never repeats an earlier value. Read the generation before
+    the data, so that the data is at least as new as the generation.
+
+    Args:
+      tag_type: The `tagType` of the tag, such as `SCALARS`.
+      tag: The tag.
+
+    Raises:
+      ValueError: If tag_type is not kept in a reservoir.
+
+    Returns:
+      A hashable value to compare with values returned earlier.
+    """
+    reservoirs = self._AccumulatedReservoirs()
+    if tag_type not in reservoirs:
+      raise ValueError('No generation for tagType %r' % tag_type)
+    return (self._id, reservoirs[tag_type].Generation(tag))
+
+  def NumItems(self, tag_type, tag):
+    """Returns the number of items of a tag, without copying them.
+
+    Args:
+      tag_type: The `tagType` of the tag, such as `SCALARS`.
+      tag: The tag.
+
+    Raises:
+      ValueError: If tag_type is not kept in a reservoir.
+
+    Returns:
+      An integer, which is 0 for tags without items.
+    """
+    reservoirs = self._AccumulatedReservoirs()
+    if tag_type not in reservoirs:
+      raise ValueError('No items for tagType %r' % tag_type)
+    return reservoirs[tag_type].NumItems(tag)
+
+  def _AccumulatedReservoirs(self):
+    return {
+        SCALARS: self._scalars,
+        HISTOGRAMS: self._histograms,
+        COMPRESSED_HISTOGRAMS: self._compressed_histograms,
+        IMAGES: self._images,
+        AUDIO: self._audio,
+        TENSORS: self._tensors,
+        HEALTH_PILLS: self._health_pills,
+    }
+
+  def MemoryUsage(self):
+    """Estimates the number of bytes of memory held for each tag.
+
+    The estimates count the payloads and the Python objects holding them, but
+    are only meant to compare runs and tags with each other, not to add up to
+    the size of the process. The reservoirs keep running totals as items come
+    and go, so this takes time in the number of tags, not of items.
+
+    Returns:
+      A `{tagType: {tag: num_bytes}}` dictionary for every `tagType` kept in a
+      reservoir. Health pills are keyed by node name rather than by tag.
+    """
+    return {tag_type: tag_reservoir.MemoryUsage()
+            for tag_type, tag_reservoir in six.iteritems(
+                self._AccumulatedReservoirs())}
+
+  def Shed(self, tag_type):
+    """Discards all items kept for a `tagType`, leaving its tags in place.
+
+    The items are only loaded again by a new `EventAccumulator` for the same
+    path, since this one has already read past them.
+
+    Args:
+      tag_type: The `tagType` to discard, such as `COMPRESSED_HISTOGRAMS`.
+
+    Raises:
+      ValueError: If tag_type is not kept in a reservoir.
+
+    Returns:
+      The number of items discarded.
+    """
+    reservoirs = self._AccumulatedReservoirs()
+    if tag_type not in reservoirs:
+      raise ValueError('Cannot shed tagType %r' % tag_type)
+    return reservoirs[tag_type].FilterItems(lambda _: False)
+
   def HealthPills(self, node_name):
     """Returns all health pill values for a certain node.
 
@@ -647,20 +1053,24 @@ class EventAccumulator(object):
         compressor.CompressHistogram(
             histo_ev.histogram_value, self._compression_bps))
 
-  def _ProcessImage(self, tag, wall_time, step, image):
+  def _ProcessImage(self, tag, wall_time, step, image, payload=None):
     """Processes an image by adding it to accumulated state."""
+    if payload is None:
+      payload = image.encoded_image_string
     event = ImageEvent(wall_time=wall_time,
                        step=step,
-                       encoded_image_string=image.encoded_image_string,
+                       encoded_image_string=payload,
                        width=image.width,
                        height=image.height)
     self._images.AddItem(tag, event)
 
-  def _ProcessAudio(self, tag, wall_time, step, audio):
+  def _ProcessAudio(self, tag, wall_time, step, audio, payload=None):
     """Processes a audio by adding it to accumulated state."""
+    if payload is None:
+      payload = audio.encoded_audio_string
     event = AudioEvent(wall_time=wall_time,
                        step=step,
-                       encoded_audio_string=audio.encoded_audio_string,
+                       encoded_audio_string=payload,
                        content_type=audio.content_type,
                        sample_rate=audio.sample_rate,
                        length_frames=audio.length_frames)
@@ -748,6 +1158,221 @@ class EventAccumulator(object):
       tf.logging.warn(purge_msg)
 
 
+class EventTagIndex(object):
+  """Keeps only the tags of a run, as `EventAccumulator.Tags` lists them.
+
+  Serialized events are only walked for what they add to the tags, see
+  `event_file_loader.OutlineEvent`, so neither the summaries nor the graphs
+  are decoded or kept. Like an accumulator, each `Reload` only reads the
+  events added since the last one.
+  """
+
+  def __init__(self,
+               path,
+               record_reader=event_file_loader.PYWRAP_RECORD_READER,
+               change_tracker=None,
+               generator=None,
+               tags=None,
+               first_event_timestamp=None):
+    """Constructs the `EventTagIndex`.
+
+    Args:
+      path: A file path to a directory containing tf events files, or a single
+        tf events file.
+      record_reader: One of `event_file_loader.RECORD_READERS`.
+      change_tracker: An optional `inotify_tracker.InotifyChangeTracker`
+        watching the directory at path.
+      generator: An optional generator to read from instead of opening path,
+        which may yield `tf.Event` protos or serialized events.
+      tags: Optional tags to start from, as returned by `Tags`.
+      first_event_timestamp: The timestamp of the first event, if known.
+    """
+    self.path = path
+    self._generator_mutex = threading.Lock()
+    if generator is None:
+      generator = _GeneratorFromPath(path, record_reader, raw_records=True,
+                                     change_tracker=change_tracker)
+    self._generator = generator
+    self._first_event_timestamp = first_event_timestamp
+    # The tags of each list-valued `tagType`, as the keys of ordered dicts so
+    # that they are listed in the order they were first seen.
+    self._tags = {tag_type: collections.OrderedDict()
+                  for tag_type in _LISTED_TAG_TYPES}
+    self._graph = False
+    self._meta_graph = False
+    if tags:
+      for tag_type in _LISTED_TAG_TYPES:
+        self._tags[tag_type].update((tag, None) for tag in tags[tag_type])
+      self._graph = tags[GRAPH]
+      self._meta_graph = tags[META_GRAPH]
+
+  def Reload(self):
+    """Reads the tags of the events added since the last call to `Reload`.
+
+    Returns:
+      The `EventTagIndex`.
+    """
+    with self._generator_mutex:
+      for item in self._generator.Load():
+        if isinstance(item, tf.Event):
+          self._AddOutline(_OutlineParsedEvent(item))
+        else:
+          self._AddOutline(event_file_loader.OutlineEvent(item))
+    return self
+
+  def _AddOutline(self, outline):
+    if self._first_event_timestamp is None:
+      self._first_event_timestamp = outline.wall_time
+    self._graph = self._graph or outline.graph_def
+    self._meta_graph = self._meta_graph or outline.meta_graph_def
+    for tag in outline.run_metadata_tags:
+      self._tags[RUN_METADATA][tag] = None
+    for summary_type, tag, node_name in outline.summary_values:
+      if summary_type == 'tensor':
+        if tag.startswith(HEALTH_PILL_EVENT_TAG_PREFIX):
+          continue
+        tag = node_name
+      for tag_type in _SUMMARY_TAG_TYPES.get(summary_type, ()):
+        self._tags[tag_type][tag] = None
+
+  def Tags(self):
+    """Return all tags found in the value stream, like `EventAccumulator`."""
+    with self._generator_mutex:
+      tags = {tag_type: list(tags)
+              for tag_type, tags in six.iteritems(self._tags)}
+      tags[GRAPH] = self._graph
+      tags[META_GRAPH] = self._meta_graph
+      return tags
+
+  def FirstEventTimestamp(self):
+    """Returns the timestamp in seconds of the first event.
+
+    Unlike `EventAccumulator.FirstEventTimestamp`, this does not read events.
+
+    Raises:
+      ValueError: If no event has been read.
+    """
+    if self._first_event_timestamp is None:
+      raise ValueError('No event timestamp could be found')
+    return self._first_event_timestamp
+
+
+# The `tagType`s that `Tags` lists tags of.
+_LISTED_TAG_TYPES = (IMAGES, AUDIO, HISTOGRAMS, SCALARS, COMPRESSED_HISTOGRAMS,
+                     TENSORS, RUN_METADATA)
+
+# The `tagType`s that each of `SUMMARY_TYPES` adds a tag to.
+_SUMMARY_TAG_TYPES = {
+    'simple_value': (SCALARS,),
+    'histo': (HISTOGRAMS, COMPRESSED_HISTOGRAMS),
+    'image': (IMAGES,),
+    'audio': (AUDIO,),
+    'tensor': (TENSORS,),
+}
+
+
+def _OutlineParsedEvent(event):
+  """Returns the `event_file_loader.EventOutline` of a `tf.Event`."""
+  meta_graph_def = event.HasField('meta_graph_def')
+  run_metadata_tags = []
+  if event.HasField('tagged_run_metadata'):
+    run_metadata_tags.append(event.tagged_run_metadata.tag)
+  return event_file_loader.EventOutline(
+      wall_time=event.wall_time,
+      graph_def=event.HasField('graph_def') or (
+          meta_graph_def and
+          event_file_loader.MetaGraphHasGraphDef(event.meta_graph_def)),
+      meta_graph_def=meta_graph_def,
+      run_metadata_tags=run_metadata_tags,
+      summary_values=[(value.WhichOneof('value'), value.tag, value.node_name)
+                      for value in event.summary.value])
+
+
+def _ImageEventBytes(image_event):
+  return len(image_event.encoded_image_string)
+
+
+def _AudioEventBytes(audio_event):
+  return len(audio_event.encoded_audio_string)
+
+
+def _TensorEventBytes(tensor_event):
+  return tensor_event.tensor_proto.ByteSize()
+
+
+# Distinguishes the generations of different accumulators. See
+# `EventAccumulator.Generation`.
+_ACCUMULATOR_IDS = itertools.count()
+
+
+# Rough sizes of the Python objects making up an event, used to estimate the
+# memory held by each tag in `EventAccumulator.MemoryUsage`.
+_EVENT_OVERHEAD_BYTES = 128
+_LIST_FLOAT_BYTES = 32
+
+
+def _HistogramEventMemory(histogram_event):
+  histo = histogram_event.histogram_value
+  return _EVENT_OVERHEAD_BYTES * 2 + _LIST_FLOAT_BYTES * (
+      len(histo.bucket_limit) + len(histo.bucket))
+
+
+def _CompressedHistogramEventMemory(compressed_histogram_event):
+  return _EVENT_OVERHEAD_BYTES * (
+      1 + len(compressed_histogram_event.compressed_histogram_values))
+
+
+def _HealthPillEventMemory(health_pill_event):
+  return _EVENT_OVERHEAD_BYTES + _LIST_FLOAT_BYTES * (
+      len(health_pill_event.shape) + len(health_pill_event.value))
+
+
+_MEMORY_ESTIMATORS = {
+    # Only step-stratified scalars are kept as events. The arrays of a
+    # `reservoir.ScalarReservoir` are measured directly.
+    SCALARS: lambda event: _EVENT_OVERHEAD_BYTES,
+    HISTOGRAMS: _HistogramEventMemory,
+    COMPRESSED_HISTOGRAMS: _CompressedHistogramEventMemory,
+    IMAGES: lambda event: _EVENT_OVERHEAD_BYTES + _ImageEventBytes(event),
+    AUDIO: lambda event: _EVENT_OVERHEAD_BYTES + _AudioEventBytes(event),
+    TENSORS: lambda event: _EVENT_OVERHEAD_BYTES + _TensorEventBytes(event),
+    HEALTH_PILLS: _HealthPillEventMemory,
+}
+
+
+def _MakeReservoir(size, tag_type, uniform_reservoir_fn=None,
+                   allow_extrema=False, value_dtype=None):
+  """Creates the reservoir for one `tagType` from its size guidance.
+
+  Args:
+    size: The size guidance, either an integer or a
+      `reservoir.StepStratifiedSize`.
+    tag_type: The `tagType`, which picks the memory estimator of its items.
+    uniform_reservoir_fn: A function creating a uniformly sampled reservoir
+      from an integer size. Defaults to a `reservoir.Reservoir` with the
+      memory estimator of `tag_type`.
+    allow_extrema: Whether a `reservoir.StepStratifiedSize` may ask to keep
+      extrema, which only makes sense for items with a scalar value.
+    value_dtype: The dtype a `reservoir.StepStratifiedReservoir` stores the
+      values of items as, which should match uniform_reservoir_fn.
+
+  Returns:
+    The reservoir.
+
+  Raises:
+    ValueError: If the size guidance is invalid.
+  """
+  if isinstance(size, reservoir.StepStratifiedSize):
+    if size.keep_extrema and not allow_extrema:
+      raise ValueError('Only scalars can keep extrema, got %s' % (size,))
+    return reservoir.StepStratifiedReservoir(
+        size.size, keep_extrema=size.keep_extrema,
+        memory_fn=_MEMORY_ESTIMATORS[tag_type], value_dtype=value_dtype)
+  if uniform_reservoir_fn is None:
+    return reservoir.Reservoir(size, memory_fn=_MEMORY_ESTIMATORS[tag_type])
+  return uniform_reservoir_fn(size)
+
+
 def _GetPurgeMessage(most_recent_step, most_recent_wall_time, event_step,
                      event_wall_time, num_expired_scalars, num_expired_histos,
                      num_expired_comp_histos, num_expired_images,
@@ -765,15 +1390,47 @@ def _GetPurgeMessage(most_recent_step, most_recent_wall_time, event_step,
                                   num_expired_audio)
 
 
-def _GeneratorFromPath(path):
-  """Create an event generator for file or directory at given path string."""
+def _GeneratorFromPath(path,
+                       record_reader=event_file_loader.PYWRAP_RECORD_READER,
+                       raw_records=False,
+                       decoder_pool=None,
+                       purge_state_fn=None,
+                       change_tracker=None):
+  """Create an event generator for file or directory at given path string.
+
+  Args:
+    path: The path to an event file or a directory of event files.
+    record_reader: One of `event_file_loader.RECORD_READERS`.
+    raw_records: Whether the generator should yield serialized events rather
+      than `tf.Event` protos.
+    decoder_pool: An optional `multiprocessing.Pool` to decode the files in,
+      in which case the generator also yields `ScalarBatch`es.
+    purge_state_fn: The function passed on to each
+      `process_pool_loader.ProcessPoolEventFileLoader`.
+    change_tracker: An optional `inotify_tracker.InotifyChangeTracker` for the
+      `directory_watcher.DirectoryWatcher` of a directory.
+
+  Returns:
+    An object with a `Load` method that yields the new events.
+  """
   if not path:
     raise ValueError('path must be a valid string')
+  if decoder_pool is not None:
+    loader_factory = functools.partial(
+        process_pool_loader.ProcessPoolEventFileLoader,
+        pool=decoder_pool, purge_state_fn=purge_state_fn)
+  elif raw_records:
+    loader_factory = functools.partial(event_file_loader.RawEventFileLoader,
+                                       record_reader=record_reader)
+  else:
+    loader_factory = functools.partial(event_file_loader.EventFileLoader,
+                                       record_reader=record_reader)
   if IsTensorFlowEventsFile(path):
-    return event_file_loader.EventFileLoader(path)
+    return loader_factory(path)
   else:
     return directory_watcher.DirectoryWatcher(
-        path, event_file_loader.EventFileLoader, IsTensorFlowEventsFile)
+        path, loader_factory, IsTensorFlowEventsFile,
+        change_tracker=change_tracker, skip_unchanged=True)
 
 
 def _ParseFileVersion(file_version):
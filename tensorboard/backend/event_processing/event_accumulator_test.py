@@ -17,6 +17,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import multiprocessing
 import os
 
 import numpy as np
@@ -25,6 +26,8 @@ from six.moves import xrange  # pylint: disable=redefined-builtin
 import tensorflow as tf
 
 from tensorboard.backend.event_processing import event_accumulator as ea
+from tensorboard.backend.event_processing import event_file_loader
+from tensorboard.backend.event_processing import reservoir
 from tensorboard.plugins.distributions import compressor
 
 
@@ -186,7 +189,7 @@ class MockingEventAccumulatorTest(EventAccumulatorTest):
     self._real_generator = ea._GeneratorFromPath
 
     def _FakeAccumulatorConstructor(generator, *args, **kwargs):
-      ea._GeneratorFromPath = lambda x: generator
+      ea._GeneratorFromPath = lambda x, *args, **kwargs: generator
       return self._real_constructor(generator, *args, **kwargs)
 
     ea.EventAccumulator = _FakeAccumulatorConstructor
@@ -258,6 +261,163 @@ class MockingEventAccumulatorTest(EventAccumulatorTest):
     self.assertEqual(acc.Scalars('s1'), [s1])
     self.assertEqual(acc.Scalars('s2'), [s2])
 
+  def testScalarsAreAddedInChunks(self):
+    """Tests that grouping scalars by tag matches processing each event."""
+    self.stubs.Set(ea, '_SCALAR_CHUNK_EVENTS', 7)
+
+    def _AddEvents(gen):
+      for i in xrange(30):
+        gen.AddScalar('s1', wall_time=i, step=i, value=i)
+        gen.AddScalar('s2', wall_time=i, step=i, value=-i)
+        if i % 4 == 0:
+          gen.AddHistogram('hst1', wall_time=i, step=i)
+      # Restarts that purge the events after step 10.
+      gen.AddScalar('s1', wall_time=30, step=10, value=100)
+      for i in xrange(11, 20):
+        gen.AddScalar('s2', wall_time=20 + i, step=i, value=i)
+
+    gen = _EventGenerator(self)
+    _AddEvents(gen)
+    acc = ea.EventAccumulator(gen, size_guidance={ea.SCALARS: 5})
+    acc.Reload()
+
+    expected_gen = _EventGenerator(self)
+    _AddEvents(expected_gen)
+    expected = ea.EventAccumulator(expected_gen,
+                                   size_guidance={ea.SCALARS: 5})
+    for event in expected_gen.Load():
+      expected._ProcessEvent(event)
+
+    for tag in ('s1', 's2'):
+      self.assertEqual(expected.Scalars(tag), acc.Scalars(tag))
+    self.assertEqual(expected.Histograms('hst1'), acc.Histograms('hst1'))
+    self.assertEqual(expected.most_recent_step, acc.most_recent_step)
+    self.assertEqual(expected.FirstEventTimestamp(), acc.FirstEventTimestamp())
+
+  def testStepStratifiedSizeGuidance(self):
+    gen = _EventGenerator(self)
+    acc = ea.EventAccumulator(gen, size_guidance={
+        ea.SCALARS: reservoir.StepStratifiedSize(size=12, keep_extrema=True),
+        ea.HISTOGRAMS: reservoir.StepStratifiedSize(size=4,
+                                                    keep_extrema=False),
+    })
+    for i in xrange(1000):
+      gen.AddScalar('s1', wall_time=i, step=i, value=100 if i == 777 else 0)
+      gen.AddHistogram('hst1', wall_time=i, step=i)
+    acc.Reload()
+    scalars = acc.Scalars('s1')
+    self.assertLessEqual(len(scalars), 12)
+    self.assertEqual(scalars[0].step, 0)
+    self.assertEqual(scalars[-1].step, 999)
+    self.assertIn(ea.ScalarEvent(wall_time=777, step=777, value=100), scalars)
+    self.assertEqual(acc.ScalarColumns('s1').steps.tolist(),
+                     [s.step for s in scalars])
+    self.assertEqual([h.step for h in acc.Histograms('hst1')], [0, 512, 999])
+
+  def testPayloadByteBudgets(self):
+    gen = _EventGenerator(self)
+    acc = ea.EventAccumulator(
+        gen,
+        size_guidance={ea.IMAGES: 0, ea.AUDIO: 0},
+        payload_bytes_guidance={ea.IMAGES: 1000},
+        max_payload_bytes=1500)
+    for i in xrange(50):
+      gen.AddImage('im1', wall_time=i, step=i, encoded_image_string=b'x' * 100)
+      gen.AddAudio('snd1', wall_time=i, step=i, encoded_audio_string=b'y' * 50)
+    acc.Reload()
+    payload_bytes = acc.PayloadBytes()
+    self.assertItemsEqual(payload_bytes.keys(), [ea.IMAGES, ea.AUDIO,
+                                                 ea.TENSORS])
+    self.assertEqual(payload_bytes[ea.TENSORS], {})
+    image_bytes = payload_bytes[ea.IMAGES]['im1']
+    audio_bytes = payload_bytes[ea.AUDIO]['snd1']
+    self.assertEqual(image_bytes, 100 * len(acc.Images('im1')))
+    self.assertEqual(audio_bytes, 50 * len(acc.Audio('snd1')))
+    self.assertLessEqual(image_bytes, 1000)
+    self.assertLessEqual(image_bytes + audio_bytes, 1500)
+    self.assertEqual(acc.TotalPayloadBytes(), image_bytes + audio_bytes)
+    self.assertEqual(acc.Images('im1')[-1].step, 49)
+    self.assertEqual(acc.Audio('snd1')[-1].step, 49)
+
+  def testNumLoaded(self):
+    gen = _EventGenerator(self)
+    acc = ea.EventAccumulator(gen)
+    gen.AddScalar('s1', wall_time=1, step=1, value=1)
+    gen.AddScalar('s1', wall_time=2, step=2, value=2)
+    acc.Reload()
+    self.assertEqual(acc.NumLoaded(), 2)
+    acc.Reload()
+    self.assertEqual(acc.NumLoaded(), 2)
+
+  def testTagIndexTakesOverTheGenerator(self):
+    gen = _EventGenerator(self)
+    acc = ea.EventAccumulator(gen)
+    gen.AddScalar('s1', wall_time=5)
+    gen.AddImage('im1')
+    acc.Reload()
+    index = acc.TagIndex()
+    gen.AddHistogram('hst1')
+    gen.AddHealthPill(13371337, 41, '/job:localhost/replica:0/task:0/cpu:0',
+                      'Add', 0, list(range(1, 13)))
+    index.Reload()
+    acc.Reload()
+    self.assertTagsEqual(acc.Tags(), {
+        ea.SCALARS: ['s1'],
+        ea.IMAGES: ['im1'],
+    })
+    self.assertTagsEqual(index.Tags(), {
+        ea.SCALARS: ['s1'],
+        ea.IMAGES: ['im1'],
+        ea.HISTOGRAMS: ['hst1'],
+        ea.COMPRESSED_HISTOGRAMS: ['hst1'],
+    })
+    self.assertEqual(index.FirstEventTimestamp(), 5)
+
+  def testMemoryUsageAndShed(self):
+    gen = _EventGenerator(self)
+    acc = ea.EventAccumulator(gen)
+    for i in xrange(3):
+      gen.AddScalar('s1', wall_time=i, step=i, value=i)
+      gen.AddImage('im1', wall_time=i, step=i, encoded_image_string=b'x' * 1000)
+      gen.AddHistogram('hst1', wall_time=i, step=i, hbucket_limit=[1, 2, 3],
+                       hbucket=[0, 3, 0])
+    acc.Reload()
+    usage = acc.MemoryUsage()
+    # float64 wall times, int64 steps and float32 values.
+    self.assertEqual(usage[ea.SCALARS], {'s1': 3 * 20})
+    self.assertGreater(usage[ea.IMAGES]['im1'], 3 * 1000)
+    self.assertGreater(usage[ea.COMPRESSED_HISTOGRAMS]['hst1'], 0)
+    self.assertEqual(usage[ea.AUDIO], {})
+
+    self.assertEqual(acc.Shed(ea.IMAGES), 3)
+    self.assertEqual(acc.Images('im1'), [])
+    self.assertEqual(acc.Tags()[ea.IMAGES], ['im1'])
+    self.assertEqual(acc.MemoryUsage()[ea.IMAGES], {'im1': 0})
+    self.assertEqual(acc.TotalPayloadBytes(), 0)
+    self.assertEqual(len(acc.CompressedHistograms('hst1')), 3)
+    with self.assertRaises(ValueError):
+      acc.Shed(ea.GRAPH)
+
+  def testOnlyScalarsKeepExtrema(self):
+    with self.assertRaises(ValueError):
+      ea.EventAccumulator(_EventGenerator(self), size_guidance={
+          ea.IMAGES: reservoir.StepStratifiedSize(size=12, keep_extrema=True)
+      })
+
+  def testScalarColumns(self):
+    gen = _EventGenerator(self)
+    acc = ea.EventAccumulator(gen)
+    gen.AddScalar('s1', wall_time=1, step=10, value=32)
+    gen.AddScalar('s1', wall_time=2, step=12, value=0.5)
+    acc.Reload()
+    columns = acc.ScalarColumns('s1')
+    self.assertEqual(columns.wall_times.tolist(), [1.0, 2.0])
+    self.assertEqual(columns.steps.tolist(), [10, 12])
+    self.assertEqual(columns.values.tolist(), [32.0, 0.5])
+    self.assertEqual(columns.steps.dtype, np.int64)
+    with self.assertRaises(KeyError):
+      acc.ScalarColumns('s2')
+
   def _compareHealthPills(self, expected_event, gotten_event):
     """Compares 2 health pills.
 
@@ -889,6 +1049,97 @@ class RealisticEventAccumulatorTest(EventAccumulatorTest):
     self.assertProtoEquals(graph.as_graph_def(add_shapes=True), acc.Graph())
     self.assertProtoEquals(meta_graph_def, acc.MetaGraph())
 
+  def testPrefetchRealistically(self):
+    """Test that events read on a prefetch thread are all accumulated."""
+    directory = os.path.join(self.get_temp_dir(), 'prefetch_dir')
+    if tf.gfile.IsDirectory(directory):
+      tf.gfile.DeleteRecursively(directory)
+    tf.gfile.MkDir(directory)
+
+    writer = tf.summary.FileWriter(directory, max_queue=100)
+    for i in xrange(50):
+      writer.add_summary(
+          tf.Summary(value=[tf.Summary.Value(tag='id', simple_value=i)]), i)
+    writer.flush()
+
+    acc = ea.EventAccumulator(
+        directory,
+        record_reader=event_file_loader.BUFFERED_RECORD_READER,
+        prefetch_queue_depth=4)
+    acc.Reload()
+    self.assertEqual([e.step for e in acc.Scalars('id')], list(xrange(50)))
+    # One more record is the file_version event written by the FileWriter.
+    self.assertEqual(51, acc.PrefetchStats().records)
+    self.assertIsNone(ea.EventAccumulator(directory).PrefetchStats())
+
+  def testPayloadViewsRealistically(self):
+    """Test that images can be kept as views into a memory-mapped file."""
+    directory = os.path.join(self.get_temp_dir(), 'payload_views_dir')
+    if tf.gfile.IsDirectory(directory):
+      tf.gfile.DeleteRecursively(directory)
+    tf.gfile.MkDir(directory)
+
+    writer = tf.summary.FileWriter(directory, max_queue=100)
+    for i in xrange(3):
+      image = tf.Summary.Image(
+          encoded_image_string=b'image%d' % i, width=1, height=1)
+      writer.add_summary(
+          tf.Summary(value=[tf.Summary.Value(tag='im', image=image)]), i)
+    writer.flush()
+
+    acc = ea.EventAccumulator(
+        directory,
+        record_reader=event_file_loader.MMAP_RECORD_READER,
+        payload_views=True)
+    acc.Reload()
+    images = acc.Images('im')
+    self.assertEqual(3, len(images))
+    for i, image in enumerate(images):
+      self.assertEqual(i, image.step)
+      self.assertIsInstance(image.encoded_image_string, memoryview)
+      self.assertEqual(b'image%d' % i, image.encoded_image_string.tobytes())
+
+  def testDecoderPoolRealistically(self):
+    """Test that events decoded in worker processes match a plain reload."""
+    directory = os.path.join(self.get_temp_dir(), 'decoder_pool_dir')
+    if tf.gfile.IsDirectory(directory):
+      tf.gfile.DeleteRecursively(directory)
+    tf.gfile.MkDir(directory)
+
+    writer = tf.summary.FileWriter(directory, max_queue=100)
+    steps = list(xrange(20)) + list(xrange(10, 30))  # A restart at step 10.
+    for i, step in enumerate(steps):
+      writer.add_summary(
+          tf.Summary(value=[tf.Summary.Value(tag='id', simple_value=i),
+                            tf.Summary.Value(tag='sq', simple_value=i * i)]),
+          step)
+      if step == 5:
+        writer.add_summary(tf.Summary(value=[tf.Summary.Value(
+            tag='im', image=tf.Summary.Image(encoded_image_string=b'x'))]),
+                           step)
+    writer.flush()
+
+    pool = multiprocessing.Pool(2)
+    try:
+      acc = ea.EventAccumulator(directory, decoder_pool=pool)
+      acc.Reload()
+    finally:
+      pool.terminate()
+    expected = ea.EventAccumulator(
+        directory, record_reader=event_file_loader.BUFFERED_RECORD_READER)
+    expected.Reload()
+    self.assertEqual(expected.Tags(), acc.Tags())
+    for tag in ('id', 'sq'):
+      self.assertEqual(expected.Scalars(tag), acc.Scalars(tag))
+    self.assertEqual(expected.Images('im'), acc.Images('im'))
+    self.assertEqual(expected.most_recent_step, acc.most_recent_step)
+    self.assertEqual(expected.FirstEventTimestamp(), acc.FirstEventTimestamp())
+
+  def testDecoderPoolRejectsPayloadViews(self):
+    with self.assertRaises(ValueError):
+      ea.EventAccumulator(self.get_temp_dir(), payload_views=True,
+                          decoder_pool=object())
+
   def testGraphFromMetaGraphBecomesAvailable(self):
     """Test accumulator by writing values and then reading them."""
 
@@ -918,6 +1169,48 @@ class RealisticEventAccumulatorTest(EventAccumulatorTest):
     self.assertProtoEquals(graph.as_graph_def(add_shapes=True), acc.Graph())
     self.assertProtoEquals(meta_graph_def, acc.MetaGraph())
 
+  def testTagIndexRealistically(self):
+    """Test that the tag index lists the tags of an accumulator."""
+    directory = os.path.join(self.get_temp_dir(), 'tag_index_dir')
+    if tf.gfile.IsDirectory(directory):
+      tf.gfile.DeleteRecursively(directory)
+    tf.gfile.MkDir(directory)
+
+    writer = tf.summary.FileWriter(directory, max_queue=100)
+    with tf.Graph().as_default() as graph:
+      _ = tf.constant([2.0, 1.0])
+    writer.add_meta_graph(tf.train.export_meta_graph(
+        graph_def=graph.as_graph_def()))
+    run_metadata = tf.RunMetadata()
+    run_metadata.step_stats.dev_stats.add(device='test device')
+    writer.add_run_metadata(run_metadata, 'step1')
+    writer.add_summary(tf.Summary(value=[
+        tf.Summary.Value(tag='s1', simple_value=1.0),
+        tf.Summary.Value(
+            tag='im1',
+            image=tf.Summary.Image(encoded_image_string=b'img', width=1,
+                                   height=1)),
+        tf.Summary.Value(
+            tag='hst1',
+            histo=tf.HistogramProto(min=0, max=1, num=1, sum=1,
+                                    sum_squares=1, bucket_limit=[1],
+                                    bucket=[1])),
+    ]), 1)
+    writer.flush()
+
+    index = ea.EventTagIndex(directory)
+    index.Reload()
+    acc = ea.EventAccumulator(directory)
+    acc.Reload()
+    self.assertTagsEqual(index.Tags(), acc.Tags())
+    self.assertEqual(index.FirstEventTimestamp(), acc.FirstEventTimestamp())
+
+    writer.add_summary(
+        tf.Summary(value=[tf.Summary.Value(tag='s2', simple_value=2.0)]), 2)
+    writer.flush()
+    index.Reload()
+    self.assertItemsEqual(index.Tags()[ea.SCALARS], ['s1', 's2'])
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -114,13 +114,12 @@ from __future__ import print_function
 
 import collections
 import itertools
-import os
 
 import tensorflow as tf
 
 from tensorboard.backend.event_processing import event_accumulator
 from tensorboard.backend.event_processing import event_file_loader
-from tensorboard.backend.event_processing import event_multiplexer
+from tensorboard.backend.event_processing import io_wrapper
 
 FLAGS = tf.flags.FLAGS
 
@@ -322,15 +321,34 @@ def generators_from_logdir(logdir):
   Returns:
     List of event generators for each subdirectory with event files.
   """
-  subdirs = event_multiplexer.GetLogdirSubdirectories(logdir)
-  generators = [
-      itertools.chain(*[
-          generator_from_event_file(os.path.join(subdir, f))
-          for f in tf.gfile.ListDirectory(subdir)
-          if event_accumulator.IsTensorFlowEventsFile(os.path.join(subdir, f))
-      ]) for subdir in subdirs
+  return [
+      itertools.chain(*[generator_from_event_file(f) for f in event_files])
+      for _, event_files in event_files_by_subdirectory(logdir)
   ]
-  return generators
+
+
+def event_files_by_subdirectory(logdir):
+  """Finds the event files in each subdirectory of logdir.
+
+  The subdirectories are listed in parallel, and each is listed only once.
+
+  Args:
+    logdir: A log directory that contains event files.
+
+  Returns:
+    A list of (subdirectory, event_file_paths) tuples for each subdirectory
+    with event files, sorted by subdirectory. The paths are sorted too.
+
+  Raises:
+    ValueError: If logdir is a file.
+  """
+  if tf.gfile.Exists(logdir) and not tf.gfile.IsDirectory(logdir):
+    raise ValueError('event_files_by_subdirectory: path exists and is not a '
+                     'directory, %s' % logdir)
+  return sorted(
+      (subdir, sorted(filter(event_accumulator.IsTensorFlowEventsFile, files)))
+      for (subdir, files) in io_wrapper.ListRecursivelyInParallel(logdir)
+      if any(event_accumulator.IsTensorFlowEventsFile(f) for f in files))
 
 
 def generator_from_event_file(event_file):
@@ -355,14 +373,10 @@ def get_inspection_units(logdir='', event_file='', tag=''):
     A list of InspectionUnit objects.
   """
   if logdir:
-    subdirs = event_multiplexer.GetLogdirSubdirectories(logdir)
     inspection_units = []
-    for subdir in subdirs:
-      generator = itertools.chain(*[
-          generator_from_event_file(os.path.join(subdir, f))
-          for f in tf.gfile.ListDirectory(subdir)
-          if event_accumulator.IsTensorFlowEventsFile(os.path.join(subdir, f))
-      ])
+    for subdir, event_files in event_files_by_subdirectory(logdir):
+      generator = itertools.chain(
+          *[generator_from_event_file(f) for f in event_files])
       inspection_units.append(InspectionUnit(
           name=subdir,
           generator=generator,
@@ -18,34 +18,118 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
+import mmap
+import os
+import struct
+
+import six
 import tensorflow as tf
 
+from tensorboard.backend.event_processing import io_wrapper
 
-class EventFileLoader(object):
-  """An EventLoader is an iterator that yields Event protos."""
+## The record readers a loader can be backed by.
+# Reads one record at a time through the C++ PyRecordReader.
+PYWRAP_RECORD_READER = 'pywrap'
+# Reads large blocks and parses the TFRecord framing in Python.
+BUFFERED_RECORD_READER = 'buffered'
+# Memory-maps local files and parses records straight from the mapping. Falls
+# back to BUFFERED_RECORD_READER for remote paths.
+MMAP_RECORD_READER = 'mmap'
+
+RECORD_READERS = (PYWRAP_RECORD_READER, BUFFERED_RECORD_READER,
+                  MMAP_RECORD_READER)
+
+# A TFRecord is framed as:
+#   uint64 length
+#   uint32 masked crc32c of length
+#   byte   data[length]
+#   uint32 masked crc32c of data
+# with all integers little-endian.
+_HEADER = struct.Struct('<QI')
+_FOOTER = struct.Struct('<I')
+
+# The number of bytes the buffered reader requests from the file at once.
+_DEFAULT_BLOCK_SIZE = 16 * 1024 * 1024
+
+
+def _MakeCrc32cTable():
+  table = []
+  for i in range(256):
+    crc = i
+    for _ in range(8):
+      if crc & 1:
+        crc = (crc >> 1) ^ 0x82F63B78
+      else:
+        crc >>= 1
+    table.append(crc)
+  return table
+
+
+_CRC32C_TABLE = _MakeCrc32cTable()
+
+
+def _MaskedCrc32c(data):
+  """Computes the masked CRC-32C checksum that TFRecords use for framing."""
+  crc = 0xFFFFFFFF
+  table = _CRC32C_TABLE
+  for byte in bytearray(data):
+    crc = table[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+  crc ^= 0xFFFFFFFF
+  return (((crc >> 15) | (crc << 17)) + 0xA282EAD8) & 0xFFFFFFFF
+
+
+class RecordCorruptedError(Exception):
+  """Raised when the framing of a record fails its checksum."""
+  pass
+
+
+def FrameRecord(buf, pos, limit, verify_data_crc=False):
+  """Locates the data of the record that starts at `buf[pos]`.
+
+  Args:
+    buf: A bytes-like object holding the serialized records.
+    pos: The offset in `buf` at which the record starts.
+    limit: The offset in `buf` one past the last valid byte.
+    verify_data_crc: Whether to also check the checksum of the data. Checking
+      the length checksum is cheap and always done, but checking the data in
+      Python costs time proportional to the size of the record.
+
+  Returns:
+    A `(data_start, data_end, next_pos)` tuple, or None if the record is
+    truncated, i.e. it has not been completely written yet.
+
+  Raises:
+    RecordCorruptedError: If a checksum does not match.
+  """
+  if limit - pos < _HEADER.size:
+    return None
+  length, length_crc = _HEADER.unpack_from(buf, pos)
+  if _MaskedCrc32c(buf[pos:pos + 8]) != length_crc:
+    raise RecordCorruptedError('Bad length checksum at offset %d' % pos)
+  data_start = pos + _HEADER.size
+  data_end = data_start + length
+  next_pos = data_end + _FOOTER.size
+  if next_pos > limit:
+    return None
+  if verify_data_crc:
+    data_crc, = _FOOTER.unpack_from(buf, data_end)
+    if _MaskedCrc32c(buf[data_start:data_end]) != data_crc:
+      raise RecordCorruptedError('Bad data checksum at offset %d' % pos)
+  return data_start, data_end, next_pos
+
+
+class _PywrapRecordReader(object):
+  """Yields records one at a time through `tf.pywrap_tensorflow`."""
 
   def __init__(self, file_path):
-    if file_path is None:
-      raise ValueError('A file path is required')
-    file_path = tf.resource_loader.readahead_file_path(file_path)
-    tf.logging.debug('Opening a record reader pointing at %s', file_path)
     with tf.errors.raise_exception_on_not_ok_status() as status:
       self._reader = tf.pywrap_tensorflow.PyRecordReader_New(
           tf.compat.as_bytes(file_path), 0, tf.compat.as_bytes(''), status)
-    # Store it for logging purposes.
-    self._file_path = file_path
     if not self._reader:
       raise IOError('Failed to open a record reader pointing to %s' % file_path)
 
-  def Load(self):
-    """Loads all new values from disk.
-
-    Calling Load multiple times in a row will not 'drop' events as long as the
-    return value is not iterated over.
-
-    Yields:
-      All values that were written to disk that have not been yielded yet.
-    """
+  def Records(self):
     while True:
       try:
         with tf.errors.raise_exception_on_not_ok_status() as status:
@@ -54,12 +138,439 @@ class EventFileLoader(object):
         # We ignore partial read exceptions, because a record may be truncated.
         # PyRecordReader holds the offset prior to the failed read, so retrying
         # will succeed.
-        break
-      event = tf.Event()
-      event.ParseFromString(self._reader.record())
-      yield event
+        return
+      yield self._reader.record()
+
+  def Close(self):
+    self._reader = None
+
+
+class BufferedRecordReader(object):
+  """Yields records by reading large blocks and parsing the framing in Python.
+
+  This avoids the per-record overhead of a C++ round trip. Like
+  PyRecordReader, a record that has only been partially written is not
+  yielded; the reader holds on to the bytes it has seen and retries the record
+  when `Records` is next called.
+  """
+
+  def __init__(self, file_path, block_size=_DEFAULT_BLOCK_SIZE,
+               verify_data_crc=False, offset=0):
+    """Constructs a BufferedRecordReader.
+
+    Args:
+      file_path: The path of the record file.
+      block_size: The number of bytes to request from the file at once.
+      verify_data_crc: Whether to check the checksum of each record's data.
+      offset: The offset in the file of the first record to read.
+    """
+    self._file_path = file_path
+    self._block_size = block_size
+    self._verify_data_crc = verify_data_crc
+    self._file = None
+    # The bytes read but not yet yielded, and the file offset right after them.
+    self._buffer = b''
+    self._pos = 0
+    self._file_offset = offset
+
+  def Offset(self):
+    """Returns the offset in the file of the next record to be yielded."""
+    return self._file_offset - (len(self._buffer) - self._pos)
+
+  def _Fill(self, min_bytes):
+    """Reads at least `min_bytes` more bytes into the buffer, if available."""
+    if self._file is None:
+      self._file = tf.gfile.GFile(self._file_path, 'rb')
+      self._file.seek(self._file_offset)
+    chunk = self._file.read(max(self._block_size, min_bytes))
+    if not chunk:
+      # GFile does not notice bytes appended after it has hit the end of the
+      # file, so reopen it the next time we need more data.
+      self._file.close()
+      self._file = None
+      return False
+    self._file_offset += len(chunk)
+    self._buffer = self._buffer[self._pos:] + chunk
+    self._pos = 0
+    return True
+
+  def Records(self):
+    wanted = _HEADER.size
+    while True:
+      available = len(self._buffer) - self._pos
+      if available < wanted and not self._Fill(wanted - available):
+        return
+      try:
+        frame = FrameRecord(self._buffer, self._pos, len(self._buffer),
+                            self._verify_data_crc)
+      except RecordCorruptedError as e:
+        # PyRecordReader surfaces this as a DataLossError, which is ignored in
+        # the same way as a truncated record.
+        tf.logging.debug('Corrupted record in %s: %s', self._file_path, e)
+        return
+      if frame is None:
+        # Either the block boundary fell inside this record or the record is
+        # still being written; ask for enough bytes to cover all of it.
+        if len(self._buffer) - self._pos >= _HEADER.size:
+          length, _ = _HEADER.unpack_from(self._buffer, self._pos)
+          wanted = _HEADER.size + length + _FOOTER.size
+        else:
+          wanted = _HEADER.size
+        if not self._Fill(wanted - (len(self._buffer) - self._pos)):
+          return
+        continue
+      data_start, data_end, next_pos = frame
+      self._pos = next_pos
+      wanted = _HEADER.size
+      yield self._buffer[data_start:data_end]
+
+  def Close(self):
+    """Closes the file, if it is open. `Records` reopens it when called."""
+    if self._file is not None:
+      self._file.close()
+      self._file = None
+
+
+class MmapRecordReader(object):
+  """Yields records as views into a memory mapping of a local file.
+
+  The mapping is refreshed whenever the size of the file changes. Views that
+  were handed out keep the mapping they point into alive, so they stay valid
+  after a refresh; this relies on event files only ever being appended to.
+  """
+
+  def __init__(self, file_path):
+    self._file_path = file_path
+    self._file = open(file_path, 'rb')
+    self._map = None
+    self._view = None
+    self._size = 0
+    self._offset = 0
+
+  def __del__(self):
+    # The file is missing if opening it failed.
+    if getattr(self, '_file', None) is not None:
+      self.Close()
+
+  def Close(self):
+    """Closes the file, and the mapping unless views into it are still alive.
+
+    `Records` must not be called afterwards.
+    """
+    if self._file is None:
+      return
+    self._file.close()
+    self._file = None
+    self._view = None
+    if self._map is not None:
+      try:
+        self._map.close()
+      except BufferError:
+        # Records handed out still point into the mapping; it is unmapped once
+        # the last of them is gone.
+        pass
+      self._map = None
+
+  def _Refresh(self):
+    size = os.fstat(self._file.fileno()).st_size
+    if size != self._size and size > 0:
+      tf.logging.debug('Mapping %d bytes of %s', size, self._file_path)
+      # The old mapping is not closed: outstanding views may still refer to it,
+      # and it is unmapped once the last of them is gone.
+      self._map = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+      try:
+        self._view = memoryview(self._map)
+      except TypeError:
+        # Python 2 mmaps do not support memoryview; slices are copies there.
+        self._view = self._map
+      self._size = size
+
+  def Records(self):
+    self._Refresh()
+    while True:
+      try:
+        frame = FrameRecord(self._map, self._offset, self._size)
+      except RecordCorruptedError as e:
+        tf.logging.debug('Corrupted record in %s: %s', self._file_path, e)
+        return
+      if frame is None:
+        return
+      data_start, data_end, self._offset = frame
+      yield self._view[data_start:data_end]
+
+
+def _MakeRecordReader(file_path, record_reader):
+  if record_reader == PYWRAP_RECORD_READER:
+    return _PywrapRecordReader(file_path)
+  elif record_reader == BUFFERED_RECORD_READER:
+    return BufferedRecordReader(file_path)
+  elif record_reader == MMAP_RECORD_READER:
+    if io_wrapper.IsLocalPath(file_path):
+      return MmapRecordReader(file_path)
+    tf.logging.debug('Cannot mmap %s, reading it with a buffered reader',
+                     file_path)
+    return BufferedRecordReader(file_path)
+  else:
+    raise ValueError('Unknown record reader %r, must be one of %s' %
+                     (record_reader, RECORD_READERS))
+
+
+class RawEventFileLoader(object):
+  """An iterator that yields serialized Event protos from a record file."""
+
+  def __init__(self, file_path, record_reader=PYWRAP_RECORD_READER):
+    """Constructs a RawEventFileLoader.
+
+    Args:
+      file_path: The path of the record file.
+      record_reader: One of `RECORD_READERS`, selecting how records are read.
+
+    Raises:
+      ValueError: If file_path is None or record_reader is unknown.
+    """
+    if file_path is None:
+      raise ValueError('A file path is required')
+    if record_reader != MMAP_RECORD_READER:
+      file_path = tf.resource_loader.readahead_file_path(file_path)
+    tf.logging.debug('Opening a %s record reader pointing at %s', record_reader,
+                     file_path)
+    self._reader = _MakeRecordReader(file_path, record_reader)
+    # Store it for logging purposes.
+    self._file_path = file_path
+
+  def Load(self):
+    """Loads all new serialized events from disk.
+
+    Calling Load multiple times in a row will not 'drop' events as long as the
+    return value is not iterated over.
+
+    Yields:
+      All serialized events that were written to disk that have not been
+      yielded yet. These are byte strings, or memoryviews when reading with
+      MMAP_RECORD_READER.
+    """
+    for record in self._reader.Records():
+      yield record
     tf.logging.debug('No more events in %s', self._file_path)
 
+  def Close(self):
+    """Releases the files held by the loader. `Load` must not be called after."""
+    self._reader.Close()
+
+
+class EventFileLoader(RawEventFileLoader):
+  """An EventLoader is an iterator that yields Event protos."""
+
+  def Load(self):
+    """Loads all new values from disk.
+
+    Calling Load multiple times in a row will not 'drop' events as long as the
+    return value is not iterated over.
+
+    Yields:
+      All values that were written to disk that have not been yielded yet.
+    """
+    for record in super(EventFileLoader, self).Load():
+      yield ParseEvent(record)
+
+
+def ParseEvent(record):
+  """Parses a serialized record yielded by RawEventFileLoader into an Event."""
+  if isinstance(record, memoryview):
+    # Not every protobuf implementation can parse from a buffer.
+    record = record.tobytes()
+  event = tf.Event()
+  event.ParseFromString(record)
+  return event
+
+
+# Field numbers of the protos walked by ScanPayloadViews and OutlineEvent.
+_EVENT_WALL_TIME_FIELD = 1
+_EVENT_GRAPH_DEF_FIELD = 4
+_EVENT_SUMMARY_FIELD = 5
+_EVENT_TAGGED_RUN_METADATA_FIELD = 8
+_EVENT_META_GRAPH_DEF_FIELD = 9
+_SUMMARY_VALUE_FIELD = 1
+_VALUE_TAG_FIELD = 1
+_VALUE_IMAGE_FIELD = 4
+_VALUE_AUDIO_FIELD = 6
+_VALUE_NODE_NAME_FIELD = 7
+# Both Summary.Image.encoded_image_string and Summary.Audio.encoded_audio_string.
+_ENCODED_STRING_FIELD = 4
+_TAGGED_RUN_METADATA_TAG_FIELD = 1
+_META_GRAPH_DEF_GRAPH_DEF_FIELD = 2
+# The fields of the `value` oneof of Summary.Value, by field number.
+_VALUE_ONEOF_FIELDS = {
+    2: 'simple_value',
+    3: 'obsolete_old_style_histogram',
+    4: 'image',
+    5: 'histo',
+    6: 'audio',
+    8: 'tensor',
+}
+
+_WIRETYPE_VARINT = 0
+_WIRETYPE_FIXED64 = 1
+_WIRETYPE_LENGTH_DELIMITED = 2
+_WIRETYPE_FIXED32 = 5
+
+
+def _DecodeVarint(buf, pos):
+  result = 0
+  shift = 0
+  while True:
+    byte = six.indexbytes(buf, pos)
+    pos += 1
+    result |= (byte & 0x7F) << shift
+    if not byte & 0x80:
+      return result, pos
+    shift += 7
+
+
+def _WireFields(buf, start, end):
+  """Yields `(field_number, wire_type, start, end)` for every field.
+
+  For length-delimited fields, `start` and `end` delimit the contents without
+  the length, and otherwise the encoded value.
+  """
+  pos = start
+  while pos < end:
+    key, pos = _DecodeVarint(buf, pos)
+    wire_type = key & 0x7
+    field_start = pos
+    if wire_type == _WIRETYPE_VARINT:
+      _, pos = _DecodeVarint(buf, pos)
+    elif wire_type == _WIRETYPE_FIXED64:
+      pos += 8
+    elif wire_type == _WIRETYPE_FIXED32:
+      pos += 4
+    elif wire_type == _WIRETYPE_LENGTH_DELIMITED:
+      length, field_start = _DecodeVarint(buf, pos)
+      pos = field_start + length
+    else:
+      raise ValueError('Unsupported wire type %d' % wire_type)
+    yield key >> 3, wire_type, field_start, pos
+
+
+def _LengthDelimitedFields(buf, start, end):
+  """Yields `(field_number, start, end)` for the submessages and strings."""
+  for field, wire_type, field_start, field_end in _WireFields(buf, start, end):
+    if wire_type == _WIRETYPE_LENGTH_DELIMITED:
+      yield field, field_start, field_end
+
+
+def _Fields(buf, field_number, start, end):
+  """Yields `(start, end)` of each occurrence of a length-delimited field."""
+  for field, field_start, field_end in _LengthDelimitedFields(buf, start, end):
+    if field == field_number:
+      yield field_start, field_end
+
+
+def ScanPayloadViews(record):
+  """Finds the image and audio payloads in a serialized Event.
+
+  This walks the protobuf wire format rather than parsing the Event, so that
+  the payloads can be kept as views into `record` instead of as copies.
+
+  Args:
+    record: A serialized Event, as yielded by RawEventFileLoader.
+
+  Returns:
+    A dict mapping the index of a `Summary.Value` within the Event to a
+    memoryview of its encoded image or audio string.
+  """
+  view = memoryview(record)
+  payloads = {}
+  index = 0
+  for start, end in _Fields(view, _EVENT_SUMMARY_FIELD, 0, len(view)):
+    for value_start, value_end in _Fields(view, _SUMMARY_VALUE_FIELD, start,
+                                          end):
+      for field, datum_start, datum_end in _LengthDelimitedFields(
+          view, value_start, value_end):
+        if field in (_VALUE_IMAGE_FIELD, _VALUE_AUDIO_FIELD):
+          for string_start, string_end in _Fields(
+              view, _ENCODED_STRING_FIELD, datum_start, datum_end):
+            payloads[index] = view[string_start:string_end]
+      index += 1
+  return payloads
+
+
+# What an Event adds to the tags of a run. `graph_def` is whether the Event
+# holds a GraphDef, either directly or in its MetaGraphDef. `summary_values`
+# holds a `(summary_type, tag, node_name)` tuple for each Summary.Value, where
+# `summary_type` is the name of the field set in its `value` oneof, or None.
+EventOutline = collections.namedtuple('EventOutline', [
+    'wall_time', 'graph_def', 'meta_graph_def', 'run_metadata_tags',
+    'summary_values'
+])
+
+
+def _String(buf, start, end):
+  return buf[start:end].tobytes().decode('utf-8')
+
+
+def MetaGraphHasGraphDef(serialized_meta_graph_def):
+  """Returns whether a serialized MetaGraphDef holds a GraphDef."""
+  view = memoryview(serialized_meta_graph_def)
+  return any(_Fields(view, _META_GRAPH_DEF_GRAPH_DEF_FIELD, 0, len(view)))
+
+
+def OutlineEvent(record):
+  """Reads what a serialized Event adds to the tags of a run.
+
+  Like ScanPayloadViews, this walks the protobuf wire format, and skips over
+  the graphs and summary data without decoding them.
+
+  Args:
+    record: A serialized Event, as yielded by RawEventFileLoader.
+
+  Returns:
+    An `EventOutline`.
+  """
+  view = memoryview(record)
+  wall_time = 0.0
+  graph_def = False
+  meta_graph_def = False
+  run_metadata_tags = []
+  summary_values = []
+  for field, wire_type, start, end in _WireFields(view, 0, len(view)):
+    if field == _EVENT_WALL_TIME_FIELD and wire_type == _WIRETYPE_FIXED64:
+      wall_time, = struct.unpack('<d', view[start:end].tobytes())
+    elif wire_type != _WIRETYPE_LENGTH_DELIMITED:
+      continue
+    elif field == _EVENT_GRAPH_DEF_FIELD:
+      graph_def = True
+    elif field == _EVENT_META_GRAPH_DEF_FIELD:
+      meta_graph_def = True
+      graph_def = graph_def or any(
+          _Fields(view, _META_GRAPH_DEF_GRAPH_DEF_FIELD, start, end))
+    elif field == _EVENT_TAGGED_RUN_METADATA_FIELD:
+      tag = ''
+      for tag_start, tag_end in _Fields(view, _TAGGED_RUN_METADATA_TAG_FIELD,
+                                        start, end):
+        tag = _String(view, tag_start, tag_end)
+      run_metadata_tags.append(tag)
+    elif field == _EVENT_SUMMARY_FIELD:
+      for value_start, value_end in _Fields(view, _SUMMARY_VALUE_FIELD, start,
+                                            end):
+        summary_type = None
+        tag = ''
+        node_name = ''
+        for value_field, _, datum_start, datum_end in _WireFields(
+            view, value_start, value_end):
+          if value_field == _VALUE_TAG_FIELD:
+            tag = _String(view, datum_start, datum_end)
+          elif value_field == _VALUE_NODE_NAME_FIELD:
+            node_name = _String(view, datum_start, datum_end)
+          elif value_field in _VALUE_ONEOF_FIELDS:
+            # The last field of a oneof on the wire is the one that is set.
+            summary_type = _VALUE_ONEOF_FIELDS[value_field]
+        summary_values.append((summary_type, tag, node_name))
+  return EventOutline(wall_time=wall_time, graph_def=graph_def,
+                      meta_graph_def=meta_graph_def,
+                      run_metadata_tags=run_metadata_tags,
+                      summary_values=summary_values)
+
 
 def main(argv):
   if len(argv) != 2:
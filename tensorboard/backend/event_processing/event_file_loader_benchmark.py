@@ -0,0 +1,99 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmarks for the record readers backing event_file_loader.
+
+Every reader loads the same event file, so the reported wall times are
+directly comparable. Run with:
+
+  bazel run //tensorboard/backend/event_processing:event_file_loader_benchmark \
+      -- --benchmarks=.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import time
+
+from six.moves import xrange  # pylint: disable=redefined-builtin
+import tensorflow as tf
+
+from tensorboard.backend.event_processing import event_file_loader
+
+_NUM_EVENTS = 200000
+
+
+def _WriteEventFile(path, num_events):
+  """Writes a file of scalar summary events, like a typical training run."""
+  with tf.python_io.TFRecordWriter(path) as writer:
+    for i in xrange(num_events):
+      event = tf.Event(
+          wall_time=1500000000.0 + i,
+          step=i,
+          summary=tf.Summary(value=[
+              tf.Summary.Value(tag='loss', simple_value=1.0 / (i + 1)),
+              tf.Summary.Value(tag='accuracy', simple_value=i / num_events),
+          ]))
+      writer.write(event.SerializeToString())
+
+
+class EventFileLoaderBenchmark(tf.test.Benchmark):
+
+  _path = None
+
+  def _EventFilePath(self):
+    if EventFileLoaderBenchmark._path is None:
+      path = os.path.join(tf.test.get_temp_dir(), 'events.out.tfevents.bench')
+      _WriteEventFile(path, _NUM_EVENTS)
+      EventFileLoaderBenchmark._path = path
+    return EventFileLoaderBenchmark._path
+
+  def _Benchmark(self, loader_class, record_reader, iters=3):
+    path = self._EventFilePath()
+    wall_times = []
+    for _ in xrange(iters):
+      loader = loader_class(path, record_reader=record_reader)
+      start = time.time()
+      num_loaded = sum(1 for _ in loader.Load())
+      wall_times.append(time.time() - start)
+      assert num_loaded == _NUM_EVENTS, num_loaded
+    wall_time = min(wall_times)
+    self.report_benchmark(
+        iters=iters,
+        wall_time=wall_time,
+        name='%s_%s' % (loader_class.__name__, record_reader),
+        extras={'records_per_second': _NUM_EVENTS / wall_time,
+                'file_bytes': os.path.getsize(path)})
+
+  def benchmarkRawPywrapRecordReader(self):
+    self._Benchmark(event_file_loader.RawEventFileLoader,
+                    event_file_loader.PYWRAP_RECORD_READER)
+
+  def benchmarkRawBufferedRecordReader(self):
+    self._Benchmark(event_file_loader.RawEventFileLoader,
+                    event_file_loader.BUFFERED_RECORD_READER)
+
+  def benchmarkPywrapRecordReader(self):
+    self._Benchmark(event_file_loader.EventFileLoader,
+                    event_file_loader.PYWRAP_RECORD_READER)
+
+  def benchmarkBufferedRecordReader(self):
+    self._Benchmark(event_file_loader.EventFileLoader,
+                    event_file_loader.BUFFERED_RECORD_READER)
+
+
+if __name__ == '__main__':
+  tf.test.main()
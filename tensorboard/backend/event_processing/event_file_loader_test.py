@@ -32,6 +32,7 @@ class EventFileLoaderTest(tf.test.TestCase):
   # A record containing a simple event.
   RECORD = (b'\x18\x00\x00\x00\x00\x00\x00\x00\xa3\x7fK"\t\x00\x00\xc0%\xddu'
             b'\xd5A\x1a\rbrain.Event:1\xec\xf32\x8d')
+  RECORD_READER = event_file_loader.PYWRAP_RECORD_READER
 
   def _WriteToFile(self, filename, data):
     with open(filename, 'ab') as f:
@@ -39,7 +40,8 @@ class EventFileLoaderTest(tf.test.TestCase):
 
   def _LoaderForTestFile(self, filename):
     return event_file_loader.EventFileLoader(
-        os.path.join(self.get_temp_dir(), filename))
+        os.path.join(self.get_temp_dir(), filename),
+        record_reader=self.RECORD_READER)
 
   def testEmptyEventFile(self):
     filename = tempfile.NamedTemporaryFile(dir=self.get_temp_dir()).name
@@ -88,6 +90,156 @@ class EventFileLoaderTest(tf.test.TestCase):
     loader = self._LoaderForTestFile(filename)
     self.assertEqual(len(list(loader.Load())), 2)
 
+  def testTruncatedRecordIsLoadedOnceComplete(self):
+    filename = tempfile.NamedTemporaryFile(dir=self.get_temp_dir()).name
+    self._WriteToFile(filename, EventFileLoaderTest.RECORD)
+    self._WriteToFile(filename, EventFileLoaderTest.RECORD[:20])
+    loader = self._LoaderForTestFile(filename)
+    self.assertEqual(len(list(loader.Load())), 1)
+    self.assertEqual(len(list(loader.Load())), 0)
+    self._WriteToFile(filename, EventFileLoaderTest.RECORD[20:])
+    events = list(loader.Load())
+    self.assertEqual(len(events), 1)
+    self.assertEqual(events[0].wall_time, 1440183447.0)
+
+  def testUnknownRecordReader(self):
+    with self.assertRaises(ValueError):
+      event_file_loader.EventFileLoader('/tmp/foo', record_reader='bogus')
+
+
+class BufferedEventFileLoaderTest(EventFileLoaderTest):
+  RECORD_READER = event_file_loader.BUFFERED_RECORD_READER
+
+  def testRecordsSpanningBlocks(self):
+    filename = tempfile.NamedTemporaryFile(dir=self.get_temp_dir()).name
+    for _ in range(10):
+      self._WriteToFile(filename, EventFileLoaderTest.RECORD)
+    loader = self._LoaderForTestFile(filename)
+    loader._reader._block_size = 7
+    events = list(loader.Load())
+    self.assertEqual(len(events), 10)
+    self.assertEqual(events[-1].wall_time, 1440183447.0)
+
+  def testCorruptedLengthIsNotYielded(self):
+    filename = tempfile.NamedTemporaryFile(dir=self.get_temp_dir()).name
+    self._WriteToFile(filename, EventFileLoaderTest.RECORD)
+    self._WriteToFile(filename, b'\x19' + EventFileLoaderTest.RECORD[1:])
+    loader = self._LoaderForTestFile(filename)
+    self.assertEqual(len(list(loader.Load())), 1)
+
+  def testFrameRecord(self):
+    record = EventFileLoaderTest.RECORD
+    self.assertEqual(
+        event_file_loader.FrameRecord(record, 0, len(record), True),
+        (12, 36, 40))
+    self.assertIsNone(
+        event_file_loader.FrameRecord(record, 0, len(record) - 1, True))
+    with self.assertRaises(event_file_loader.RecordCorruptedError):
+      event_file_loader.FrameRecord(record[:-1] + b'\x00', 0, len(record), True)
+
+
+class MmapEventFileLoaderTest(EventFileLoaderTest):
+  RECORD_READER = event_file_loader.MMAP_RECORD_READER
+
+  def testRecordsAreViews(self):
+    filename = tempfile.NamedTemporaryFile(dir=self.get_temp_dir()).name
+    self._WriteToFile(filename, EventFileLoaderTest.RECORD)
+    loader = event_file_loader.RawEventFileLoader(
+        filename, record_reader=self.RECORD_READER)
+    records = list(loader.Load())
+    self.assertEqual(len(records), 1)
+    self.assertIsInstance(records[0], memoryview)
+    self.assertEqual(records[0].tobytes(), EventFileLoaderTest.RECORD[12:36])
+
+  def testViewsOutliveRemapping(self):
+    filename = tempfile.NamedTemporaryFile(dir=self.get_temp_dir()).name
+    self._WriteToFile(filename, EventFileLoaderTest.RECORD)
+    loader = event_file_loader.RawEventFileLoader(
+        filename, record_reader=self.RECORD_READER)
+    first, = list(loader.Load())
+    self._WriteToFile(filename, EventFileLoaderTest.RECORD)
+    second, = list(loader.Load())
+    self.assertEqual(first.tobytes(), second.tobytes())
+
+  def testCloseKeepsViewsValid(self):
+    filename = tempfile.NamedTemporaryFile(dir=self.get_temp_dir()).name
+    self._WriteToFile(filename, EventFileLoaderTest.RECORD)
+    loader = event_file_loader.RawEventFileLoader(
+        filename, record_reader=self.RECORD_READER)
+    record, = list(loader.Load())
+    loader.Close()
+    self.assertEqual(record.tobytes(), EventFileLoaderTest.RECORD[12:36])
+
+
+class ScanPayloadViewsTest(tf.test.TestCase):
+
+  def testFindsImageAndAudioPayloads(self):
+    event = tf.Event(
+        wall_time=1,
+        step=2,
+        summary=tf.Summary(value=[
+            tf.Summary.Value(tag='scalar', simple_value=1.0),
+            tf.Summary.Value(
+                tag='image',
+                image=tf.Summary.Image(
+                    encoded_image_string=b'imgstr', width=3, height=4)),
+            tf.Summary.Value(
+                tag='audio',
+                audio=tf.Summary.Audio(
+                    encoded_audio_string=b'sndstr', sample_rate=44100)),
+        ]))
+    payloads = event_file_loader.ScanPayloadViews(event.SerializeToString())
+    self.assertEqual(sorted(payloads), [1, 2])
+    self.assertEqual(payloads[1].tobytes(), b'imgstr')
+    self.assertEqual(payloads[2].tobytes(), b'sndstr')
+
+  def testEventWithoutSummary(self):
+    event = tf.Event(wall_time=1, step=2, file_version='brain.Event:2')
+    self.assertEqual(
+        event_file_loader.ScanPayloadViews(event.SerializeToString()), {})
+
+
+class OutlineEventTest(tf.test.TestCase):
+
+  def testOutlinesSummaryValues(self):
+    event = tf.Event(
+        wall_time=1.5,
+        step=2,
+        summary=tf.Summary(value=[
+            tf.Summary.Value(tag='scalar', simple_value=1.0),
+            tf.Summary.Value(
+                tag='image',
+                image=tf.Summary.Image(encoded_image_string=b'imgstr')),
+            tf.Summary.Value(tag='tensor', node_name='node',
+                             tensor=tf.make_tensor_proto(1.0)),
+            tf.Summary.Value(tag='empty'),
+        ]))
+    outline = event_file_loader.OutlineEvent(event.SerializeToString())
+    self.assertEqual(outline.wall_time, 1.5)
+    self.assertEqual(outline.summary_values,
+                     [('simple_value', 'scalar', ''), ('image', 'image', ''),
+                      ('tensor', 'tensor', 'node'), (None, 'empty', '')])
+    self.assertFalse(outline.graph_def)
+    self.assertFalse(outline.meta_graph_def)
+    self.assertEqual(outline.run_metadata_tags, [])
+
+  def testOutlinesGraphsAndRunMetadata(self):
+    meta_graph_def = tf.MetaGraphDef(
+        graph_def=tf.GraphDef(node=[tf.NodeDef(name='a', op='Const')]))
+    event = tf.Event(meta_graph_def=meta_graph_def.SerializeToString())
+    outline = event_file_loader.OutlineEvent(event.SerializeToString())
+    self.assertTrue(outline.graph_def)
+    self.assertTrue(outline.meta_graph_def)
+
+    event = tf.Event(meta_graph_def=tf.MetaGraphDef().SerializeToString())
+    outline = event_file_loader.OutlineEvent(event.SerializeToString())
+    self.assertFalse(outline.graph_def)
+    self.assertTrue(outline.meta_graph_def)
+
+    event = tf.Event(tagged_run_metadata=tf.TaggedRunMetadata(tag='step1'))
+    outline = event_file_loader.OutlineEvent(event.SerializeToString())
+    self.assertEqual(outline.run_metadata_tags, ['step1'])
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -18,15 +18,28 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
+import multiprocessing
 import os
 import threading
+import time
 
 import six
+from six.moves import queue
 import tensorflow as tf
 
 from tensorboard.backend.event_processing import directory_watcher
 from tensorboard.backend.event_processing import event_accumulator
+from tensorboard.backend.event_processing import event_file_loader
+from tensorboard.backend.event_processing import inotify_tracker
 from tensorboard.backend.event_processing import io_wrapper
+from tensorboard.backend.event_processing import plugin_asset_util
+from tensorboard.backend.event_processing import run_discovery
+
+
+# How many seconds pass by default between reloads of a stale run. See the
+# `stale_run_secs` argument of `EventMultiplexer`.
+DEFAULT_STALE_RUN_RELOAD_SECS = 3600
 
 
 class EventMultiplexer(object):
@@ -70,7 +83,19 @@ class EventMultiplexer(object):
   def __init__(self,
                run_path_map=None,
                size_guidance=event_accumulator.DEFAULT_SIZE_GUIDANCE,
-               purge_orphaned_data=True):
+               purge_orphaned_data=True,
+               record_reader=event_file_loader.PYWRAP_RECORD_READER,
+               payload_views=False,
+               prefetch_queue_depth=0,
+               max_reload_threads=1,
+               decode_processes=0,
+               payload_bytes_guidance=None,
+               max_payload_bytes_per_run=0,
+               max_memory_bytes=0,
+               max_resident_runs=0,
+               stale_run_secs=0,
+               stale_run_reload_secs=DEFAULT_STALE_RUN_RELOAD_SECS,
+               watch_changes=False):
     """Constructor for the `EventMultiplexer`.
 
     Args:
@@ -82,7 +107,63 @@ class EventMultiplexer(object):
         `event_accumulator.EventAccumulator` for details.
       purge_orphaned_data: Whether to discard any events that were "orphaned" by
         a TensorFlow restart.
+      record_reader: One of `event_file_loader.RECORD_READERS`, selecting how
+        the accumulators read records from event files.
+      payload_views: Whether the accumulators keep image and audio payloads as
+        views into the records they were read from. See
+        `event_accumulator.EventAccumulator`.
+      prefetch_queue_depth: If positive, the accumulators read records on a
+        background thread up to this many records ahead of parsing them.
+      max_reload_threads: The number of threads `Reload` uses to reload
+        accumulators concurrently. With 1, they are reloaded one at a time on
+        the calling thread.
+      decode_processes: If positive, the accumulators read and parse event
+        files in a pool of this many worker processes, shared by all runs. See
+        `process_pool_loader`.
+      payload_bytes_guidance: An optional map from `tagType` to the maximum
+        number of bytes of images, audio or tensors kept per tag. See
+        `event_accumulator.EventAccumulator`.
+      max_payload_bytes_per_run: The maximum number of bytes of images, audio
+        and tensors kept per run, or 0 for no maximum.
+      max_memory_bytes: If positive, the estimated number of bytes of memory
+        the accumulators may hold together. See `MemoryUsage` for how the
+        runs queried least recently give up data when it is exceeded.
+      max_resident_runs: If positive, runs are not loaded until they are first
+        queried, and only this many runs, those queried most recently, are
+        kept loaded. The tags of the other runs are still read by `Reload`,
+        without decoding their events, for `Runs` and `FirstEventTimestamp`,
+        and the runs are loaded again when they are queried.
+      stale_run_secs: If positive, runs that were not queried for this many
+        seconds are stale, counting from when they were added if they were
+        never queried. `Reload` reloads the runs queried most recently first,
+        and reloads stale runs only every `stale_run_reload_secs`.
+      stale_run_reload_secs: How many seconds `Reload` waits between reloads
+        of a stale run.
+      watch_changes: Whether to watch the directories given to
+        `AddRunsFromDirectory` with inotify where possible. Runs in them are
+        then only read after they change, and the directories are only walked
+        again after directories or event files are added or removed. See
+        `ChangedRuns`. Other directories are polled.
+
+    Raises:
+      ValueError: If max_reload_threads is less than 1, if decode_processes
+        or max_resident_runs is negative, if record_reader is unknown, or if
+        payload_views is combined with decode_processes.
     """
+    if record_reader not in event_file_loader.RECORD_READERS:
+      raise ValueError('Unknown record reader %r, must be one of %s' %
+                       (record_reader, event_file_loader.RECORD_READERS))
+    if payload_views and decode_processes:
+      raise ValueError('payload_views cannot be used with decode_processes')
+    if max_reload_threads < 1:
+      raise ValueError('max_reload_threads must be at least 1, was %s' %
+                       max_reload_threads)
+    if decode_processes < 0:
+      raise ValueError('decode_processes must not be negative, was %s' %
+                       decode_processes)
+    if max_resident_runs < 0:
+      raise ValueError('max_resident_runs must not be negative, was %s' %
+                       max_resident_runs)
     tf.logging.info('Event Multiplexer initializing.')
     self._accumulators_mutex = threading.Lock()
     self._accumulators = {}
@@ -90,6 +171,60 @@ class EventMultiplexer(object):
     self._reload_called = False
     self._size_guidance = size_guidance
     self.purge_orphaned_data = purge_orphaned_data
+    self._record_reader = record_reader
+    self._payload_views = payload_views
+    self._prefetch_queue_depth = prefetch_queue_depth
+    self._max_reload_threads = max_reload_threads
+    self._last_reload_secs = None
+    self._payload_bytes_guidance = payload_bytes_guidance
+    self._max_payload_bytes_per_run = max_payload_bytes_per_run
+    self._max_memory_bytes = max_memory_bytes
+    self._max_resident_runs = max_resident_runs
+    self._residency_mutex = threading.Lock()
+    # The number of queries so far, and its value as of the last query of
+    # each run, to find the runs queried least recently.
+    self._num_queries = 0
+    self._last_queried = {}
+    # The tag types shed by each run, and the tags of each run that is not
+    # loaded, or None if it has not been indexed yet. These are loaded again
+    # when they are next queried.
+    self._shed_tag_types = {}
+    self._nonresident_run_tags = {}
+    # The `event_accumulator.EventTagIndex` of each run that is not loaded and
+    # has been indexed, which reads on from where it was last reloaded.
+    self._run_indexes = {}
+    # An event for each run being loaded again by a query, set once it is
+    # loaded, so that concurrent queries of the run wait for that load.
+    self._loading = {}
+    self._first_event_timestamps = {}
+    # The tags of every run as last seen, which `Runs` returns without asking
+    # each accumulator, and a generation number incremented whenever they
+    # change. Indexes of a single tag type are built from it on demand and
+    # kept until the generation changes.
+    self._run_tags = {}
+    self._tags_generation = 0
+    self._tag_type_indexes = {}
+    self._stale_run_secs = stale_run_secs
+    self._stale_run_reload_secs = stale_run_reload_secs
+    # When each run was added, when it and each of its tags were last queried,
+    # and when it was last reloaded.
+    self._added_times = {}
+    self._last_query_times = {}
+    self._tag_query_times = {}
+    self._last_reload_times = {}
+    self._watch_changes = watch_changes
+    # The change tracker, or None, and the last discovered subdirectories of
+    # each directory given to `AddRunsFromDirectory`.
+    self._change_trackers = {}
+    self._discovered_subdirs = {}
+    # The `run_discovery.RunDiscoverer` of each directory given to
+    # `AddRunsFromDirectory` that is not watched.
+    self._run_discoverers = {}
+    self._runs_by_path = {}
+    self._change_event = threading.Event()
+    self._decoder_pool = None
+    if decode_processes:
+      self._decoder_pool = multiprocessing.Pool(decode_processes)
     if run_path_map is not None:
       tf.logging.info('Event Multplexer doing initialization load for %s',
                       run_path_map)
@@ -97,6 +232,25 @@ class EventMultiplexer(object):
         self.AddRun(path, run)
     tf.logging.info('Event Multiplexer done initializing')
 
+  def Close(self):
+    """Stops watching directories and shuts down the worker processes.
+
+    This closes the change trackers of `watch_changes` and the worker
+    processes of `decode_processes`, if any. Runs must not be reloaded
+    afterwards.
+    """
+    with self._accumulators_mutex:
+      trackers = [tracker for tracker in self._change_trackers.values()
+                  if tracker is not None]
+      self._change_trackers.clear()
+      self._discovered_subdirs.clear()
+    for tracker in trackers:
+      tracker.Close()
+    if self._decoder_pool is not None:
+      self._decoder_pool.close()
+      self._decoder_pool.join()
+      self._decoder_pool = None
+
   def AddRun(self, path, name=None):
     """Add a run to the multiplexer.
 
@@ -107,7 +261,8 @@ class EventMultiplexer(object):
       accumulator.
 
     If `Reload` has been called, it will `Reload` the newly created
-    accumulators.
+    accumulators. With `max_resident_runs`, the run is only indexed by the
+    next `Reload` instead.
 
     Args:
       path: Path to the event files (or event directory) for given run.
@@ -120,24 +275,62 @@ class EventMultiplexer(object):
       name = path
     accumulator = None
     with self._accumulators_mutex:
-      if name not in self._accumulators or self._paths[name] != path:
+      is_known = (name in self._accumulators or
+                  name in self._nonresident_run_tags)
+      if not is_known or self._paths[name] != path:
         if name in self._paths and self._paths[name] != path:
           # TODO(danmane) - Make it impossible to overwrite an old path with
           # a new path (just give the new path a distinct name)
           tf.logging.warning('Conflict for name %s: old path %s, new path %s',
                              name, self._paths[name], path)
-        tf.logging.info('Constructing EventAccumulator for %s', path)
-        accumulator = event_accumulator.EventAccumulator(
-            path,
-            size_guidance=self._size_guidance,
-            purge_orphaned_data=self.purge_orphaned_data)
-        self._accumulators[name] = accumulator
+        if name in self._paths:
+          self._runs_by_path.get(self._paths[name], set()).discard(name)
         self._paths[name] = path
+        self._runs_by_path.setdefault(path, set()).add(name)
+        self._added_times[name] = time.time()
+        self._shed_tag_types.pop(name, None)
+        self._first_event_timestamps.pop(name, None)
+        self._run_indexes.pop(name, None)
+        if self._max_resident_runs:
+          self._accumulators.pop(name, None)
+          self._nonresident_run_tags[name] = None
+          self._SetRunTagsLocked(name, _UnindexedTags())
+        else:
+          accumulator = self._CreateAccumulator(
+              path, self._ChangeTrackerForLocked(path))
+          self._accumulators[name] = accumulator
+          self._nonresident_run_tags.pop(name, None)
+        if not is_known:
+          # Wakes up `WaitForChange`, so that the run is reloaded soon.
+          self._change_event.set()
     if accumulator:
       if self._reload_called:
         accumulator.Reload()
+      self._UpdateRunTags(name, accumulator)
     return self
 
+  def _ChangeTrackerForLocked(self, path):
+    """Returns the change tracker watching a run directory, if any."""
+    for root, tracker in six.iteritems(self._change_trackers):
+      if tracker is not None and (path == root or
+                                  path.startswith(os.path.join(root, ''))):
+        return tracker
+    return None
+
+  def _CreateAccumulator(self, path, change_tracker):
+    tf.logging.info('Constructing EventAccumulator for %s', path)
+    return event_accumulator.EventAccumulator(
+        path,
+        size_guidance=self._size_guidance,
+        purge_orphaned_data=self.purge_orphaned_data,
+        record_reader=self._record_reader,
+        payload_views=self._payload_views,
+        prefetch_queue_depth=self._prefetch_queue_depth,
+        decoder_pool=self._decoder_pool,
+        payload_bytes_guidance=self._payload_bytes_guidance,
+        max_payload_bytes=self._max_payload_bytes_per_run,
+        change_tracker=change_tracker)
+
   def AddRunsFromDirectory(self, path, name=None):
     """Load runs from a directory; recursively walks subdirectories.
 
@@ -166,7 +359,7 @@ class EventMultiplexer(object):
       The `EventMultiplexer`.
     """
     tf.logging.info('Starting AddRunsFromDirectory: %s', path)
-    for subdir in GetLogdirSubdirectories(path):
+    for subdir in self._GetSubdirectories(path):
       tf.logging.info('Adding events from directory %s', subdir)
       rpath = os.path.relpath(subdir, path)
       subname = os.path.join(name, rpath) if name else rpath
@@ -174,30 +367,340 @@ class EventMultiplexer(object):
     tf.logging.info('Done with AddRunsFromDirectory: %s', path)
     return self
 
+  def _GetSubdirectories(self, path):
+    """Returns `GetLogdirSubdirectories(path)`, walking it only if needed."""
+    with self._accumulators_mutex:
+      tracker = self._change_trackers.get(path)
+    if tracker is None and self._watch_changes:
+      # Watching a tree walks it, so this happens outside the lock.
+      tracker = inotify_tracker.CreateChangeTracker(
+          path,
+          tree_file_filter=event_accumulator.IsTensorFlowEventsFile,
+          on_change=self._change_event.set)
+      if tracker is not None:
+        with self._accumulators_mutex:
+          existing = self._change_trackers.get(path)
+          if existing is None:
+            tf.logging.info('Watching %s for changes', path)
+            self._change_trackers[path] = tracker
+        if existing is not None:
+          # Another thread started watching the directory first.
+          tracker.Close()
+          tracker = existing
+    if tracker is None:
+      if not io_wrapper.IsLocalPath(path):
+        return GetLogdirSubdirectories(path)
+      with self._accumulators_mutex:
+        discoverer = self._run_discoverers.get(path)
+        if discoverer is None:
+          discoverer = run_discovery.RunDiscoverer(
+              path, event_accumulator.IsTensorFlowEventsFile)
+          self._run_discoverers[path] = discoverer
+      return discoverer.ListRunDirectories()
+    # Read the generation first, so that a walk racing with a change is
+    # repeated next time.
+    generation = tracker.TreeGeneration()
+    with self._accumulators_mutex:
+      cached = self._discovered_subdirs.get(path)
+    if cached is not None and cached[0] == generation:
+      return cached[1]
+    subdirs = list(GetLogdirSubdirectories(path))
+    with self._accumulators_mutex:
+      if self._change_trackers.get(path) is tracker:
+        self._discovered_subdirs[path] = (generation, subdirs)
+    return subdirs
+
+  def ChangedRuns(self):
+    """Returns the runs whose directories changed since the last call.
+
+    Only runs in directories watched because of `watch_changes` are reported.
+
+    Returns:
+      A set of run names, or None if no directory is watched.
+    """
+    with self._accumulators_mutex:
+      trackers = [tracker for tracker in self._change_trackers.values()
+                  if tracker is not None]
+      if not trackers:
+        return None
+      changed = set()
+      for tracker in trackers:
+        directories = tracker.PopChangedDirectories()
+        if directories is None:
+          changed.update(self._paths)
+          continue
+        for directory in directories:
+          changed.update(self._runs_by_path.get(directory, ()))
+    return changed
+
+  def WaitForChange(self, timeout_secs):
+    """Waits until a watched directory changes or a run is added.
+
+    Args:
+      timeout_secs: The most seconds to wait.
+
+    Returns:
+      Whether a watched directory changed or a run was added before the
+      timeout.
+    """
+    changed = self._change_event.wait(timeout_secs)
+    self._change_event.clear()
+    return bool(changed)
+
   def Reload(self):
-    """Call `Reload` on every `EventAccumulator`."""
+    """Call `Reload` on every `EventAccumulator`.
+
+    Up to `max_reload_threads` accumulators are reloaded concurrently, those
+    of the runs queried most recently first. With `stale_run_secs`, runs that
+    were not queried for that long are skipped until `stale_run_reload_secs`
+    have passed since they were last reloaded. Runs that are not loaded,
+    because of `max_memory_bytes` or `max_resident_runs`, are not loaded
+    until they are queried again, but their tags are read from the events
+    added since the last `Reload`.
+    """
     tf.logging.info('Beginning EventMultiplexer.Reload()')
+    with self._accumulators_mutex:
+      names = list(self._accumulators) + list(self._nonresident_run_tags)
+    self._ReloadDueRuns(names)
+    return self
+
+  def ReloadRuns(self, names):
+    """Reloads only the given runs, and returns how many events each loaded.
+
+    The runs are reloaded like in `Reload`, so stale runs are skipped until
+    they are due, and runs that are not loaded only have their tags read.
+
+    Args:
+      names: The names of the runs to reload.
+
+    Returns:
+      A `{run: num_events}` dictionary of the number of events loaded for each
+      run that was reloaded. See `event_accumulator.EventAccumulator.NumLoaded`.
+    """
+    return self._ReloadDueRuns(names)
+
+  def _ReloadDueRuns(self, names):
+    """Reloads those of the given runs that are due, see `Reload`.
+
+    Args:
+      names: The names of the runs to reload.
+
+    Returns:
+      A `{run: num_events}` dictionary of the number of events loaded for each
+      loaded run that was reloaded.
+    """
+    start = time.time()
     self._reload_called = True
     # Build a list so we're safe even if the list of accumulators is modified
     # even while we're reloading.
     with self._accumulators_mutex:
-      items = list(self._accumulators.items())
+      known = [name for name in names
+               if name in self._accumulators or
+               name in self._nonresident_run_tags]
+      names_due = [name for name in known
+                   if self._IsReloadDueLocked(name, start)]
+      due = [(name, self._accumulators[name]) for name in names_due
+             if name in self._accumulators]
+      due.sort(key=lambda item: self._last_query_times.get(item[0], 0),
+               reverse=True)
+      for name, _ in due:
+        self._last_reload_times[name] = start
+      num_loaded = {name: accumulator.NumLoaded() for name, accumulator in due}
+      items = [(name, accumulator.Reload) for name, accumulator in due]
+      items.extend(self._IndexTasksLocked(
+          [name for name in names_due if name in self._nonresident_run_tags],
+          start))
+
+    deleted = self._RunReloadTasks(items)
+    self._EnforceResidency()
+    num_threads = min(self._max_reload_threads, len(items))
+    self._last_reload_secs = time.time() - start
+    tf.logging.info('Finished reloading %d runs using %d threads in %0.3f '
+                    'secs, skipping %d stale runs', len(items),
+                    max(num_threads, 1), self._last_reload_secs,
+                    len(known) - len(names_due))
+    return {name: accumulator.NumLoaded() - num_loaded[name]
+            for name, accumulator in due if name not in deleted}
+
+  def _RunReloadTasks(self, items):
+    """Runs `(name, reload_fn)` tasks on up to `max_reload_threads` threads.
+
+    Runs whose directory was deleted are removed. Other errors are logged
+    with the name of the run.
 
+    Returns:
+      The set of names of the runs that were removed.
+    """
     names_to_delete = set()
-    for name, accumulator in items:
+    names_to_delete_mutex = threading.Lock()
+
+    def _ReloadAccumulator(name, reload_fn):
       try:
-        accumulator.Reload()
+        reload_fn()
       except (OSError, IOError) as e:
         tf.logging.error("Unable to reload accumulator '%s': %s", name, e)
       except directory_watcher.DirectoryDeletedError:
-        names_to_delete.add(name)
+        with names_to_delete_mutex:
+          names_to_delete.add(name)
+      except Exception:  # pylint: disable=broad-except
+        # Keep reloading the other runs; on a worker thread the error would
+        # otherwise disappear along with the thread.
+        tf.logging.exception("Unable to reload accumulator '%s'", name)
+
+    num_threads = min(self._max_reload_threads, len(items))
+    if num_threads <= 1:
+      for name, reload_fn in items:
+        _ReloadAccumulator(name, reload_fn)
+    else:
+      work = queue.Queue()
+      for item in items:
+        work.put(item)
+
+      def _Worker():
+        while True:
+          try:
+            name, reload_fn = work.get_nowait()
+          except queue.Empty:
+            return
+          _ReloadAccumulator(name, reload_fn)
+
+      threads = [threading.Thread(target=_Worker,
+                                  name='EventMultiplexerReload-%d' % i)
+                 for i in range(num_threads)]
+      for thread in threads:
+        thread.daemon = True
+        thread.start()
+      for thread in threads:
+        thread.join()
+
+    with self._accumulators_mutex:
+      reloaded = [(name, self._accumulators[name]) for name, _ in items
+                  if name not in names_to_delete and name in self._accumulators]
+    for name, accumulator in reloaded:
+      self._UpdateRunTags(name, accumulator)
 
     with self._accumulators_mutex:
       for name in names_to_delete:
         tf.logging.warning("Deleting accumulator '%s'", name)
-        del self._accumulators[name]
-    tf.logging.info('Finished with EventMultiplexer.Reload()')
-    return self
+        self._RemoveRunTagsLocked(name)
+        self._accumulators.pop(name, None)
+        self._nonresident_run_tags.pop(name, None)
+        self._run_indexes.pop(name, None)
+        self._shed_tag_types.pop(name, None)
+        self._last_queried.pop(name, None)
+        self._added_times.pop(name, None)
+        self._last_query_times.pop(name, None)
+        self._tag_query_times.pop(name, None)
+        self._last_reload_times.pop(name, None)
+      trackers = self._PopDeletedTrackersLocked() if names_to_delete else []
+    for tracker in trackers:
+      tracker.Close()
+    return names_to_delete
+
+  def _PopDeletedTrackersLocked(self):
+    """Forgets the change trackers of deleted directories, and returns them.
+
+    If such a directory is made again, `AddRunsFromDirectory` watches it with a
+    new tracker.
+
+    Returns:
+      The trackers, which the caller should close outside the lock.
+    """
+    trackers = []
+    for root in list(self._change_trackers):
+      if os.path.isdir(root):
+        continue
+      tracker = self._change_trackers.pop(root)
+      self._discovered_subdirs.pop(root, None)
+      if tracker is not None:
+        tf.logging.info('Not watching %s anymore, it was deleted', root)
+        trackers.append(tracker)
+    return trackers
+
+  def _IsReloadDueLocked(self, name, now):
+    if not self._stale_run_secs:
+      return True
+    last_query_time = self._last_query_times.get(
+        name, self._added_times.get(name, 0))
+    if now - last_query_time < self._stale_run_secs:
+      return True
+    last_reload_time = self._last_reload_times.get(name)
+    return (last_reload_time is None or
+            now - last_reload_time >= self._stale_run_reload_secs)
+
+  def RecentQueries(self, max_age_secs=None):
+    """Returns the runs and tags that were queried recently.
+
+    Args:
+      max_age_secs: If given, only queries made in the last this many seconds
+        are returned.
+
+    Returns:
+      A `{run: {tag: wall_time}}` dictionary of when each tag of each run was
+      last queried. Runs queried without a tag, such as for their graph, map
+      to an empty dictionary if none of their tags were queried.
+    """
+    cutoff = None if max_age_secs is None else time.time() - max_age_secs
+    with self._accumulators_mutex:
+      return {
+          run: {tag: wall_time
+                for tag, wall_time in six.iteritems(
+                    self._tag_query_times.get(run, {}))
+                if cutoff is None or wall_time >= cutoff}
+          for run, wall_time in six.iteritems(self._last_query_times)
+          if cutoff is None or wall_time >= cutoff
+      }
+
+  def LastReloadSecs(self):
+    """Returns the wall time in seconds taken by the last reload.
+
+    Returns:
+      A float, or None if neither `Reload` nor `ReloadRuns` has completed yet.
+    """
+    return self._last_reload_secs
+
+  def _IndexTasksLocked(self, names, now):
+    """Returns the reload tasks that read the tags of runs that are not loaded.
+
+    Args:
+      names: The names of runs that are not loaded.
+      now: The time of the reload.
+
+    Returns:
+      A list of `(name, reload_fn)` tasks for `_RunReloadTasks`.
+    """
+    items = []
+    for name in names:
+      path = self._paths[name]
+      index = self._run_indexes.get(name)
+      if index is None:
+        index = event_accumulator.EventTagIndex(
+            path,
+            record_reader=self._record_reader,
+            change_tracker=self._ChangeTrackerForLocked(path),
+            tags=self._nonresident_run_tags[name])
+        self._run_indexes[name] = index
+      self._last_reload_times[name] = now
+      items.append((name, functools.partial(self._IndexRun, name, index)))
+    return items
+
+  def _IndexRun(self, name, index):
+    """Reads the new tags of a run that is not loaded."""
+    index.Reload()
+    tags = index.Tags()
+    with self._accumulators_mutex:
+      if self._run_indexes.get(name) is index:
+        self._nonresident_run_tags[name] = tags
+        self._SetRunTagsLocked(name, tags)
+        self._CacheFirstEventTimestampLocked(name, index)
+
+  def _CacheFirstEventTimestampLocked(self, name, index):
+    if name in self._first_event_timestamps:
+      return
+    try:
+      self._first_event_timestamps[name] = index.FirstEventTimestamp()
+    except ValueError:
+      pass
 
   def PluginAssets(self, plugin_name):
     """Get index of runs and assets for a given plugin.
@@ -210,10 +713,14 @@ class EventMultiplexer(object):
         assets for that run.
     """
     with self._accumulators_mutex:
-      # To avoid nested locks, we construct a copy of the run-accumulator map
-      items = list(six.iteritems(self._accumulators))
-
-    return {run: accum.PluginAssets(plugin_name) for run, accum in items}
+      paths = {run: self._paths[run]
+               for run in list(self._accumulators) + list(
+                   self._nonresident_run_tags)}
+    # Every run's assets are listed from its directory, so list them all at
+    # once rather than asking each accumulator in turn.
+    assets = plugin_asset_util.ListAssetsOfRuns(set(paths.values()),
+                                                plugin_name)
+    return {run: assets[path] for run, path in six.iteritems(paths)}
 
   def RetrievePluginAsset(self, run, plugin_name, asset_name):
     """Return the contents for a specific plugin asset from a run.
@@ -235,7 +742,8 @@ class EventMultiplexer(object):
   def FirstEventTimestamp(self, run):
     """Return the timestamp of the first event of the given run.
 
-    This may perform I/O if no events have been loaded yet for the run.
+    This may perform I/O if no events have been loaded yet for the run. It
+    does not load a run that is not loaded.
 
     Args:
       run: A string name of the run for which the timestamp is retrieved.
@@ -249,8 +757,66 @@ class EventMultiplexer(object):
       ValueError: If the run has no events loaded and there are no events on
         disk to load.
     """
-    accumulator = self._GetAccumulator(run)
-    return accumulator.FirstEventTimestamp()
+    with self._accumulators_mutex:
+      accumulator = self._accumulators.get(run)
+      if accumulator is None:
+        if run not in self._nonresident_run_tags:
+          raise KeyError(run)
+        path = self._paths[run]
+        if run in self._first_event_timestamps:
+          return self._first_event_timestamps[run]
+        change_tracker = self._ChangeTrackerForLocked(path)
+    if accumulator is not None:
+      return accumulator.FirstEventTimestamp()
+    # Only the first event is read, without loading the run.
+    accumulator = self._CreateAccumulator(path, change_tracker)
+    timestamp = accumulator.FirstEventTimestamp()
+    with self._accumulators_mutex:
+      if self._paths.get(run) == path:
+        self._first_event_timestamps[run] = timestamp
+    return timestamp
+
+  def Generation(self, run, tag_type, tag):
+    """Returns a value that changes whenever the data of a tag changes.
+
+    Counts as a query of the tag, since it is read before the data. See
+    `event_accumulator.EventAccumulator.Generation`.
+
+    Args:
+      run: A string name of the run.
+      tag_type: The `tagType` of the tag, such as `event_accumulator.SCALARS`.
+      tag: A string name of the tag.
+
+    Raises:
+      KeyError: If the run is not found.
+      ValueError: If tag_type is not kept in a reservoir.
+
+    Returns:
+      A hashable value to compare with values returned earlier.
+    """
+    accumulator = self._GetAccumulator(run, tag_type=tag_type, tag=tag)
+    return accumulator.Generation(tag_type, tag)
+
+  def NumItems(self, run, tag_type, tag):
+    """Returns the number of items of a tag, without copying them.
+
+    Lets callers choose how to serve the data before reading it. See
+    `event_accumulator.EventAccumulator.NumItems`.
+
+    Args:
+      run: A string name of the run.
+      tag_type: The `tagType` of the tag, such as `event_accumulator.SCALARS`.
+      tag: A string name of the tag.
+
+    Raises:
+      KeyError: If the run is not found.
+      ValueError: If tag_type is not kept in a reservoir.
+
+    Returns:
+      An integer, which is 0 for tags without items.
+    """
+    accumulator = self._GetAccumulator(run, tag_type=tag_type, tag=tag)
+    return accumulator.NumItems(tag_type, tag)
 
   def Scalars(self, run, tag):
     """Retrieve the scalar events associated with a run and tag.
@@ -266,9 +832,26 @@ class EventMultiplexer(object):
     Returns:
       An array of `event_accumulator.ScalarEvents`.
     """
-    accumulator = self._GetAccumulator(run)
+    accumulator = self._GetAccumulator(run, tag=tag)
     return accumulator.Scalars(tag)
 
+  def ScalarColumns(self, run, tag):
+    """Retrieve the scalars associated with a run and tag as numpy arrays.
+
+    Args:
+      run: A string name of the run for which values are retrieved.
+      tag: A string name of the tag for which values are retrieved.
+
+    Raises:
+      KeyError: If the run is not found, or the tag is not available for
+        the given run.
+
+    Returns:
+      An `event_accumulator.ScalarColumns` tuple.
+    """
+    accumulator = self._GetAccumulator(run, tag=tag)
+    return accumulator.ScalarColumns(tag)
+
   def HealthPills(self, run, node_name):
     """Retrieve the health pill events associated with a run and node name.
 
@@ -283,7 +866,7 @@ class EventMultiplexer(object):
     Returns:
       An array of `event_accumulator.HealthPillEvents`.
     """
-    accumulator = self._GetAccumulator(run)
+    accumulator = self._GetAccumulator(run, tag=node_name)
     return accumulator.HealthPills(node_name)
 
   def GetOpsWithHealthPills(self, run):
@@ -347,7 +930,7 @@ class EventMultiplexer(object):
     Returns:
       The metadata in the form of `RunMetadata` protobuf data structure.
     """
-    accumulator = self._GetAccumulator(run)
+    accumulator = self._GetAccumulator(run, tag=tag)
     return accumulator.RunMetadata(tag)
 
   def Histograms(self, run, tag):
@@ -364,7 +947,7 @@ class EventMultiplexer(object):
     Returns:
       An array of `event_accumulator.HistogramEvents`.
     """
-    accumulator = self._GetAccumulator(run)
+    accumulator = self._GetAccumulator(run, tag=tag)
     return accumulator.Histograms(tag)
 
   def CompressedHistograms(self, run, tag):
@@ -381,7 +964,8 @@ class EventMultiplexer(object):
     Returns:
       An array of `event_accumulator.CompressedHistogramEvents`.
     """
-    accumulator = self._GetAccumulator(run)
+    accumulator = self._GetAccumulator(
+        run, event_accumulator.COMPRESSED_HISTOGRAMS, tag)
     return accumulator.CompressedHistograms(tag)
 
   def Images(self, run, tag):
@@ -398,7 +982,7 @@ class EventMultiplexer(object):
     Returns:
       An array of `event_accumulator.ImageEvents`.
     """
-    accumulator = self._GetAccumulator(run)
+    accumulator = self._GetAccumulator(run, event_accumulator.IMAGES, tag)
     return accumulator.Images(tag)
 
   def Audio(self, run, tag):
@@ -415,7 +999,7 @@ class EventMultiplexer(object):
     Returns:
       An array of `event_accumulator.AudioEvents`.
     """
-    accumulator = self._GetAccumulator(run)
+    accumulator = self._GetAccumulator(run, tag=tag)
     return accumulator.Audio(tag)
 
   def Tensors(self, run, tag):
@@ -432,12 +1016,15 @@ class EventMultiplexer(object):
     Returns:
       An array of `event_accumulator.TensorEvent`s.
     """
-    accumulator = self._GetAccumulator(run)
+    accumulator = self._GetAccumulator(run, tag=tag)
     return accumulator.Tensors(tag)
 
   def Runs(self):
     """Return all the run names in the `EventMultiplexer`.
 
+    Runs that are not loaded are listed with the tags they had when they were
+    indexed or unloaded, and without tags before they are first indexed.
+
     Returns:
     ```
       {runName: { images: [tag1, tag2, tag3],
@@ -448,17 +1035,257 @@ class EventMultiplexer(object):
     ```
     """
     with self._accumulators_mutex:
-      # To avoid nested locks, we construct a copy of the run-accumulator map
-      items = list(six.iteritems(self._accumulators))
-    return {run_name: accumulator.Tags() for run_name, accumulator in items}
+      return dict(self._run_tags)
+
+  def TagsGeneration(self):
+    """Returns a number that increases whenever the result of `Runs` changes.
+
+    Runs change when runs are added or removed, and when tags are added to or
+    removed from a run. Loading more events for existing tags doesn't change
+    them.
+    """
+    with self._accumulators_mutex:
+      return self._tags_generation
+
+  def RunTagIndex(self, tag_type):
+    """Returns the tags of one type for all runs.
+
+    The index is built at most once per `TagsGeneration` and shared between
+    callers, so it must not be modified.
+
+    Args:
+      tag_type: A `tagType`, such as `event_accumulator.SCALARS`.
+
+    Returns:
+      A `{run: tags}` dictionary for the runs that have the tag type, where the
+      tags are as in `Runs`.
+    """
+    return self._TagTypeIndex(tag_type)[0]
+
+  def HasTags(self, tag_type):
+    """Returns whether any run has a tag of a type, such as a graph."""
+    return self._TagTypeIndex(tag_type)[1]
+
+  def _TagTypeIndex(self, tag_type):
+    with self._accumulators_mutex:
+      cached = self._tag_type_indexes.get(tag_type)
+      if cached is None or cached[0] != self._tags_generation:
+        index = {run: tags[tag_type]
+                 for run, tags in six.iteritems(self._run_tags)
+                 if tag_type in tags}
+        cached = (self._tags_generation, index, any(index.values()))
+        self._tag_type_indexes[tag_type] = cached
+      return cached[1:]
+
+  def _UpdateRunTags(self, run, accumulator):
+    """Records the tags of a loaded run, unless it was replaced meanwhile."""
+    tags = accumulator.Tags()
+    with self._accumulators_mutex:
+      if self._accumulators.get(run) is accumulator:
+        self._SetRunTagsLocked(run, tags)
+
+  def _SetRunTagsLocked(self, run, tags):
+    if self._run_tags.get(run) != tags:
+      self._run_tags[run] = tags
+      self._tags_generation += 1
+
+  def _RemoveRunTagsLocked(self, run):
+    if self._run_tags.pop(run, None) is not None:
+      self._tags_generation += 1
 
   def RunPaths(self):
     """Returns a dict mapping run names to event file paths."""
     return self._paths
 
-  def _GetAccumulator(self, run):
+  def MemoryUsage(self):
+    """Estimates the number of bytes of memory held by each run.
+
+    When the total exceeds `max_memory_bytes`, runs give up data in the order
+    they were last queried, least recently first. First their compressed
+    histograms and then their images are shed. If that is not enough, whole
+    runs are dropped, except for the run queried most recently. Shed and
+    dropped data is loaded again, from the start of the event files, the next
+    time it is queried.
+
+    Returns:
+      A `{run: {tagType: {tag: num_bytes}}}` dictionary for the runs that are
+      loaded. See `event_accumulator.EventAccumulator.MemoryUsage`.
+    """
+    with self._accumulators_mutex:
+      items = list(six.iteritems(self._accumulators))
+    return {run: accumulator.MemoryUsage() for run, accumulator in items}
+
+  def TotalMemoryBytes(self):
+    """Returns the estimated number of bytes of memory held by all runs."""
+    return sum(_SumBytes(usage) for usage in self.MemoryUsage().values())
+
+  def _EnforceResidency(self):
+    """Unloads runs and sheds data to fit the residency and memory limits."""
+    if not self._max_resident_runs and not self._max_memory_bytes:
+      return
+    with self._residency_mutex:
+      with self._accumulators_mutex:
+        items = list(six.iteritems(self._accumulators))
+        last_queried = dict(self._last_queried)
+      items.sort(key=lambda item: (last_queried.get(item[0], 0), item[0]))
+      if self._max_resident_runs and len(items) > self._max_resident_runs:
+        num_excess = len(items) - self._max_resident_runs
+        for run, accumulator in items[:num_excess]:
+          tf.logging.info('Unloading run %s, which was not queried recently',
+                          run)
+          self._UnloadRun(run, accumulator)
+        items = items[num_excess:]
+      if not self._max_memory_bytes:
+        return
+
+      run_usage = {run: accumulator.MemoryUsage() for run, accumulator in items}
+      run_bytes = {run: _SumBytes(usage) for run, usage in run_usage.items()}
+      total = sum(run_bytes.values())
+      if total <= self._max_memory_bytes:
+        return
+      if last_queried:
+        # Keep the run being looked at, even if it alone exceeds the budget.
+        most_recent = max(last_queried, key=last_queried.get)
+        items = [item for item in items if item[0] != most_recent]
+
+      for run, accumulator in items:
+        for tag_type in _SHED_TAG_TYPES:
+          num_bytes = _SumBytes(run_usage[run].get(tag_type, {}))
+          if not num_bytes:
+            continue
+          tf.logging.info('Shedding %d bytes of %s from run %s', num_bytes,
+                          tag_type, run)
+          accumulator.Shed(tag_type)
+          with self._accumulators_mutex:
+            if self._accumulators.get(run) is accumulator:
+              self._shed_tag_types.setdefault(run, set()).add(tag_type)
+          run_bytes[run] -= num_bytes
+          total -= num_bytes
+          if total <= self._max_memory_bytes:
+            return
+
+      for run, accumulator in items:
+        tf.logging.info('Dropping run %s to free memory', run)
+        self._UnloadRun(run, accumulator)
+        total -= run_bytes[run]
+        if total <= self._max_memory_bytes:
+          return
+
+  def _UnloadRun(self, run, accumulator):
+    """Replaces a loaded run by its tag index, unless it was replaced meanwhile.
+
+    The index takes over the generator of the accumulator, so the tags of the
+    run are read on from where the accumulator stopped.
+    """
+    with self._accumulators_mutex:
+      if self._accumulators.get(run) is not accumulator:
+        return
+      del self._accumulators[run]
+      self._shed_tag_types.pop(run, None)
+      self._nonresident_run_tags[run] = self._run_tags.get(run)
+    index = accumulator.TagIndex()
+    tags = index.Tags()
+    with self._accumulators_mutex:
+      if (run not in self._nonresident_run_tags or
+          self._paths.get(run) != index.path):
+        # The run was loaded again or replaced meanwhile.
+        return
+      self._run_indexes[run] = index
+      self._nonresident_run_tags[run] = tags
+      self._SetRunTagsLocked(run, tags)
+      self._CacheFirstEventTimestampLocked(run, index)
+
+  def _GetAccumulator(self, run, tag_type=None, tag=None):
+    """Returns the accumulator for a run, loading it again if necessary.
+
+    Only one query loads a run at a time. Others querying it meanwhile wait
+    for that load and use its accumulator.
+
+    Args:
+      run: The name of the run.
+      tag_type: The `tagType` being queried, if any. If the run has shed it,
+        the run is loaded again.
+      tag: The tag being queried, if any.
+
+    Raises:
+      KeyError: If the run is not found.
+
+    Returns:
+      The `event_accumulator.EventAccumulator` for the run.
+    """
     with self._accumulators_mutex:
-      return self._accumulators[run]
+      if (run not in self._accumulators and
+          run not in self._nonresident_run_tags):
+        raise KeyError(run)
+      self._num_queries += 1
+      self._last_queried[run] = self._num_queries
+      now = time.time()
+      self._last_query_times[run] = now
+      if tag is not None:
+        self._tag_query_times.setdefault(run, {})[tag] = now
+
+    while True:
+      with self._accumulators_mutex:
+        if (run not in self._accumulators and
+            run not in self._nonresident_run_tags):
+          raise KeyError(run)
+        if (run not in self._nonresident_run_tags and
+            tag_type not in self._shed_tag_types.get(run, ())):
+          return self._accumulators[run]
+        loading = self._loading.get(run)
+        if loading is None:
+          loading = threading.Event()
+          self._loading[run] = loading
+          path = self._paths[run]
+          change_tracker = self._ChangeTrackerForLocked(path)
+          break
+      # Another query is loading the run. Look at it again once it is loaded,
+      # or if the load failed, try loading it again.
+      loading.wait()
+
+    try:
+      accumulator = self._CreateAccumulator(path, change_tracker)
+      accumulator.Reload()
+      with self._accumulators_mutex:
+        if self._paths.get(run) == path:
+          self._accumulators[run] = accumulator
+          self._shed_tag_types.pop(run, None)
+          self._nonresident_run_tags.pop(run, None)
+          self._run_indexes.pop(run, None)
+    finally:
+      with self._accumulators_mutex:
+        del self._loading[run]
+      loading.set()
+    self._UpdateRunTags(run, accumulator)
+    self._EnforceResidency()
+    return accumulator
+
+
+# The tag types shed from a run, in order, before dropping it entirely.
+_SHED_TAG_TYPES = (event_accumulator.COMPRESSED_HISTOGRAMS,
+                   event_accumulator.IMAGES)
+
+
+def _UnindexedTags():
+  """Returns the tags listed for a run that has not been indexed yet."""
+  return {
+      event_accumulator.IMAGES: [],
+      event_accumulator.AUDIO: [],
+      event_accumulator.HISTOGRAMS: [],
+      event_accumulator.SCALARS: [],
+      event_accumulator.COMPRESSED_HISTOGRAMS: [],
+      event_accumulator.TENSORS: [],
+      event_accumulator.GRAPH: False,
+      event_accumulator.META_GRAPH: False,
+      event_accumulator.RUN_METADATA: [],
+  }
+
+
+def _SumBytes(usage):
+  """Sums the leaves of a nested dictionary of byte counts."""
+  if isinstance(usage, dict):
+    return sum(_SumBytes(value) for value in usage.values())
+  return usage
 
 
 def GetLogdirSubdirectories(path):
@@ -467,9 +1294,9 @@ def GetLogdirSubdirectories(path):
     raise ValueError('GetLogdirSubdirectories: path exists and is not a '
                      'directory, %s' % path)
 
-  # ListRecursively just yields nothing if the path doesn't exist.
+  # ListRecursivelyInParallel just yields nothing if the path doesn't exist.
   return (
       subdir
-      for (subdir, files) in io_wrapper.ListRecursively(path)
+      for (subdir, files) in io_wrapper.ListRecursivelyInParallel(path)
       if list(filter(event_accumulator.IsTensorFlowEventsFile, files))
   )
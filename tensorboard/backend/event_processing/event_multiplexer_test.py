@@ -21,11 +21,15 @@ import functools
 import os
 import os.path
 import shutil
+import threading
+import time
 
 import tensorflow as tf
 
+from tensorboard.backend.event_processing import directory_watcher
 from tensorboard.backend.event_processing import event_accumulator
 from tensorboard.backend.event_processing import event_multiplexer
+from tensorboard.backend.event_processing import inotify_tracker
 
 
 def _AddEvents(path):
@@ -55,6 +59,14 @@ class _FakeAccumulator(object):
     self._path = path
     self.reload_called = False
     self._node_names_to_health_pills = health_pill_mapping or {}
+    self.memory_usage = {
+        event_accumulator.COMPRESSED_HISTOGRAMS: {'cmphst1': 100},
+        event_accumulator.IMAGES: {'im1': 100},
+        event_accumulator.SCALARS: {'sv1': 100},
+    }
+    self.shed = []
+    self.events_per_reload = 0
+    self._num_loaded = 0
 
   def Tags(self):
     return {event_accumulator.IMAGES: ['im1', 'im2'],
@@ -98,15 +110,47 @@ class _FakeAccumulator(object):
   def Tensors(self, tag_name):
     return self._TagHelper(tag_name, event_accumulator.TENSORS)
 
+  def MemoryUsage(self):
+    return self.memory_usage
+
+  def Shed(self, tag_type):
+    self.shed.append(tag_type)
+    self.memory_usage[tag_type] = {}
+
+  def NumLoaded(self):
+    return self._num_loaded
+
   def Reload(self):
     self.reload_called = True
+    self._num_loaded += self.events_per_reload
+
+  def TagIndex(self):
+    return _FakeTagIndex(self._path, tags=self.Tags())
+
+
+class _FakeTagIndex(object):
+
+  def __init__(self, path, tags=None, **unused_kwargs):
+    self.path = path
+    self.num_reloads = 0
+    self.tags = _FakeAccumulator(path).Tags()
+
+  def Reload(self):
+    self.num_reloads += 1
+
+  def Tags(self):
+    return self.tags
+
+  def FirstEventTimestamp(self):
+    return 0
 
 
 def _GetFakeAccumulator(path,
                         size_guidance=None,
                         compression_bps=None,
                         purge_orphaned_data=None,
-                        health_pill_mapping=None):
+                        health_pill_mapping=None,
+                        **unused_kwargs):
   del size_guidance, compression_bps, purge_orphaned_data  # Unused.
   return _FakeAccumulator(path, health_pill_mapping=health_pill_mapping)
 
@@ -118,6 +162,7 @@ class EventMultiplexerTest(tf.test.TestCase):
     self.stubs = tf.test.StubOutForTesting()
 
     self.stubs.Set(event_accumulator, 'EventAccumulator', _GetFakeAccumulator)
+    self.stubs.Set(event_accumulator, 'EventTagIndex', _FakeTagIndex)
 
   def tearDown(self):
     self.stubs.CleanUp()
@@ -143,6 +188,79 @@ class EventMultiplexerTest(tf.test.TestCase):
     self.assertTrue(x._GetAccumulator('run1').reload_called)
     self.assertTrue(x._GetAccumulator('run2').reload_called)
 
+  def testTagIndex(self):
+    x = event_multiplexer.EventMultiplexer({'run1': 'path1'})
+    generation = x.TagsGeneration()
+    index = x.RunTagIndex(event_accumulator.SCALARS)
+    self.assertEqual(index, {'run1': ['sv1', 'sv2']})
+    self.assertTrue(x.HasTags(event_accumulator.SCALARS))
+    self.assertFalse(x.HasTags(event_accumulator.GRAPH))
+
+    # Reloading without new tags keeps the index.
+    x.Reload()
+    self.assertEqual(x.TagsGeneration(), generation)
+    self.assertIs(x.RunTagIndex(event_accumulator.SCALARS), index)
+
+    x._GetAccumulator('run1').Tags = lambda: {event_accumulator.SCALARS: []}
+    x.Reload()
+    self.assertGreater(x.TagsGeneration(), generation)
+    self.assertEqual(x.Runs(), {'run1': {event_accumulator.SCALARS: []}})
+    self.assertFalse(x.HasTags(event_accumulator.SCALARS))
+
+    generation = x.TagsGeneration()
+    x.AddRun('path2', 'run2')
+    self.assertGreater(x.TagsGeneration(), generation)
+    self.assertEqual(x.RunTagIndex(event_accumulator.SCALARS),
+                     {'run1': [], 'run2': ['sv1', 'sv2']})
+
+  def testReloadWithThreads(self):
+    """Every EventAccumulator should be reloaded when using reload threads."""
+    run_path_map = {'run%d' % i: 'path%d' % i for i in range(10)}
+    x = event_multiplexer.EventMultiplexer(run_path_map, max_reload_threads=4)
+    self.assertIsNone(x.LastReloadSecs())
+    x.Reload()
+    for run in run_path_map:
+      self.assertTrue(x._GetAccumulator(run).reload_called)
+    self.assertGreaterEqual(x.LastReloadSecs(), 0)
+
+  def testReloadThreadsLogErrorsAndContinue(self):
+    run_path_map = {'run%d' % i: 'path%d' % i for i in range(4)}
+    x = event_multiplexer.EventMultiplexer(run_path_map, max_reload_threads=2)
+
+    def _Fail():
+      raise RuntimeError('boom')
+
+    x._GetAccumulator('run0').Reload = _Fail
+    logged = []
+    self.stubs.Set(tf.logging, 'exception',
+                   lambda msg, *args: logged.append(msg % args))
+    x.Reload()
+    self.assertEqual(len(logged), 1)
+    self.assertIn('run0', logged[0])
+    for run in ('run1', 'run2', 'run3'):
+      self.assertTrue(x._GetAccumulator(run).reload_called)
+
+  def testCloseShutsDownDecoderPool(self):
+    x = event_multiplexer.EventMultiplexer(decode_processes=1)
+    pool = x._decoder_pool
+    x.Close()
+    self.assertIsNone(x._decoder_pool)
+    with self.assertRaises(ValueError):
+      pool.apply_async(len, ((),))
+
+  def testReloadThreadsMustBePositive(self):
+    with self.assertRaises(ValueError):
+      event_multiplexer.EventMultiplexer(max_reload_threads=0)
+
+  def testRejectsUnknownRecordReader(self):
+    with self.assertRaises(ValueError):
+      event_multiplexer.EventMultiplexer(record_reader='carrier_pigeon')
+
+  def testRejectsPayloadViewsWithDecodeProcesses(self):
+    with self.assertRaises(ValueError):
+      event_multiplexer.EventMultiplexer(payload_views=True,
+                                         decode_processes=1)
+
   def testScalars(self):
     """Tests Scalars function returns suitable values."""
     x = event_multiplexer.EventMultiplexer({'run1': 'path1', 'run2': 'path2'})
@@ -330,6 +448,332 @@ class EventMultiplexerTest(tf.test.TestCase):
     self.assertTrue(x._GetAccumulator('run1').reload_called)
     self.assertTrue(x._GetAccumulator('run2').reload_called)
 
+  def testMemoryUsage(self):
+    x = event_multiplexer.EventMultiplexer({'run1': 'path1', 'run2': 'path2'})
+    usage = x.MemoryUsage()
+    self.assertItemsEqual(usage.keys(), ['run1', 'run2'])
+    self.assertEqual(usage['run1'][event_accumulator.IMAGES], {'im1': 100})
+    self.assertEqual(x.TotalMemoryBytes(), 600)
+
+  def testShedsFromLeastRecentlyQueriedRunsFirst(self):
+    x = event_multiplexer.EventMultiplexer(
+        {'run1': 'path1', 'run2': 'path2', 'run3': 'path3'},
+        max_memory_bytes=750)
+    for run in ('run2', 'run3', 'run1'):
+      x.Scalars(run, 'sv1')
+    x.Reload()
+    accumulators = dict(x._accumulators)
+    self.assertEqual(accumulators['run2'].shed,
+                     [event_accumulator.COMPRESSED_HISTOGRAMS,
+                      event_accumulator.IMAGES])
+    self.assertEqual(accumulators['run3'].shed, [])
+    self.assertEqual(accumulators['run1'].shed, [])
+    self.assertEqual(x.TotalMemoryBytes(), 700)
+
+    # Querying shed data loads the run again, from the start.
+    self.assertEqual(x.Images('run2', 'im1'), ['path2/im1'])
+    self.assertIsNot(x._accumulators['run2'], accumulators['run2'])
+    self.assertTrue(x._accumulators['run2'].reload_called)
+    self.assertEqual(x._accumulators['run3'].shed,
+                     [event_accumulator.COMPRESSED_HISTOGRAMS,
+                      event_accumulator.IMAGES])
+
+  def testDropsColdRunsLast(self):
+    x = event_multiplexer.EventMultiplexer(
+        {'run1': 'path1', 'run2': 'path2', 'run3': 'path3'},
+        max_memory_bytes=450)
+    x.Scalars('run1', 'sv1')
+    x.Reload()
+    self.assertItemsEqual(x._accumulators.keys(), ['run1', 'run3'])
+    self.assertEqual(x.TotalMemoryBytes(), 400)
+    # Dropped runs keep being listed, but are not reloaded.
+    self.assertItemsEqual(x.Runs().keys(), ['run1', 'run2', 'run3'])
+    x.Reload()
+    self.assertNotIn('run2', x._accumulators)
+
+    self.assertEqual(x.Scalars('run2', 'sv1'), ['path2/sv1'])
+    self.assertTrue(x._accumulators['run2'].reload_called)
+    self.assertItemsEqual(x._accumulators.keys(), ['run1', 'run2'])
+
+  def testQueryingTheOnlyRunNeverDropsIt(self):
+    x = event_multiplexer.EventMultiplexer({'run1': 'path1'},
+                                           max_memory_bytes=1)
+    x.Reload()
+    self.assertNotIn('run1', x._accumulators)
+    self.assertEqual(x.Scalars('run1', 'sv1'), ['path1/sv1'])
+    self.assertIn('run1', x._accumulators)
+
+  def testLazyRunsAreIndexedButNotLoaded(self):
+    x = event_multiplexer.EventMultiplexer(
+        {'run1': 'path1', 'run2': 'path2', 'run3': 'path3'},
+        max_resident_runs=2)
+    self.assertItemsEqual(x.Runs().keys(), ['run1', 'run2', 'run3'])
+    self.assertEqual(x.Runs()['run1'][event_accumulator.SCALARS], [])
+    x.Reload()
+    self.assertEqual(x._accumulators, {})
+    self.assertEqual(x.Runs()['run1'][event_accumulator.SCALARS],
+                     ['sv1', 'sv2'])
+    self.assertEqual(x.FirstEventTimestamp('run1'), 0)
+    self.assertEqual(x._accumulators, {})
+
+  def testLazyRunsKeepTheMostRecentlyQueriedResident(self):
+    x = event_multiplexer.EventMultiplexer(
+        {'run1': 'path1', 'run2': 'path2', 'run3': 'path3'},
+        max_resident_runs=2)
+    x.Reload()
+    self.assertEqual(x.Scalars('run1', 'sv1'), ['path1/sv1'])
+    self.assertTrue(x._accumulators['run1'].reload_called)
+    x.Scalars('run2', 'sv1')
+    x.Scalars('run3', 'sv1')
+    self.assertItemsEqual(x._accumulators.keys(), ['run2', 'run3'])
+    x.Scalars('run1', 'sv1')
+    self.assertItemsEqual(x._accumulators.keys(), ['run3', 'run1'])
+    self.assertItemsEqual(x.Runs().keys(), ['run1', 'run2', 'run3'])
+
+  def testUnloadedRunsKeepReadingTags(self):
+    x = event_multiplexer.EventMultiplexer(
+        {'run1': 'path1', 'run2': 'path2'}, max_resident_runs=1)
+    x.Reload()
+    x.Scalars('run1', 'sv1')
+    x.Scalars('run2', 'sv1')
+    self.assertItemsEqual(x._accumulators.keys(), ['run2'])
+    index = x._run_indexes['run1']
+    self.assertEqual(index.num_reloads, 0)
+    index.tags = dict(index.tags)
+    index.tags[event_accumulator.SCALARS] = ['sv1', 'sv2', 'sv3']
+    x.Reload()
+    self.assertEqual(index.num_reloads, 1)
+    self.assertEqual(x.Runs()['run1'][event_accumulator.SCALARS],
+                     ['sv1', 'sv2', 'sv3'])
+    self.assertItemsEqual(x._accumulators.keys(), ['run2'])
+
+  def testLazyRunsAddedAfterReloadAreNotLoaded(self):
+    x = event_multiplexer.EventMultiplexer(max_resident_runs=1)
+    x.Reload()
+    x.AddRun('path1', 'run1')
+    self.assertEqual(x._accumulators, {})
+    self.assertEqual(x.Runs()['run1'][event_accumulator.IMAGES], [])
+    x.Reload()
+    self.assertEqual(x.Runs()['run1'][event_accumulator.IMAGES],
+                     ['im1', 'im2'])
+
+  def testConcurrentQueriesOfAnUnloadedRunLoadItOnce(self):
+    loading = threading.Event()
+    release = threading.Event()
+    accumulators = []
+
+    class _SlowAccumulator(_FakeAccumulator):
+
+      def Reload(self):
+        loading.set()
+        release.wait()
+        super(_SlowAccumulator, self).Reload()
+
+    def _GetSlowAccumulator(path, **unused_kwargs):
+      accumulators.append(_SlowAccumulator(path))
+      return accumulators[-1]
+
+    x = event_multiplexer.EventMultiplexer({'run1': 'path1'},
+                                           max_resident_runs=1)
+    x.Reload()
+    self.stubs.Set(event_accumulator, 'EventAccumulator', _GetSlowAccumulator)
+    results = []
+
+    def _Query():
+      results.append(x._GetAccumulator('run1'))
+
+    threads = [threading.Thread(target=_Query) for _ in range(2)]
+    threads[0].start()
+    loading.wait()
+    threads[1].start()
+    # Give the second query time to find the run being loaded.
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(len(accumulators), 1)
+    self.assertEqual(results, accumulators * 2)
+    self.assertEqual(x._loading, {})
+
+  def testResidentRunsMustNotBeNegative(self):
+    with self.assertRaises(ValueError):
+      event_multiplexer.EventMultiplexer(max_resident_runs=-1)
+
+  def testRecentQueries(self):
+    now = [1000.0]
+    self.stubs.Set(time, 'time', lambda: now[0])
+    x = event_multiplexer.EventMultiplexer({'run1': 'path1', 'run2': 'path2'})
+    x.Scalars('run1', 'sv1')
+    now[0] = 1010.0
+    x.Images('run2', 'im1')
+    x.GetOpsWithHealthPills('run1')
+    self.assertEqual(x.RecentQueries(),
+                     {'run1': {'sv1': 1000.0}, 'run2': {'im1': 1010.0}})
+    now[0] = 1015.0
+    self.assertEqual(x.RecentQueries(max_age_secs=10),
+                     {'run1': {}, 'run2': {'im1': 1010.0}})
+
+  def testStaleRunsAreReloadedLessOftenAndLast(self):
+    now = [1000.0]
+    self.stubs.Set(time, 'time', lambda: now[0])
+    reloaded = []
+    x = event_multiplexer.EventMultiplexer(
+        {'run1': 'path1', 'run2': 'path2', 'run3': 'path3'},
+        stale_run_secs=60, stale_run_reload_secs=600)
+    for run in ('run1', 'run2', 'run3'):
+      accumulator = x._accumulators[run]
+      accumulator.Reload = functools.partial(reloaded.append, run)
+    x.Reload()
+    self.assertItemsEqual(reloaded, ['run1', 'run2', 'run3'])
+
+    now[0] = 1100.0
+    x.Scalars('run3', 'sv1')
+    now[0] = 1110.0
+    x.Scalars('run2', 'sv1')
+    del reloaded[:]
+    x.Reload()
+    self.assertEqual(reloaded, ['run2', 'run3'])
+
+    # Only run1 has gone unreloaded for stale_run_reload_secs.
+    now[0] = 1700.0
+    del reloaded[:]
+    x.Reload()
+    self.assertEqual(reloaded, ['run1'])
+
+  def testRunsAreStaleCountingFromWhenTheyWereAdded(self):
+    now = [1000.0]
+    self.stubs.Set(time, 'time', lambda: now[0])
+    reloaded = []
+    x = event_multiplexer.EventMultiplexer(
+        {'run1': 'path1'}, stale_run_secs=60, stale_run_reload_secs=600)
+    x.Reload()
+    now[0] = 1050.0
+    x.AddRun('path2', 'run2')
+    for run in ('run1', 'run2'):
+      accumulator = x._accumulators[run]
+      accumulator.Reload = functools.partial(reloaded.append, run)
+    now[0] = 1070.0
+    x.Reload()
+    # Neither run was queried, but run2 was only added 20 seconds ago.
+    self.assertEqual(reloaded, ['run2'])
+
+  def testReloadRuns(self):
+    x = event_multiplexer.EventMultiplexer(
+        {'run1': 'path1', 'run2': 'path2', 'run3': 'path3'})
+    x._accumulators['run1'].events_per_reload = 3
+    self.assertEqual(x.ReloadRuns(['run1', 'run2', 'unknown']),
+                     {'run1': 3, 'run2': 0})
+    self.assertFalse(x._accumulators['run3'].reload_called)
+
+
+  def testReloadRunsSkipsStaleRuns(self):
+    now = [1000.0]
+    self.stubs.Set(time, 'time', lambda: now[0])
+    x = event_multiplexer.EventMultiplexer(
+        {'run1': 'path1', 'run2': 'path2'},
+        stale_run_secs=60, stale_run_reload_secs=600)
+    self.assertIsNone(x.LastReloadSecs())
+    x.ReloadRuns(['run1', 'run2'])
+    self.assertEqual(x.LastReloadSecs(), 0)
+    now[0] = 1100.0
+    x.Scalars('run2', 'sv1')
+    x._accumulators['run2'].events_per_reload = 2
+    self.assertEqual(x.ReloadRuns(['run1', 'run2']), {'run2': 2})
+
+  def testAddingRunsWakesUpWaitForChange(self):
+    x = event_multiplexer.EventMultiplexer()
+    self.assertFalse(x.WaitForChange(0))
+    x.AddRun('path1', 'run1')
+    self.assertTrue(x.WaitForChange(0))
+    x.AddRun('path1', 'run1')
+    self.assertFalse(x.WaitForChange(0))
+
+  def testWatchChanges(self):
+    tmpdir = os.path.join(self.get_temp_dir(), 'watched')
+    _AddEvents(os.path.join(tmpdir, 'run1'))
+    if not inotify_tracker.IsSupported(tmpdir):
+      self.skipTest('inotify is not supported')
+    walks = []
+    walk = event_multiplexer.GetLogdirSubdirectories
+    self.stubs.Set(event_multiplexer, 'GetLogdirSubdirectories',
+                   lambda path: walks.append(path) or walk(path))
+    x = event_multiplexer.EventMultiplexer(watch_changes=True)
+    self.assertIsNone(x.ChangedRuns())
+    x.AddRunsFromDirectory(tmpdir)
+    # Adding a run wakes up whoever waits for changes.
+    self.assertTrue(x.WaitForChange(0))
+    x.Reload()
+    self.assertEqual(x.ChangedRuns(), set())
+
+    # The logdir isn't walked again until a run is added.
+    x.AddRunsFromDirectory(tmpdir)
+    self.assertEqual(len(walks), 1)
+
+    _AddEvents(os.path.join(tmpdir, 'run2'))
+    self.assertTrue(x.WaitForChange(10))
+    changed = set()
+    deadline = time.time() + 10
+    while 'run1' not in x.Runs() or 'run2' not in x.Runs():
+      self.assertLess(time.time(), deadline)
+      x.AddRunsFromDirectory(tmpdir)
+    with open(os.path.join(tmpdir, 'run1', 'hypothetical.tfevents.out'),
+              'a') as f:
+      f.write('x')
+    while 'run1' not in changed:
+      self.assertLess(time.time(), deadline)
+      x.WaitForChange(1)
+      changed.update(x.ChangedRuns())
+
+  def testCloseClosesChangeTrackers(self):
+    tmpdir = os.path.join(self.get_temp_dir(), 'closed')
+    _AddEvents(os.path.join(tmpdir, 'run1'))
+    trackers = []
+    self.stubs.Set(inotify_tracker, 'CreateChangeTracker',
+                   lambda path, **unused_kwargs: trackers.append(
+                       _FakeChangeTracker()) or trackers[-1])
+    x = event_multiplexer.EventMultiplexer(watch_changes=True)
+    x.AddRunsFromDirectory(tmpdir)
+    self.assertEqual(len(trackers), 1)
+    x.Close()
+    self.assertTrue(trackers[0].closed)
+    self.assertIsNone(x.ChangedRuns())
+
+  def testDeletingWatchedDirectoryClosesItsChangeTracker(self):
+    tmpdir = os.path.join(self.get_temp_dir(), 'deleted')
+    _AddEvents(os.path.join(tmpdir, 'run1'))
+    trackers = []
+    self.stubs.Set(inotify_tracker, 'CreateChangeTracker',
+                   lambda path, **unused_kwargs: trackers.append(
+                       _FakeChangeTracker()) or trackers[-1])
+    x = event_multiplexer.EventMultiplexer(watch_changes=True)
+    x.AddRunsFromDirectory(tmpdir)
+    x.Reload()
+    shutil.rmtree(tmpdir)
+    self.stubs.Set(x._accumulators['run1'], 'Reload',
+                   _RaiseDirectoryDeletedError)
+    x.Reload()
+    self.assertTrue(trackers[0].closed)
+    self.assertIsNone(x.ChangedRuns())
+
+
+class _FakeChangeTracker(object):
+
+  def __init__(self):
+    self.closed = False
+
+  def TreeGeneration(self):
+    return 0
+
+  def PopChangedDirectories(self):
+    return set()
+
+  def Close(self):
+    self.closed = True
+
+
+def _RaiseDirectoryDeletedError():
+  raise directory_watcher.DirectoryDeletedError('deleted')
+
 
 class EventMultiplexerWithRealAccumulatorTest(tf.test.TestCase):
 
@@ -355,6 +799,20 @@ class EventMultiplexerWithRealAccumulatorTest(tf.test.TestCase):
     x.Reload()
     self.assertNotIn('run2', x.Runs().keys())
 
+  def testDeletingDirectoryRemovesRunWithReloadThreads(self):
+    x = event_multiplexer.EventMultiplexer(max_reload_threads=2)
+    tmpdir = os.path.join(self.get_temp_dir(), 'threaded')
+    run_dirs = [os.path.join(tmpdir, 'run%d' % i) for i in range(4)]
+    for i, run_dir in enumerate(run_dirs):
+      _AddEvents(run_dir)
+      x.AddRun(run_dir, 'run%d' % i)
+    x.Reload()
+
+    shutil.rmtree(run_dirs[1])
+    shutil.rmtree(run_dirs[3])
+    x.Reload()
+    self.assertItemsEqual(x.Runs().keys(), ['run0', 'run2'])
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -0,0 +1,359 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tracks changes to a local directory tree with Linux inotify.
+
+Instead of listing directories and statting files to find out whether anything
+was written, an `InotifyChangeTracker` keeps a generation counter for each
+directory under a root, which a background thread bumps whenever inotify
+reports that something in that directory was created, modified, moved or
+deleted. A reader that remembers the generation it last saw can skip all I/O
+while the generation stays the same.
+
+inotify is only available for local filesystems on Linux, so
+`CreateChangeTracker` returns None elsewhere and callers keep polling.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+import tensorflow as tf
+
+# Flags and event masks from <sys/inotify.h>.
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (_IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO |
+               _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF |
+               _IN_ONLYDIR)
+
+# struct inotify_event { int wd; uint32_t mask, cookie, len; char name[]; }
+_EVENT_HEADER = struct.Struct('iIII')
+
+# How often the reading thread checks whether the tracker was closed.
+_POLL_TIMEOUT_SECS = 0.5
+
+
+def _LoadLibc():
+  if not sys.platform.startswith('linux'):
+    return None
+  try:
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                       use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                       ctypes.c_uint32]
+    return libc
+  except (OSError, AttributeError):
+    return None
+
+
+_libc = _LoadLibc()
+
+
+def IsSupported(path):
+  """Returns whether changes under a path can be tracked with inotify."""
+  return (_libc is not None and '://' not in path and
+          os.path.isdir(path))
+
+
+def CreateChangeTracker(root, tree_file_filter=lambda name: True,
+                        on_change=None):
+  """Creates an `InotifyChangeTracker` for a directory, if possible.
+
+  Args:
+    root: The local directory to watch, with all of its subdirectories.
+    tree_file_filter: A function taking a file name and returning whether
+      creating such a file changes the `TreeGeneration`.
+    on_change: An optional function called with no arguments, on the thread
+      reading inotify events, after the tracker recorded a change.
+
+  Returns:
+    A started `InotifyChangeTracker`, or None if inotify cannot be used for
+    root, in which case the caller should poll instead.
+  """
+  if not IsSupported(root):
+    return None
+  try:
+    return InotifyChangeTracker(root, tree_file_filter, on_change)
+  except OSError as e:
+    tf.logging.warning('Not watching %s with inotify, polling instead: %s',
+                       root, e)
+    return None
+
+
+class InotifyChangeTracker(object):
+  """Keeps generation counters for the directories of a tree using inotify.
+
+  `Generation(directory)` changes whenever a file directly inside a directory
+  is created, written, moved or deleted, or when the directory itself is
+  deleted. `TreeGeneration()` changes whenever a directory is created or
+  removed anywhere in the tree, or a file passing `tree_file_filter` is
+  created.
+
+  If inotify drops events, a directory could not be watched, or reading the
+  events fails, generations change on every call instead, which makes readers
+  fall back to polling.
+  """
+
+  def __init__(self, root, tree_file_filter=lambda name: True,
+               on_change=None):
+    """Starts watching a directory tree.
+
+    Args:
+      root: The local directory to watch, with all of its subdirectories.
+      tree_file_filter: A function taking a file name and returning whether
+        creating such a file changes the `TreeGeneration`.
+      on_change: An optional function called with no arguments after each
+        batch of changes.
+
+    Raises:
+      OSError: If inotify could not be set up.
+    """
+    if _libc is None:
+      raise OSError(errno.ENOSYS, 'inotify is not available')
+    self._root = os.path.normpath(root)
+    self._tree_file_filter = tree_file_filter
+    self._on_change = on_change
+    self._mutex = threading.Lock()
+    self._generations = {}
+    self._tree_generation = 0
+    # Incremented whenever events may have been lost. It is part of every
+    # generation, so that every reader loads again.
+    self._epoch = 0
+    # Set when some directory could not be watched, after which generations
+    # change on every call.
+    self._degraded = False
+    self._num_degraded_calls = 0
+    self._watch_paths = {}
+    self._changed_directories = set()
+    self._closed = False
+    # Whether reading or handling events failed, which is only logged once.
+    self._read_failed = False
+
+    self._fd = _libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+    if self._fd < 0:
+      err = ctypes.get_errno()
+      raise OSError(err, 'inotify_init1 failed: %s' % os.strerror(err))
+    try:
+      self._WatchTree(self._root)
+    except OSError:
+      os.close(self._fd)
+      raise
+    self._thread = threading.Thread(target=self._ReadForever,
+                                    name='InotifyChangeTracker')
+    self._thread.daemon = True
+    self._thread.start()
+
+  def Generation(self, directory):
+    """Returns a value that changes whenever the directory changes.
+
+    Args:
+      directory: A directory under the root.
+
+    Returns:
+      An opaque value to compare with the value returned by an earlier call.
+    """
+    directory = os.path.normpath(directory)
+    with self._mutex:
+      if self._degraded or directory not in self._generations:
+        self._num_degraded_calls += 1
+        return ('degraded', self._num_degraded_calls)
+      return (self._epoch, self._generations[directory])
+
+  def TreeGeneration(self):
+    """Returns a value that changes whenever the set of directories changes.
+
+    Returns:
+      An opaque value to compare with the value returned by an earlier call.
+    """
+    with self._mutex:
+      if self._degraded:
+        self._num_degraded_calls += 1
+        return ('degraded', self._num_degraded_calls)
+      return (self._epoch, self._tree_generation)
+
+  def PopChangedDirectories(self):
+    """Returns the directories that changed since the last call.
+
+    Returns:
+      A set of directory paths, or None if changes may have been lost and
+      every directory should be considered changed.
+    """
+    with self._mutex:
+      if self._changed_directories is None or self._degraded:
+        self._changed_directories = set()
+        return None
+      changed = self._changed_directories
+      self._changed_directories = set()
+      return changed
+
+  def Close(self):
+    """Stops watching and closes the inotify file descriptor.
+
+    Generations keep changing on every call afterwards. Closing a tracker
+    again does nothing.
+    """
+    with self._mutex:
+      if self._closed:
+        return
+      self._closed = True
+      self._degraded = True
+    self._thread.join()
+    os.close(self._fd)
+
+  def _WatchTree(self, top):
+    """Watches a directory and all of its subdirectories.
+
+    Args:
+      top: The directory to start from.
+
+    Returns:
+      The directories that are now watched.
+
+    Raises:
+      OSError: If top itself could not be watched.
+    """
+    watched = []
+    for directory, _, _ in os.walk(top):
+      directory = os.path.normpath(directory)
+      wd = _libc.inotify_add_watch(
+          self._fd, tf.compat.as_bytes(directory), _WATCH_MASK)
+      if wd < 0:
+        err = ctypes.get_errno()
+        if directory == top:
+          raise OSError(err, 'Cannot watch %s: %s' % (directory,
+                                                      os.strerror(err)))
+        if err in (errno.ENOENT, errno.ENOTDIR):
+          # It was removed after we listed it.
+          continue
+        tf.logging.warning('Cannot watch %s, polling instead: %s', directory,
+                           os.strerror(err))
+        with self._mutex:
+          self._degraded = True
+        continue
+      with self._mutex:
+        self._watch_paths[wd] = directory
+        self._generations.setdefault(directory, 0)
+      watched.append(directory)
+    return watched
+
+  def _ReadForever(self):
+    while True:
+      with self._mutex:
+        if self._closed:
+          return
+      try:
+        self._ReadEvents()
+      except Exception:  # pylint: disable=broad-except
+        # If this thread died, changes would silently stop being noticed.
+        # Instead, readers poll from now on.
+        with self._mutex:
+          self._degraded = True
+          log = not self._read_failed
+          self._read_failed = True
+        if log:
+          tf.logging.exception('Failed to read inotify events for %s, '
+                               'polling instead', self._root)
+        # Keep the thread alive, without spinning if the error persists.
+        time.sleep(_POLL_TIMEOUT_SECS)
+
+  def _ReadEvents(self):
+    """Handles the events that arrive within `_POLL_TIMEOUT_SECS`, if any."""
+    readable, _, _ = select.select([self._fd], [], [], _POLL_TIMEOUT_SECS)
+    if not readable:
+      return
+    try:
+      data = os.read(self._fd, 64 * 1024)
+    except OSError as e:
+      if e.errno in (errno.EAGAIN, errno.EINTR):
+        return
+      raise
+    self._HandleEvents(data)
+    if self._on_change is not None:
+      self._on_change()
+
+  def _HandleEvents(self, data):
+    new_directories = []
+    with self._mutex:
+      offset = 0
+      while offset + _EVENT_HEADER.size <= len(data):
+        wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+        offset += _EVENT_HEADER.size
+        name = data[offset:offset + name_len].rstrip(b'\0')
+        offset += name_len
+        name = tf.compat.as_str_any(name)
+
+        if mask & _IN_Q_OVERFLOW:
+          self._epoch += 1
+          self._changed_directories = None
+          continue
+        directory = self._watch_paths.get(wd)
+        if directory is None:
+          continue
+        self._generations[directory] += 1
+        if self._changed_directories is not None:
+          self._changed_directories.add(directory)
+
+        if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF | _IN_IGNORED):
+          if mask & _IN_IGNORED:
+            del self._watch_paths[wd]
+          self._tree_generation += 1
+        elif mask & _IN_ISDIR:
+          if mask & (_IN_CREATE | _IN_MOVED_TO):
+            new_directories.append(os.path.join(directory, name))
+          if mask & (_IN_CREATE | _IN_MOVED_TO | _IN_DELETE | _IN_MOVED_FROM):
+            self._tree_generation += 1
+        elif (mask & (_IN_CREATE | _IN_MOVED_TO | _IN_DELETE | _IN_MOVED_FROM)
+              and self._tree_file_filter(name)):
+          self._tree_generation += 1
+
+    for directory in new_directories:
+      # Files may have been written to the new directories before they were
+      # watched, so mark them all as changed.
+      try:
+        watched = self._WatchTree(directory)
+      except OSError as e:
+        if e.errno not in (errno.ENOENT, errno.ENOTDIR):
+          with self._mutex:
+            self._degraded = True
+        continue
+      with self._mutex:
+        for subdirectory in watched:
+          self._generations[subdirectory] += 1
+          if self._changed_directories is not None:
+            self._changed_directories.add(subdirectory)
@@ -0,0 +1,126 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for inotify_tracker."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import time
+
+import tensorflow as tf
+
+from tensorboard.backend.event_processing import inotify_tracker
+
+# How long to wait for the tracker to see a change.
+_TIMEOUT_SECS = 10
+
+
+class InotifyChangeTrackerTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(InotifyChangeTrackerTest, self).setUp()
+    self._root = os.path.join(self.get_temp_dir(), self.id())
+    os.makedirs(os.path.join(self._root, 'run'))
+    if not inotify_tracker.IsSupported(self._root):
+      self.skipTest('inotify is not supported')
+    self._tracker = inotify_tracker.CreateChangeTracker(
+        self._root, tree_file_filter=lambda name: name.startswith('events'))
+    self.assertIsNotNone(self._tracker)
+
+  def tearDown(self):
+    self._tracker.Close()
+    super(InotifyChangeTrackerTest, self).tearDown()
+
+  def _WaitUntil(self, predicate):
+    deadline = time.time() + _TIMEOUT_SECS
+    while not predicate():
+      self.assertLess(time.time(), deadline, 'Timed out waiting for a change')
+      time.sleep(0.01)
+
+  def _Write(self, *path):
+    with open(os.path.join(self._root, *path), 'a') as f:
+      f.write('x')
+
+  def testGenerationChangesWhenFileIsWritten(self):
+    run = os.path.join(self._root, 'run')
+    generation = self._tracker.Generation(run)
+    self.assertEqual(self._tracker.Generation(run), generation)
+    self._Write('run', 'other')
+    self._WaitUntil(lambda: self._tracker.Generation(run) != generation)
+    self.assertEqual(self._tracker.PopChangedDirectories(), {run})
+    self.assertEqual(self._tracker.PopChangedDirectories(), set())
+
+  def testTreeGenerationOnlyChangesForDirectoriesAndMatchingFiles(self):
+    run = os.path.join(self._root, 'run')
+    tree_generation = self._tracker.TreeGeneration()
+    generation = self._tracker.Generation(run)
+    self._Write('run', 'other')
+    self._WaitUntil(lambda: self._tracker.Generation(run) != generation)
+    self.assertEqual(self._tracker.TreeGeneration(), tree_generation)
+
+    self._Write('run', 'events.out')
+    self._WaitUntil(lambda: self._tracker.TreeGeneration() != tree_generation)
+
+  def testWatchesNewDirectories(self):
+    tree_generation = self._tracker.TreeGeneration()
+    new_run = os.path.join(self._root, 'new_run')
+    os.mkdir(new_run)
+    self._WaitUntil(lambda: self._tracker.TreeGeneration() != tree_generation)
+    self._WaitUntil(
+        lambda: new_run in (self._tracker.PopChangedDirectories() or ()))
+    generation = self._tracker.Generation(new_run)
+    self._Write('new_run', 'other')
+    self._WaitUntil(lambda: self._tracker.Generation(new_run) != generation)
+
+  def testGenerationsChangeOnEveryCallAfterClose(self):
+    self._tracker.Close()
+    self.assertNotEqual(self._tracker.TreeGeneration(),
+                        self._tracker.TreeGeneration())
+    self.assertIsNone(self._tracker.PopChangedDirectories())
+    self._tracker = _ClosedTracker()
+
+  def testClosingTwiceIsHarmless(self):
+    self._tracker.Close()
+    self._tracker.Close()
+
+  def testFallsBackToPollingWhenHandlingEventsFails(self):
+    self._tracker.Close()
+    calls = []
+    def _OnChange():
+      calls.append(None)
+      raise RuntimeError('on_change failed')
+    self._tracker = inotify_tracker.CreateChangeTracker(
+        self._root, on_change=_OnChange)
+    run = os.path.join(self._root, 'run')
+    self._Write('run', 'other')
+    self._WaitUntil(lambda: calls)
+    self.assertNotEqual(self._tracker.Generation(run),
+                        self._tracker.Generation(run))
+    self.assertIsNone(self._tracker.PopChangedDirectories())
+    # The thread stays alive and keeps handling events.
+    self._Write('run', 'other')
+    self._WaitUntil(lambda: len(calls) > 1)
+
+
+class _ClosedTracker(object):
+
+  def Close(self):
+    pass
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -17,15 +17,31 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
 import os
+import re
+import threading
 
+import six
+from six.moves import queue
 import tensorflow as tf
 
+# Make sure keeping consistent with ParseURI in core/lib/io/path.cc
+_URI_PATTERN = re.compile("[a-zA-Z][0-9a-zA-Z.]*://.*")
+
+# The default number of directories ListRecursivelyInParallel lists at once.
+DEFAULT_WALK_THREADS = 16
+
 
 def IsGCSPath(path):
   return path.startswith("gs://")
 
 
+def IsLocalPath(path):
+  """Returns whether the path is on the local filesystem rather than a URI."""
+  return _URI_PATTERN.match(path) is None
+
+
 def ListDirectoryAbsolute(directory):
   """Yields all files in the given directory. The paths are absolute."""
   return (os.path.join(directory, path)
@@ -50,3 +66,101 @@ def ListRecursively(top):
   for dir_path, _, filenames in tf.gfile.Walk(top):
     yield (dir_path, (os.path.join(dir_path, filename)
                       for filename in filenames))
+
+
+def ListRecursivelyInParallel(tops, max_threads=DEFAULT_WALK_THREADS,
+                              max_depth=None):
+  """Walks directory trees, listing many directories at once.
+
+  Like ListRecursively, but up to max_threads directories are listed at once
+  as soon as their parent was listed, so that sibling directories cost one
+  round trip together instead of one each. This matters on high-latency
+  filesystems such as GCS or NFS. The listing happens on
+  `DEFAULT_WALK_THREADS` worker threads shared by all walks.
+
+  Results are yielded as they arrive, so parents come before their children
+  but the order is otherwise unspecified. Directories that don't exist yield
+  nothing.
+
+  Args:
+    tops: A path to a directory, or a list of them.
+    max_threads: The most directories to list at once, up to
+      `DEFAULT_WALK_THREADS`.
+    max_depth: If not None, the number of levels below each top to descend.
+      0 lists only the tops.
+
+  Yields:
+    (dir_path, file_paths) tuples, where file_paths is a list of absolute
+    paths.
+
+  Raises:
+    tf.errors.OpError: If a directory could not be listed for a reason other
+      than it not existing.
+  """
+  if isinstance(tops, six.string_types):
+    tops = [tops]
+  waiting = collections.deque((top, 0) for top in tops)
+  max_listings = max(1, min(max_threads, DEFAULT_WALK_THREADS))
+  work = _WalkQueue()
+  # Listings still in flight when the caller stops early are put here anyway
+  # and dropped along with the queue.
+  results = queue.Queue()
+  num_listing = 0
+  while waiting or num_listing:
+    while waiting and num_listing < max_listings:
+      directory, depth = waiting.popleft()
+      work.put((directory, depth, results))
+      num_listing += 1
+    directory, depth, entries, error = results.get()
+    num_listing -= 1
+    if error is not None:
+      if isinstance(error, tf.errors.NotFoundError):
+        continue
+      raise error
+    subdirectories, file_paths = entries
+    if max_depth is None or depth < max_depth:
+      waiting.extend((subdirectory, depth + 1)
+                     for subdirectory in subdirectories)
+    yield (directory, file_paths)
+
+
+_walk_queue = None
+_walk_queue_mutex = threading.Lock()
+
+
+def _WalkQueue():
+  """Returns the queue of the shared walk threads, starting them if needed."""
+  global _walk_queue
+  with _walk_queue_mutex:
+    if _walk_queue is None:
+      work = queue.Queue()
+      for i in range(DEFAULT_WALK_THREADS):
+        thread = threading.Thread(target=_WalkForever, args=(work,),
+                                  name='ListRecursively-%d' % i)
+        thread.daemon = True
+        thread.start()
+      _walk_queue = work
+    return _walk_queue
+
+
+def _WalkForever(work):
+  """Lists `(directory, depth, results)` items, putting them in `results`."""
+  while True:
+    directory, depth, results = work.get()
+    try:
+      results.put((directory, depth, _ListDirectoryEntries(directory), None))
+    except Exception as e:  # pylint: disable=broad-except
+      results.put((directory, depth, None, e))
+
+
+def _ListDirectoryEntries(directory):
+  """Returns the absolute paths of the subdirectories and files of directory."""
+  subdirectories = []
+  file_paths = []
+  for name in tf.gfile.ListDirectory(directory):
+    path = os.path.join(directory, name)
+    if tf.gfile.IsDirectory(path):
+      subdirectories.append(path)
+    else:
+      file_paths.append(path)
+  return subdirectories, file_paths
@@ -0,0 +1,152 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for io_wrapper."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import threading
+import time
+
+import tensorflow as tf
+
+from tensorboard.backend.event_processing import io_wrapper
+
+
+# How long listings in a rendezvous wait for each other.
+_RENDEZVOUS_TIMEOUT_SECS = 10
+
+
+class _FakeFileSystem(object):
+  """A fake filesystem where listings of some directories wait for each other.
+
+  Directories are the keys of a `{directory: [names]}` dictionary, and every
+  other name is a file. Each listing of a directory in `rendezvous` waits until
+  all of them are being listed at once, or until a timeout.
+  """
+
+  def __init__(self, tree, rendezvous=()):
+    self._tree = tree
+    self._rendezvous = set(rendezvous)
+    self._arrived = set()
+    self._condition = threading.Condition()
+    self.met = False
+
+  def ListDirectory(self, directory):
+    if directory in self._rendezvous:
+      self._Meet(directory)
+    if directory not in self._tree:
+      raise tf.errors.NotFoundError(None, None, 'No such directory')
+    return list(self._tree[directory])
+
+  def IsDirectory(self, path):
+    return path in self._tree
+
+  def _Meet(self, directory):
+    deadline = time.time() + _RENDEZVOUS_TIMEOUT_SECS
+    with self._condition:
+      self._arrived.add(directory)
+      if self._arrived == self._rendezvous:
+        self.met = True
+        self._condition.notify_all()
+      while not self.met and time.time() < deadline:
+        self._condition.wait(deadline - time.time())
+
+
+class ListRecursivelyInParallelTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(ListRecursivelyInParallelTest, self).setUp()
+    self.stubs = tf.test.StubOutForTesting()
+
+  def tearDown(self):
+    self.stubs.CleanUp()
+    super(ListRecursivelyInParallelTest, self).tearDown()
+
+  def _UseFileSystem(self, tree, rendezvous=()):
+    filesystem = _FakeFileSystem(tree, rendezvous)
+    self.stubs.Set(tf.gfile, 'ListDirectory', filesystem.ListDirectory)
+    self.stubs.Set(tf.gfile, 'IsDirectory', filesystem.IsDirectory)
+    return filesystem
+
+  def _List(self, tops, **kwargs):
+    return sorted((directory, sorted(files)) for directory, files in
+                  io_wrapper.ListRecursivelyInParallel(tops, **kwargs))
+
+  def testMatchesListRecursively(self):
+    top = os.path.join(self.get_temp_dir(), 'walk')
+    for directory in ('a/b', 'a/c', 'd'):
+      os.makedirs(os.path.join(top, directory))
+    for path in ('f', 'a/g', 'a/b/h', 'a/b/i'):
+      open(os.path.join(top, path), 'w').close()
+    expected = sorted((directory, sorted(files)) for directory, files in
+                      io_wrapper.ListRecursively(top))
+    self.assertEqual(self._List(top), expected)
+    self.assertEqual(self._List(top, max_threads=1), expected)
+
+  def testMissingDirectoryYieldsNothing(self):
+    self._UseFileSystem({'/top': []})
+    self.assertEqual(self._List('/missing'), [])
+    self.assertEqual(self._List(['/missing', '/top']), [('/top', [])])
+
+  def testMaxDepth(self):
+    self._UseFileSystem({
+        '/top': ['a', 'f'],
+        '/top/a': ['b', 'g'],
+        '/top/a/b': ['h'],
+    })
+    self.assertEqual(self._List('/top', max_depth=0), [('/top', ['/top/f'])])
+    self.assertEqual(self._List('/top', max_depth=1),
+                     [('/top', ['/top/f']), ('/top/a', ['/top/a/g'])])
+
+  def testRaisesOtherErrors(self):
+    self._UseFileSystem({'/top': []})
+
+    def ListDirectory(directory):
+      raise tf.errors.PermissionDeniedError(None, None, directory)
+
+    self.stubs.Set(tf.gfile, 'ListDirectory', ListDirectory)
+    with self.assertRaises(tf.errors.PermissionDeniedError):
+      self._List('/top')
+
+  def testStoppingEarly(self):
+    self._UseFileSystem({'/top': ['a', 'b'], '/top/a': [], '/top/b': []})
+    walk = io_wrapper.ListRecursivelyInParallel('/top')
+    self.assertEqual(next(walk)[0], '/top')
+    walk.close()
+
+  def testListsSiblingsConcurrently(self):
+    runs = ['/top/run%d' % i for i in range(4)]
+    tree = {'/top': [os.path.basename(run) for run in runs]}
+    for i, run in enumerate(runs):
+      tree[run] = ['events.out.tfevents.%d' % i]
+    # Listing the runs only finishes quickly if they are listed together.
+    filesystem = self._UseFileSystem(tree, rendezvous=runs)
+    self.assertEqual(len(self._List('/top', max_threads=4)), 5)
+    self.assertTrue(filesystem.met)
+
+  def testSharesWorkerThreads(self):
+    self._UseFileSystem({'/top': ['a'], '/top/a': []})
+    self._List('/top')
+    num_threads = threading.active_count()
+    for _ in range(3):
+      self._List('/top')
+    self.assertEqual(threading.active_count(), num_threads)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -22,6 +22,8 @@ import os.path
 
 import tensorflow as tf
 
+from tensorboard.backend.event_processing import io_wrapper
+
 
 _PLUGINS_DIR = "plugins"
 
@@ -74,6 +76,33 @@ def ListAssets(logdir, plugin_name):
   return [x for x in entries if not _IsDirectory(plugin_dir, x)]
 
 
+def ListAssetsOfRuns(logdirs, plugin_name):
+  """Lists the assets of a plugin in many logdirs at once.
+
+  This returns the same as calling ListAssets for each logdir, but lists the
+  plugin directories concurrently, which is much faster on high-latency
+  filesystems.
+
+  Args:
+    logdirs: An iterable of directories created by TensorFlow summary
+      FileWriters.
+    plugin_name: A string name of a plugin to list assets for.
+
+  Returns:
+    A dictionary mapping each logdir to a string list of available plugin
+    assets.
+  """
+  logdirs = list(logdirs)
+  logdir_by_plugin_dir = {PluginDirectory(logdir, plugin_name): logdir
+                          for logdir in logdirs}
+  result = {logdir: [] for logdir in logdirs}
+  for plugin_dir, file_paths in io_wrapper.ListRecursivelyInParallel(
+      list(logdir_by_plugin_dir), max_depth=0):
+    result[logdir_by_plugin_dir[plugin_dir]] = [
+        os.path.basename(path) for path in file_paths]
+  return result
+
+
 def RetrieveAsset(logdir, plugin_name, asset_name):
   """Retrieve a particular plugin asset from a logdir.
 
@@ -0,0 +1,220 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Decodes event files in worker processes.
+
+Parsing Event protos holds the GIL, so doing it on the server's reload thread
+slows down the threads serving HTTP requests. A ProcessPoolEventFileLoader
+hands the reading and parsing to a `multiprocessing.Pool`, whose workers send
+back scalar summaries as compact per-tag arrays. Everything else is sent back
+as serialized events to be processed as usual.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+
+import numpy as np
+import tensorflow as tf
+
+from tensorboard.backend.event_processing import event_file_loader
+
+# A run of events that only contain scalar summaries. `series` maps each tag
+# to a `(wall_times, steps, values)` tuple of float64, int64 and float64 numpy
+# arrays. The other fields describe the first and last event of the run.
+ScalarBatch = collections.namedtuple(
+    'ScalarBatch',
+    ['series', 'first_wall_time', 'last_step', 'last_wall_time'])
+
+# The most bytes of records a worker decodes per request, which bounds the size
+# of the results sent back to the server process. Images, audio and tensors
+# come back as whole serialized records, and the next request decodes while
+# the results of one are processed, so this bounds the memory in flight.
+_MAX_BYTES_PER_REQUEST = 32 << 20
+
+# The most records a worker decodes per request, which bounds the work of a
+# request on files of small events.
+_MAX_RECORDS_PER_REQUEST = 50000
+
+
+def _IsScalarOnlyEvent(event):
+  values = event.summary.value
+  return (event.HasField('summary') and len(values) > 0 and
+          all(value.HasField('simple_value') for value in values))
+
+
+class _ScalarBatchBuilder(object):
+
+  def __init__(self):
+    self._series = collections.defaultdict(lambda: ([], [], []))
+    self._first_wall_time = None
+    self._last_step = None
+    self._last_wall_time = None
+
+  def Add(self, event):
+    if self._first_wall_time is None:
+      self._first_wall_time = event.wall_time
+    self._last_step = event.step
+    self._last_wall_time = event.wall_time
+    for value in event.summary.value:
+      wall_times, steps, values = self._series[value.tag]
+      wall_times.append(event.wall_time)
+      steps.append(event.step)
+      values.append(value.simple_value)
+
+  def Build(self):
+    series = {
+        tag: (np.array(wall_times, dtype=np.float64),
+              np.array(steps, dtype=np.int64),
+              np.array(values, dtype=np.float64))
+        for tag, (wall_times, steps, values) in self._series.items()
+    }
+    return ScalarBatch(series=series,
+                       first_wall_time=self._first_wall_time,
+                       last_step=self._last_step,
+                       last_wall_time=self._last_wall_time)
+
+
+def DecodeEventFile(path, offset, most_recent_step, purge_orphaned_data,
+                    max_records=_MAX_RECORDS_PER_REQUEST,
+                    max_bytes=_MAX_BYTES_PER_REQUEST):
+  """Decodes the events in a file from `offset` onwards.
+
+  This runs in a worker process. Consecutive events that only hold scalar
+  summaries are reduced to a ScalarBatch, as long as none of them could
+  trigger the accumulator's purge of orphaned data: those, like all other
+  events, are returned serialized so the accumulator processes them exactly
+  as it would have without the worker. To decide this, the worker replays the
+  accumulator's bookkeeping of the most recent step. Accumulators that purge
+  by `SessionLog.START` events rather than by step pass False for
+  purge_orphaned_data, since no scalar-only event purges anything then.
+
+  Args:
+    path: The path of the event file.
+    offset: The offset of the first record to decode.
+    most_recent_step: The accumulator's `most_recent_step`.
+    purge_orphaned_data: Whether the accumulator purges orphaned data by step.
+    max_records: The maximum number of records to decode.
+    max_bytes: Decoding stops after the first record that brings the bytes of
+      the records decoded to this many or more, so at least one record is
+      decoded however large it is.
+
+  Returns:
+    A `(next_offset, items, most_recent_step)` tuple, where items is a list
+    of ScalarBatches and serialized events, in file order, and
+    most_recent_step is the replayed most recent step after them.
+  """
+  reader = event_file_loader.BufferedRecordReader(path, offset=offset)
+  items = []
+  batch = None
+  num_bytes = 0
+  for num_records, record in enumerate(reader.Records()):
+    num_bytes += len(record)
+    event = event_file_loader.ParseEvent(record)
+    would_purge = (purge_orphaned_data and event.HasField('summary') and
+                   event.step < most_recent_step)
+    if not would_purge:
+      most_recent_step = event.step
+    if not would_purge and _IsScalarOnlyEvent(event):
+      if batch is None:
+        batch = _ScalarBatchBuilder()
+      batch.Add(event)
+    else:
+      if batch is not None:
+        items.append(batch.Build())
+        batch = None
+      items.append(record)
+    if num_records + 1 >= max_records or num_bytes >= max_bytes:
+      break
+  if batch is not None:
+    items.append(batch.Build())
+  return reader.Offset(), items, most_recent_step
+
+
+def _DecodesAlike(purge_state, other_purge_state):
+  """Returns whether a worker decodes the same way given either purge state."""
+  if not purge_state[1] and not other_purge_state[1]:
+    # The most recent step only matters when purging orphaned data.
+    return True
+  return purge_state == other_purge_state
+
+
+class ProcessPoolEventFileLoader(object):
+  """An EventLoader that decodes its file in a `multiprocessing.Pool`.
+
+  `Load` yields `tf.Event` protos, like EventFileLoader, and ScalarBatches.
+  While the items of one request are being yielded, the next request is
+  already decoding, on the guess that the accumulator ends up in the state
+  the worker replayed. If it does not, the guess is discarded and the request
+  is sent again, so the accumulator state a request is decoded with always
+  reflects every earlier event, and nothing is lost if iteration stops early.
+  """
+
+  def __init__(self, file_path, pool, purge_state_fn):
+    """Constructs a ProcessPoolEventFileLoader.
+
+    Args:
+      file_path: The path of the event file.
+      pool: The `multiprocessing.Pool` to decode in.
+      purge_state_fn: A function returning the accumulator's
+        `(most_recent_step, purge_orphaned_data)`, where purge_orphaned_data
+        is whether it purges by step.
+
+    Raises:
+      ValueError: If file_path is None.
+    """
+    if file_path is None:
+      raise ValueError('A file path is required')
+    self._file_path = file_path
+    self._pool = pool
+    self._purge_state_fn = purge_state_fn
+    self._offset = 0
+    self._pending = collections.deque()
+
+  def _Decode(self, purge_state):
+    return self._pool.apply_async(
+        DecodeEventFile, (self._file_path, self._offset) + tuple(purge_state))
+
+  def Load(self):
+    """Loads all new events and scalar batches from disk.
+
+    Yields:
+      `tf.Event` protos and ScalarBatches, in file order.
+    """
+    # The guessed purge state and the request decoding with it, if any. It is
+    # not kept across calls, since by then it may have missed newer events.
+    guess = None
+    while True:
+      while self._pending:
+        item = self._pending.popleft()
+        if isinstance(item, ScalarBatch):
+          yield item
+        else:
+          yield event_file_loader.ParseEvent(item)
+      purge_state = self._purge_state_fn()
+      if guess is not None and _DecodesAlike(guess[0], purge_state):
+        result = guess[1]
+      else:
+        result = self._Decode(purge_state)
+      guess = None
+      offset, items, most_recent_step = result.get()
+      if not items:
+        break
+      self._offset = offset
+      self._pending.extend(items)
+      guessed_state = (most_recent_step, purge_state[1])
+      guess = (guessed_state, self._Decode(guessed_state))
+    tf.logging.debug('No more events in %s', self._file_path)
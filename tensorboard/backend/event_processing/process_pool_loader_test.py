@@ -0,0 +1,208 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for process_pool_loader."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import functools
+import multiprocessing
+import os
+
+import tensorflow as tf
+
+from tensorboard.backend.event_processing import process_pool_loader
+
+
+class _InlineResult(object):
+
+  def __init__(self, value):
+    self._value = value
+
+  def get(self):
+    return self._value
+
+
+class _InlinePool(object):
+  """Runs functions on the calling thread, like a pool with no workers."""
+
+  def __init__(self):
+    self.calls = []
+
+  def apply_async(self, func, args):
+    self.calls.append(args)
+    return _InlineResult(func(*args))
+
+
+def _ScalarEvent(step, **values):
+  return tf.Event(
+      wall_time=1000.0 + step,
+      step=step,
+      summary=tf.Summary(value=[
+          tf.Summary.Value(tag=tag, simple_value=value)
+          for tag, value in sorted(values.items())
+      ]))
+
+
+class ProcessPoolEventFileLoaderTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(ProcessPoolEventFileLoaderTest, self).setUp()
+    self._path = os.path.join(self.get_temp_dir(), 'events.out.tfevents.1')
+    if os.path.exists(self._path):
+      os.remove(self._path)
+
+  def _WriteEvents(self, events):
+    # TFRecordWriter truncates, so rewrite everything written so far.
+    self._written = getattr(self, '_written', []) + list(events)
+    with tf.python_io.TFRecordWriter(self._path) as writer:
+      for event in self._written:
+        writer.write(event.SerializeToString())
+
+  def _Decode(self, offset=0, most_recent_step=-1, purge_orphaned_data=True,
+              **kwargs):
+    return process_pool_loader.DecodeEventFile(
+        self._path, offset, most_recent_step, purge_orphaned_data, **kwargs)
+
+  def testBatchesConsecutiveScalarEvents(self):
+    self._WriteEvents([_ScalarEvent(i, loss=i / 2, acc=i / 4)
+                       for i in range(3)])
+    offset, items, most_recent_step = self._Decode()
+    self.assertEqual(offset, os.path.getsize(self._path))
+    self.assertEqual(most_recent_step, 2)
+    self.assertEqual(len(items), 1)
+    batch = items[0]
+    self.assertEqual(batch.first_wall_time, 1000.0)
+    self.assertEqual(batch.last_step, 2)
+    self.assertEqual(batch.last_wall_time, 1002.0)
+    self.assertItemsEqual(batch.series.keys(), ['loss', 'acc'])
+    wall_times, steps, values = batch.series['loss']
+    self.assertEqual(wall_times.tolist(), [1000.0, 1001.0, 1002.0])
+    self.assertEqual(steps.tolist(), [0, 1, 2])
+    self.assertEqual(steps.dtype.name, 'int64')
+    self.assertEqual(values.tolist(), [0.0, 0.5, 1.0])
+
+  def testOtherEventsAreSerialized(self):
+    file_version = tf.Event(wall_time=1.0, file_version='brain.Event:2')
+    self._WriteEvents([file_version, _ScalarEvent(1, loss=1.0),
+                       _ScalarEvent(2, loss=2.0)])
+    _, items, _ = self._Decode()
+    self.assertEqual(len(items), 2)
+    self.assertEqual(tf.Event.FromString(items[0]), file_version)
+    self.assertEqual(items[1].series['loss'][1].tolist(), [1, 2])
+
+  def testEventsThatWouldPurgeAreNotBatched(self):
+    restarted = _ScalarEvent(1, loss=5.0)
+    self._WriteEvents([_ScalarEvent(1, loss=1.0), _ScalarEvent(2, loss=2.0),
+                       restarted, _ScalarEvent(2, loss=6.0)])
+    _, items, _ = self._Decode()
+    self.assertEqual(len(items), 3)
+    self.assertEqual(items[0].series['loss'][1].tolist(), [1, 2])
+    self.assertEqual(tf.Event.FromString(items[1]), restarted)
+    self.assertEqual(items[2].series['loss'][1].tolist(), [2])
+
+  def testStartsFromTheAccumulatorsMostRecentStep(self):
+    self._WriteEvents([_ScalarEvent(1, loss=1.0)])
+    _, items, _ = self._Decode(most_recent_step=5)
+    self.assertEqual(len(items), 1)
+    self.assertIsInstance(items[0], bytes)
+    _, items, _ = self._Decode(most_recent_step=5, purge_orphaned_data=False)
+    self.assertIsInstance(items[0], process_pool_loader.ScalarBatch)
+
+  def testMaxRecordsResumesAtOffset(self):
+    self._WriteEvents([_ScalarEvent(i, loss=i) for i in range(5)])
+    offset, items, _ = self._Decode(max_records=2)
+    self.assertEqual(items[0].series['loss'][1].tolist(), [0, 1])
+    offset, items, _ = self._Decode(offset=offset, most_recent_step=1)
+    self.assertEqual(items[0].series['loss'][1].tolist(), [2, 3, 4])
+    self.assertEqual(offset, os.path.getsize(self._path))
+
+  def testMaxBytesResumesAtOffset(self):
+    file_version = tf.Event(wall_time=1.0, file_version='brain.Event:2')
+    self._WriteEvents([file_version, file_version, file_version])
+    record_bytes = len(file_version.SerializeToString())
+    offset, items, _ = self._Decode(max_bytes=record_bytes + 1)
+    self.assertEqual(len(items), 2)
+    offset, items, _ = self._Decode(offset=offset, max_bytes=1)
+    self.assertEqual(len(items), 1)
+    self.assertEqual(offset, os.path.getsize(self._path))
+
+  def testLoaderPicksUpAppendedEvents(self):
+    pool = _InlinePool()
+    state = {'most_recent_step': -1}
+    loader = process_pool_loader.ProcessPoolEventFileLoader(
+        self._path, pool, lambda: (state['most_recent_step'], True))
+    self._WriteEvents([_ScalarEvent(1, loss=1.0)])
+    items = list(loader.Load())
+    self.assertEqual(len(items), 1)
+    state['most_recent_step'] = items[0].last_step
+    self.assertEqual(list(loader.Load()), [])
+    self._WriteEvents([_ScalarEvent(2, loss=2.0)])
+    items = list(loader.Load())
+    self.assertEqual(items[0].series['loss'][1].tolist(), [2])
+
+  def testLoaderDecodesAheadWithTheReplayedState(self):
+    self._WriteEvents([_ScalarEvent(i, loss=i) for i in range(5)])
+    pool = _InlinePool()
+    stubs = tf.test.StubOutForTesting()
+    stubs.Set(process_pool_loader, 'DecodeEventFile',
+              functools.partial(process_pool_loader.DecodeEventFile,
+                                max_records=2))
+    try:
+      state = {'most_recent_step': -1}
+      loader = process_pool_loader.ProcessPoolEventFileLoader(
+          self._path, pool, lambda: (state['most_recent_step'], True))
+      steps = []
+      for batch in loader.Load():
+        steps.extend(batch.series['loss'][1].tolist())
+        state['most_recent_step'] = batch.last_step
+    finally:
+      stubs.CleanUp()
+    self.assertEqual(steps, list(range(5)))
+    # Every guess was right, so no request was sent twice.
+    self.assertEqual([args[2] for args in pool.calls], [-1, 1, 3, 4])
+
+  def testLoaderDiscardsWrongGuesses(self):
+    self._WriteEvents([_ScalarEvent(1, loss=1.0)])
+    pool = _InlinePool()
+    loader = process_pool_loader.ProcessPoolEventFileLoader(
+        self._path, pool, lambda: (-1, True))
+    self.assertEqual(len(list(loader.Load())), 1)
+    # The guess that the most recent step is 1 is decoded again with -1.
+    self.assertEqual([args[2] for args in pool.calls], [-1, 1, -1])
+
+  def testLoaderParsesSerializedEvents(self):
+    file_version = tf.Event(wall_time=1.0, file_version='brain.Event:2')
+    self._WriteEvents([file_version])
+    loader = process_pool_loader.ProcessPoolEventFileLoader(
+        self._path, _InlinePool(), lambda: (-1, True))
+    self.assertEqual(list(loader.Load()), [file_version])
+
+  def testLoaderWithWorkerProcesses(self):
+    self._WriteEvents([_ScalarEvent(i, loss=i) for i in range(10)])
+    pool = multiprocessing.Pool(1)
+    try:
+      loader = process_pool_loader.ProcessPoolEventFileLoader(
+          self._path, pool, lambda: (-1, True))
+      items = list(loader.Load())
+    finally:
+      pool.terminate()
+    self.assertEqual(len(items), 1)
+    self.assertEqual(items[0].series['loss'][2].tolist(), list(range(10)))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,152 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Overlaps reading records with processing them using a producer thread."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import sys
+import threading
+
+import six
+from six.moves import queue
+
+PrefetchStats = collections.namedtuple(
+    'PrefetchStats', ['records', 'producer_stalls', 'consumer_stalls'])
+
+# How long a blocked producer waits before checking whether the consumer has
+# gone away.
+_PUT_TIMEOUT_SECS = 0.5
+
+# How long the consumer waits for the producer to finish when it stops
+# iterating. A producer still blocked in the iterator after that is waited for
+# by the next `Prefetch`.
+_JOIN_TIMEOUT_SECS = 5
+
+
+class RecordPrefetcher(object):
+  """Iterates over a record iterator on a background thread.
+
+  The producer thread pulls items from the iterator into a bounded queue, and
+  the consumer takes them from the queue as it gets to them. When the iterator
+  blocks on I/O, the consumer can keep working on the items that are already
+  queued; when the consumer is busy, the producer reads ahead until the queue
+  is full.
+
+  The producer only ever reads ahead of what the consumer has taken by the
+  depth of the queue. If the consumer stops iterating early, items that were
+  queued but not taken are dropped, so this is only suitable when the consumer
+  processes everything the iterator yields.
+
+  A stall is counted whenever one side has to wait for the other: the
+  producer when the queue is full, the consumer when it is empty.
+  """
+
+  def __init__(self, queue_depth):
+    """Constructs a RecordPrefetcher.
+
+    Args:
+      queue_depth: The maximum number of items read ahead of the consumer.
+
+    Raises:
+      ValueError: If queue_depth is not positive.
+    """
+    if queue_depth <= 0:
+      raise ValueError('queue_depth must be positive, was %s' % queue_depth)
+    self._queue_depth = queue_depth
+    # The producer of the last `Prefetch`, which may still be running if the
+    # consumer stopped early.
+    self._producer = None
+    self._records = 0
+    self._producer_stalls = 0
+    self._consumer_stalls = 0
+
+  def Stats(self):
+    """Returns the counters accumulated over all calls to `Prefetch`.
+
+    Returns:
+      A `PrefetchStats` tuple.
+    """
+    return PrefetchStats(records=self._records,
+                         producer_stalls=self._producer_stalls,
+                         consumer_stalls=self._consumer_stalls)
+
+  def Prefetch(self, iterator):
+    """Yields the items of `iterator`, reading them on a producer thread.
+
+    Args:
+      iterator: The iterator to read items from. It is only advanced on the
+        producer thread. A later call waits for the producer of an earlier
+        call to finish, so both may be given the same iterator.
+
+    Yields:
+      The items of `iterator`, in order.
+
+    Raises:
+      Any exception raised by `iterator`, once the items that came before it
+      have been yielded.
+    """
+    items = queue.Queue(maxsize=self._queue_depth)
+    consumer_gone = threading.Event()
+
+    def _Put(entry):
+      try:
+        items.put_nowait(entry)
+        return True
+      except queue.Full:
+        self._producer_stalls += 1
+      while not consumer_gone.is_set():
+        try:
+          items.put(entry, timeout=_PUT_TIMEOUT_SECS)
+          return True
+        except queue.Full:
+          pass
+      return False
+
+    def _Produce():
+      try:
+        for item in iterator:
+          if not _Put((True, item)):
+            return
+      except Exception:  # pylint: disable=broad-except
+        _Put((False, sys.exc_info()))
+      else:
+        _Put((False, None))
+
+    if self._producer is not None:
+      # Never let two producers advance the same iterator.
+      self._producer.join()
+    producer = threading.Thread(target=_Produce, name='RecordPrefetcher')
+    producer.daemon = True
+    self._producer = producer
+    producer.start()
+    try:
+      while True:
+        try:
+          is_item, value = items.get_nowait()
+        except queue.Empty:
+          self._consumer_stalls += 1
+          is_item, value = items.get()
+        if not is_item:
+          if value is not None:
+            six.reraise(*value)
+          break
+        self._records += 1
+        yield value
+    finally:
+      consumer_gone.set()
+      producer.join(_JOIN_TIMEOUT_SECS)
@@ -0,0 +1,121 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for record_prefetcher."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+import time
+
+from six.moves import xrange  # pylint: disable=redefined-builtin
+import tensorflow as tf
+
+from tensorboard.backend.event_processing import record_prefetcher
+
+
+class RecordPrefetcherTest(tf.test.TestCase):
+
+  def testRejectsNonPositiveDepth(self):
+    with self.assertRaises(ValueError):
+      record_prefetcher.RecordPrefetcher(0)
+
+  def testYieldsItemsInOrder(self):
+    prefetcher = record_prefetcher.RecordPrefetcher(3)
+    self.assertEqual(list(prefetcher.Prefetch(iter(xrange(100)))),
+                     list(xrange(100)))
+    self.assertEqual(prefetcher.Stats().records, 100)
+
+  def testEmptyIterator(self):
+    prefetcher = record_prefetcher.RecordPrefetcher(3)
+    self.assertEqual(list(prefetcher.Prefetch(iter([]))), [])
+
+  def testReadsOnAnotherThread(self):
+    threads = []
+
+    def _Items():
+      for i in xrange(3):
+        threads.append(threading.current_thread())
+        yield i
+
+    prefetcher = record_prefetcher.RecordPrefetcher(3)
+    list(prefetcher.Prefetch(_Items()))
+    self.assertNotIn(threading.current_thread(), threads)
+
+  def testPropagatesExceptionsAfterEarlierItems(self):
+
+    def _Items():
+      yield 1
+      yield 2
+      raise IOError('boom')
+
+    prefetcher = record_prefetcher.RecordPrefetcher(1)
+    items = []
+    with self.assertRaises(IOError):
+      for item in prefetcher.Prefetch(_Items()):
+        items.append(item)
+    self.assertEqual(items, [1, 2])
+
+  def testCountsProducerStallsWhenConsumerIsSlow(self):
+    prefetcher = record_prefetcher.RecordPrefetcher(1)
+    for _ in prefetcher.Prefetch(iter(xrange(5))):
+      time.sleep(0.01)
+    self.assertGreater(prefetcher.Stats().producer_stalls, 0)
+
+  def testCountsConsumerStallsWhenProducerIsSlow(self):
+
+    def _Items():
+      for i in xrange(5):
+        time.sleep(0.01)
+        yield i
+
+    prefetcher = record_prefetcher.RecordPrefetcher(10)
+    list(prefetcher.Prefetch(_Items()))
+    self.assertGreater(prefetcher.Stats().consumer_stalls, 0)
+
+  def testProducerStopsWhenConsumerStopsEarly(self):
+    prefetcher = record_prefetcher.RecordPrefetcher(1)
+    items = prefetcher.Prefetch(iter(xrange(1000)))
+    self.assertEqual(next(items), 0)
+    items.close()
+    self.assertEqual(prefetcher.Stats().records, 1)
+
+  def testWaitsForEarlierProducerOfSameIterator(self):
+    release = threading.Event()
+
+    def _Items():
+      yield 0
+      release.wait()
+      yield 1
+
+    stubs = tf.test.StubOutForTesting()
+    stubs.Set(record_prefetcher, '_JOIN_TIMEOUT_SECS', 0.01)
+    try:
+      prefetcher = record_prefetcher.RecordPrefetcher(1)
+      iterator = _Items()
+      with self.assertRaises(IOError):
+        for _ in prefetcher.Prefetch(iterator):
+          raise IOError('boom')
+      # The first producer is still blocked inside the iterator. Advancing it
+      # from a second producer would raise "generator already executing".
+      threading.Timer(0.05, release.set).start()
+      list(prefetcher.Prefetch(iterator))
+    finally:
+      stubs.CleanUp()
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,198 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Schedules the reloads of each run of an `EventMultiplexer` separately."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+import time
+
+import six
+import tensorflow as tf
+
+
+class ReloadScheduler(object):
+  """Polls each run of a multiplexer at a rate adapted to how it is written.
+
+  A run that loaded new events when it was last polled is polled again after
+  `min_interval_secs`. Each poll that loads nothing multiplies the interval of
+  the run by `backoff`, up to `max_interval_secs`, so runs that finished
+  writing are rarely polled while runs that are training stay fresh. Runs
+  queried in the last `max_interval_secs` are polled every `min_interval_secs`
+  regardless, so that a run someone is looking at shows new events quickly
+  once it is written to again.
+
+  New runs are discovered separately, every `discovery_interval_secs`. `Run`
+  discovers them on a thread of its own, so that a slow walk of a large logdir
+  never delays reloads.
+
+  If the multiplexer watches its directories for changes, runs it reports in
+  `ChangedRuns` are polled right away, and runs are discovered again as soon as
+  `WaitForChange` reports a change. Since `WaitForChange` also returns when a
+  run is added, runs found by discovery are polled right away too.
+
+  Polls go through `ReloadRuns`, so runs that the multiplexer considers stale
+  are only reloaded as often as its `stale_run_reload_secs` allows.
+  """
+
+  def __init__(self,
+               multiplexer,
+               discover_fn,
+               min_interval_secs,
+               max_interval_secs,
+               discovery_interval_secs,
+               backoff=2.0,
+               clock=time.time):
+    """Constructs a `ReloadScheduler`.
+
+    Args:
+      multiplexer: The `event_multiplexer.EventMultiplexer` to reload.
+      discover_fn: A function with no arguments that adds any new runs to the
+        multiplexer, such as by calling `AddRunsFromDirectory`.
+      min_interval_secs: The interval at which runs being written are polled.
+      max_interval_secs: The longest interval between two polls of a run.
+      discovery_interval_secs: The interval at which `discover_fn` is called.
+      backoff: The factor by which the interval of a run grows each time it is
+        polled without loading any events.
+      clock: A function returning the current time in seconds.
+
+    Raises:
+      ValueError: If the intervals are not positive, if max_interval_secs is
+        less than min_interval_secs, or if backoff is less than 1.
+    """
+    if min_interval_secs <= 0 or discovery_interval_secs <= 0:
+      raise ValueError('Intervals must be positive, got %s and %s' %
+                       (min_interval_secs, discovery_interval_secs))
+    if max_interval_secs < min_interval_secs:
+      raise ValueError('max_interval_secs %s is less than min_interval_secs %s'
+                       % (max_interval_secs, min_interval_secs))
+    if backoff < 1:
+      raise ValueError('backoff must be at least 1, was %s' % backoff)
+    self._multiplexer = multiplexer
+    self._discover_fn = discover_fn
+    self._min_interval_secs = min_interval_secs
+    self._max_interval_secs = max_interval_secs
+    self._discovery_interval_secs = discovery_interval_secs
+    self._backoff = backoff
+    self._clock = clock
+    self._next_discovery_time = None
+    self._changed = False
+    # Set by `Run` once discovery happens on its own thread.
+    self._discovery_thread = None
+    self._discover_now = threading.Event()
+    # The current interval of each run, and when it is next polled.
+    self._intervals = {}
+    self._next_poll_times = {}
+
+  def NextPollTimes(self):
+    """Returns a `{run: time}` dictionary of when each run is next polled."""
+    return dict(self._next_poll_times)
+
+  def Step(self):
+    """Discovers runs and polls runs that are due.
+
+    Returns:
+      The number of seconds until the next run is due or the next discovery,
+      whichever is sooner.
+    """
+    now = self._clock()
+    if (self._changed or self._next_discovery_time is None or
+        now >= self._next_discovery_time):
+      if self._discovery_thread is None:
+        self._discover_fn()
+      num_added = self._SyncRuns(now)
+      # Runs that discovery just added also wake up `Run`, which doesn't call
+      # for discovering again.
+      if self._discovery_thread is not None and self._changed and not num_added:
+        self._discover_now.set()
+    self._changed = False
+    changed_runs = self._multiplexer.ChangedRuns()
+    for run in changed_runs or ():
+      if run in self._next_poll_times:
+        self._next_poll_times[run] = now
+
+    due = [run for run, poll_time in six.iteritems(self._next_poll_times)
+           if poll_time <= now]
+    if due:
+      num_loaded = self._multiplexer.ReloadRuns(due)
+      viewed = self._multiplexer.RecentQueries(
+          max_age_secs=self._max_interval_secs)
+      now = self._clock()
+      for run in due:
+        if num_loaded.get(run):
+          interval = self._min_interval_secs
+        else:
+          interval = min(self._intervals[run] * self._backoff,
+                         self._max_interval_secs)
+        self._intervals[run] = interval
+        if run in viewed:
+          interval = self._min_interval_secs
+        self._next_poll_times[run] = now + interval
+      tf.logging.info('Polled %d runs, of which %d loaded new events', len(due),
+                      sum(1 for count in six.itervalues(num_loaded) if count))
+
+    next_time = min([self._next_discovery_time] +
+                    list(self._next_poll_times.values()))
+    return max(0, next_time - self._clock())
+
+  def Run(self):
+    """Runs `Step` forever, waiting until the next step is due.
+
+    Runs are discovered on another thread in the meantime. Errors are logged,
+    and the next step is tried after `min_interval_secs`.
+    """
+    self._discovery_thread = threading.Thread(target=self._DiscoverForever,
+                                              name='ReloadScheduler discovery')
+    self._discovery_thread.daemon = True
+    self._discovery_thread.start()
+    while True:
+      try:
+        timeout_secs = self.Step()
+      except Exception:  # pylint: disable=broad-except
+        # Runs would otherwise silently stop loading along with this thread.
+        tf.logging.exception('Failed to reload runs')
+        timeout_secs = self._min_interval_secs
+      self._changed = self._multiplexer.WaitForChange(timeout_secs)
+
+  def _DiscoverForever(self):
+    while True:
+      try:
+        self._discover_fn()
+      except Exception as e:  # pylint: disable=broad-except
+        tf.logging.error('Failed to discover runs: %s', e)
+      self._discover_now.wait(self._discovery_interval_secs)
+      self._discover_now.clear()
+
+  def _SyncRuns(self, now):
+    """Polls new runs of the multiplexer from now on and forgets gone runs.
+
+    Returns:
+      The number of new runs.
+    """
+    runs = set(self._multiplexer.Runs())
+    num_added = 0
+    for run in runs:
+      if run not in self._next_poll_times:
+        self._intervals[run] = self._min_interval_secs
+        self._next_poll_times[run] = now
+        num_added += 1
+    for run in list(self._next_poll_times):
+      if run not in runs:
+        del self._intervals[run]
+        del self._next_poll_times[run]
+    self._next_discovery_time = now + self._discovery_interval_secs
+    return num_added
@@ -0,0 +1,190 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for reload_scheduler."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+
+from tensorboard.backend.event_processing import reload_scheduler
+
+
+class _StopRunning(Exception):
+  pass
+
+
+class _FakeMultiplexer(object):
+  """Loads a set number of new events for each run every time it's reloaded."""
+
+  def __init__(self):
+    self.runs = set()
+    self.events_per_reload = {}
+    self.viewed = set()
+    self.reloads = []
+    self.changed = None
+    # Errors raised by the next reloads, and the timeouts passed to
+    # `WaitForChange`, which raises `_StopRunning` after max_waits calls.
+    self.reload_errors = []
+    self.waits = []
+    self.max_waits = 0
+
+  def Runs(self):
+    return {run: {} for run in self.runs}
+
+  def ReloadRuns(self, names):
+    self.reloads.append(sorted(names))
+    if self.reload_errors:
+      raise self.reload_errors.pop(0)
+    return {name: self.events_per_reload.get(name, 0) for name in names}
+
+  def WaitForChange(self, timeout_secs):
+    self.waits.append(timeout_secs)
+    if len(self.waits) >= self.max_waits:
+      raise _StopRunning()
+    return False
+
+  def RecentQueries(self, max_age_secs=None):
+    del max_age_secs  # Unused.
+    return {run: {} for run in self.viewed}
+
+  def ChangedRuns(self):
+    changed, self.changed = self.changed, (None if self.changed is None
+                                           else set())
+    return changed
+
+
+class ReloadSchedulerTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(ReloadSchedulerTest, self).setUp()
+    self.stubs = tf.test.StubOutForTesting()
+    self.now = 1000.0
+    self.multiplexer = _FakeMultiplexer()
+    self.discoveries = 0
+
+  def tearDown(self):
+    self.stubs.CleanUp()
+    super(ReloadSchedulerTest, self).tearDown()
+
+  def _Discover(self):
+    self.discoveries += 1
+
+  def _Scheduler(self, **kwargs):
+    kwargs.setdefault('min_interval_secs', 5)
+    kwargs.setdefault('max_interval_secs', 60)
+    kwargs.setdefault('discovery_interval_secs', 30)
+    return reload_scheduler.ReloadScheduler(
+        self.multiplexer, self._Discover, clock=lambda: self.now, **kwargs)
+
+  def _StepAt(self, scheduler, now):
+    self.now = now
+    del self.multiplexer.reloads[:]
+    return scheduler.Step()
+
+  def testNewRunsArePolledImmediately(self):
+    self.multiplexer.runs = {'a', 'b'}
+    scheduler = self._Scheduler()
+    self.assertEqual(self._StepAt(scheduler, 1000.0), 10.0)
+    self.assertEqual(self.discoveries, 1)
+    self.assertEqual(self.multiplexer.reloads, [['a', 'b']])
+    self.assertEqual(scheduler.NextPollTimes(), {'a': 1010.0, 'b': 1010.0})
+
+  def testGrowingRunsArePolledQuicklyAndIdleRunsBackOff(self):
+    self.multiplexer.runs = {'active', 'finished'}
+    self.multiplexer.events_per_reload = {'active': 100}
+    scheduler = self._Scheduler()
+    self._StepAt(scheduler, 1000.0)
+    self.assertEqual(scheduler.NextPollTimes(),
+                     {'active': 1005.0, 'finished': 1010.0})
+    self._StepAt(scheduler, 1005.0)
+    self.assertEqual(self.multiplexer.reloads, [['active']])
+    self._StepAt(scheduler, 1010.0)
+    self.assertEqual(self.multiplexer.reloads, [['active', 'finished']])
+    self.assertEqual(scheduler.NextPollTimes()['finished'], 1030.0)
+
+    # The interval of an idle run is capped.
+    for now in (1030.0, 1070.0, 1130.0):
+      self._StepAt(scheduler, now)
+      self.assertIn(['active', 'finished'], self.multiplexer.reloads)
+    self.assertEqual(scheduler.NextPollTimes()['finished'], 1190.0)
+
+    # A run that is written to again is polled quickly again.
+    self.multiplexer.events_per_reload['finished'] = 1
+    self._StepAt(scheduler, 1190.0)
+    self.assertEqual(scheduler.NextPollTimes()['finished'], 1195.0)
+
+  def testViewedRunsArePolledQuickly(self):
+    self.multiplexer.runs = {'a'}
+    self.multiplexer.viewed = {'a'}
+    scheduler = self._Scheduler()
+    for now in (1000.0, 1005.0, 1010.0):
+      self._StepAt(scheduler, now)
+      self.assertEqual(self.multiplexer.reloads, [['a']])
+    self.assertEqual(scheduler.NextPollTimes(), {'a': 1015.0})
+
+  def testDiscoveryRunsOnItsOwnCadence(self):
+    scheduler = self._Scheduler()
+    self.assertEqual(self._StepAt(scheduler, 1000.0), 30.0)
+    self.multiplexer.runs = {'a'}
+    self._StepAt(scheduler, 1020.0)
+    self.assertEqual(self.discoveries, 1)
+    self.assertEqual(self.multiplexer.reloads, [])
+    self._StepAt(scheduler, 1030.0)
+    self.assertEqual(self.discoveries, 2)
+    self.assertEqual(self.multiplexer.reloads, [['a']])
+
+    # Runs that are gone are no longer polled.
+    self.multiplexer.runs = set()
+    self._StepAt(scheduler, 1060.0)
+    self.assertEqual(scheduler.NextPollTimes(), {})
+
+  def testChangedRunsArePolledImmediately(self):
+    self.multiplexer.runs = {'a', 'b'}
+    self.multiplexer.changed = set()
+    scheduler = self._Scheduler()
+    self._StepAt(scheduler, 1000.0)
+    self.multiplexer.changed = {'b', 'gone'}
+    self._StepAt(scheduler, 1001.0)
+    self.assertEqual(self.multiplexer.reloads, [['b']])
+    self.assertEqual(scheduler.NextPollTimes(), {'a': 1010.0, 'b': 1021.0})
+
+  def testRunLogsErrorsAndKeepsStepping(self):
+    logged = []
+    self.stubs.Set(tf.logging, 'exception',
+                   lambda msg, *args: logged.append(msg % args))
+    self.multiplexer.runs = {'a'}
+    self.multiplexer.reload_errors = [ValueError('boom')]
+    self.multiplexer.max_waits = 2
+    scheduler = self._Scheduler()
+    with self.assertRaises(_StopRunning):
+      scheduler.Run()
+    self.assertEqual(logged, ['Failed to reload runs'])
+    self.assertEqual(self.multiplexer.reloads, [['a'], ['a']])
+    # The failed step is retried after min_interval_secs.
+    self.assertEqual(self.multiplexer.waits, [5, 10.0])
+
+  def testRejectsInvalidIntervals(self):
+    with self.assertRaises(ValueError):
+      self._Scheduler(min_interval_secs=0)
+    with self.assertRaises(ValueError):
+      self._Scheduler(max_interval_secs=1)
+    with self.assertRaises(ValueError):
+      self._Scheduler(backoff=0.5)
+
+
+if __name__ == '__main__':
+  tf.test.main()
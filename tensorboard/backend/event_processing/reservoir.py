@@ -20,9 +20,10 @@ from __future__ import division
 from __future__ import print_function
 
 import collections
-import random
 import threading
 
+import numpy as np
+
 
 class Reservoir(object):
   """A map-to-arrays container, with deterministic Reservoir Sampling.
@@ -51,11 +52,11 @@ class Reservoir(object):
 
   See: https://en.wikipedia.org/wiki/Reservoir_sampling
 
-  Adding items has amortized O(1) runtime.
+  Adding items has amortized O(log size) runtime.
 
   """
 
-  def __init__(self, size, seed=0, always_keep_last=True):
+  def __init__(self, size, seed=0, always_keep_last=True, memory_fn=None):
     """Creates a new reservoir.
 
     Args:
@@ -66,17 +67,27 @@ class Reservoir(object):
         input items.
       always_keep_last: Whether to always keep the latest seen item in the
         end of the reservoir. Defaults to True.
+      memory_fn: An optional function estimating the bytes of memory an item
+        holds, which `MemoryUsage` adds up. Without it, items count as 0.
 
     Raises:
       ValueError: If size is negative or not an integer.
     """
     if size < 0 or size != round(size):
       raise ValueError('size must be nonegative integer, was %s' % size)
+    self._memory_fn = memory_fn or _NoMemory
     self._buckets = collections.defaultdict(
-        lambda: _ReservoirBucket(size, random.Random(seed), always_keep_last))
-    # _mutex guards the keys - creating new keys, retrieving by key, etc
-    # the internal items are guarded by the ReservoirBuckets' internal mutexes
+        lambda: self._MakeBucket(size, _Lcg64(seed), always_keep_last))
+    # _mutex guards the keys - creating new keys, retrieving by key, etc - and
+    # their generations. The internal items are guarded by the
+    # ReservoirBuckets' internal mutexes, so items are added without holding
+    # _mutex, and generations are only bumped after the items changed.
     self._mutex = threading.Lock()
+    # The number of changes to the items of each key. See `Generation`.
+    self._generations = collections.defaultdict(int)
+
+  def _MakeBucket(self, size, _random, always_keep_last):
+    return _ReservoirBucket(size, _random, always_keep_last, self._memory_fn)
 
   def Keys(self):
     """Return all the keys in the reservoir.
@@ -87,6 +98,47 @@ class Reservoir(object):
     with self._mutex:
       return list(self._buckets.keys())
 
+  def MemoryUsage(self):
+    """Returns the estimated bytes of memory held by the items of each key.
+
+    Buckets keep a running total as items come and go, so this does not look
+    at the items.
+
+    Returns:
+      A `{key: num_bytes}` dictionary.
+    """
+    with self._mutex:
+      return {key: bucket.MemoryBytes()
+              for key, bucket in self._buckets.items()}
+
+  def Generation(self, key):
+    """Returns a number that increases whenever the items of a key change.
+
+    The number is only increased after the items changed, so items read after
+    the generation was read are at least as new as that generation.
+
+    Args:
+      key: The key to get the generation of.
+
+    Returns:
+      An integer, which is 0 for keys without items.
+    """
+    with self._mutex:
+      return self._generations.get(key, 0)
+
+  def NumItems(self, key):
+    """Returns the number of items of a key, without copying them.
+
+    Args:
+      key: The key to count the items of.
+
+    Returns:
+      An integer, which is 0 for keys without items.
+    """
+    with self._mutex:
+      bucket = self._buckets.get(key)
+      return bucket.NumItems() if bucket is not None else 0
+
   def Items(self, key):
     """Return items associated with given key.
 
@@ -130,6 +182,25 @@ class Reservoir(object):
     with self._mutex:
       bucket = self._buckets[key]
     bucket.AddItem(item, f)
+    with self._mutex:
+      self._generations[key] += 1
+
+  def AddItems(self, key, items, f=lambda x: x):
+    """Add several items to the Reservoir with the given tag.
+
+    This has the same effect as calling `AddItem` for each item in order, but
+    only looks up the bucket and takes its lock once.
+
+    Args:
+      key: The key to store the items under.
+      items: An iterable of the items to add to the reservoir.
+      f: An optional function to transform an item prior to addition.
+    """
+    with self._mutex:
+      bucket = self._buckets[key]
+    bucket.AddItems(items, f)
+    with self._mutex:
+      self._generations[key] += 1
 
   def FilterItems(self, filterFn, key=None):
     """Filter items within a Reservoir, using a filtering function.
@@ -145,37 +216,165 @@ class Reservoir(object):
     with self._mutex:
       if key:
         if key in self._buckets:
+          self._generations[key] += 1
           return self._buckets[key].FilterItems(filterFn)
         else:
           return 0
       else:
+        for bucket_key in self._buckets:
+          self._generations[bucket_key] += 1
         return sum(bucket.FilterItems(filterFn)
                    for bucket in self._buckets.values())
 
 
+def _NoMemory(item):
+  del item  # Unused.
+  return 0
+
+
+_MASK_64 = (1 << 64) - 1
+_RANGE_53 = 1 << 53
+
+
+class _Lcg64(object):
+  """A small seeded random number generator.
+
+  Every bucket owns a generator, so this keeps only 64 bits of state rather
+  than the 2.5 KB of a `random.Random`, and it is faster too. It is Knuth's
+  64-bit linear congruential generator, of which only the high bits are used
+  because the low bits of an LCG have short periods. The sequence is
+  deterministic for a given seed.
+  """
+
+  __slots__ = ('_state',)
+
+  def __init__(self, seed=0):
+    self._state = seed & _MASK_64
+
+  def randint(self, a, b):  # pylint: disable=invalid-name
+    """Return a uniformly distributed integer in [a, b], like `random`."""
+    n = b - a + 1
+    if n <= 0 or n > _RANGE_53:
+      raise ValueError('unsupported range for randint (%s, %s)' % (a, b))
+    state = self._state
+    while True:
+      state = (state * 6364136223846793005 + 1442695040888963407) & _MASK_64
+      z = state >> 11
+      r = z % n
+      # Reject the top values that would make the modulo biased.
+      if z - r <= _RANGE_53 - n:
+        self._state = state
+        return a + r
+
+
+class _ArrivalIndex(object):
+  """Tracks which slots of an append-only array still hold an item.
+
+  Buckets append items to slots in arrival order and remove one by marking
+  its slot as dead, which keeps the retained items in order without moving
+  any of them. A Fenwick tree over the live flags finds the slot of the item
+  with a given rank, and marks slots as dead, in O(log n). Buckets compact
+  their slots once `ShouldCompact` says that enough of them are dead, which
+  makes the cost of removal amortized O(log n) overall.
+  """
+
+  def __init__(self, num_live=0):
+    self.Reset(num_live)
+
+  def Reset(self, num_live):
+    """Resets the index to `num_live` slots that are all live."""
+    self.alive = bytearray(b'\x01') * num_live
+    self.num_live = num_live
+    # With every slot live, each node counts the slots it covers.
+    self._tree = [i & -i for i in range(num_live + 1)]
+
+  def __len__(self):
+    return len(self.alive)
+
+  def Append(self):
+    """Adds a live slot at the end."""
+    tree = self._tree
+    i = len(tree)
+    # Node i covers (i - lowbit(i), i], which is this slot and some nodes that
+    # are already in the tree.
+    total = 1
+    j = i - 1
+    bottom = i - (i & -i)
+    while j > bottom:
+      total += tree[j]
+      j -= j & -j
+    tree.append(total)
+    self.alive.append(1)
+    self.num_live += 1
+
+  def Remove(self, rank):
+    """Marks the slot of the live item with the given rank as dead.
+
+    Args:
+      rank: The 0-based rank of the item among the live ones.
+
+    Returns:
+      The index of the slot.
+    """
+    tree = self._tree
+    size = len(tree) - 1
+    pos = 0
+    step = 1 << (size.bit_length() - 1) if size else 0
+    remaining = rank
+    while step:
+      nxt = pos + step
+      if nxt <= size and tree[nxt] <= remaining:
+        pos = nxt
+        remaining -= tree[nxt]
+      step >>= 1
+    slot = pos
+    i = slot + 1
+    while i <= size:
+      tree[i] -= 1
+      i += i & -i
+    self.alive[slot] = 0
+    self.num_live -= 1
+    return slot
+
+  def ShouldCompact(self):
+    return len(self.alive) - self.num_live > max(self.num_live, 16)
+
+
+# Marks the slots of removed items in a _ReservoirBucket.
+_REMOVED = object()
+
+
 class _ReservoirBucket(object):
   """A container for items from a stream, that implements reservoir sampling.
 
   It always stores the most recent item as its final item.
   """
 
-  def __init__(self, _max_size, _random=None, always_keep_last=True):
+  def __init__(self, _max_size, _random=None, always_keep_last=True,
+               memory_fn=None):
     """Create the _ReservoirBucket.
 
     Args:
       _max_size: The maximum size the reservoir bucket may grow to. If size is
         zero, the bucket has unbounded size.
       _random: The random number generator to use. If not specified, defaults to
-        random.Random(0).
+        a generator seeded with 0.
       always_keep_last: Whether the latest seen item should always be included
         in the end of the bucket.
+      memory_fn: An optional function estimating the bytes of memory an item
+        holds. See `MemoryBytes`.
 
     Raises:
       ValueError: if the size is not a nonnegative integer.
     """
     if _max_size < 0 or _max_size != round(_max_size):
       raise ValueError('_max_size must be nonegative int, was %s' % _max_size)
-    self.items = []
+    self._memory_fn = memory_fn or _NoMemory
+    self._memory_bytes = 0
+    # The items in arrival order, with _REMOVED in the slots of items that
+    # were replaced since the last compaction.
+    self._slots = []
+    self._index = _ArrivalIndex()
     # This mutex protects the internal items, ensuring that calls to Items and
     # AddItem are thread-safe
     self._mutex = threading.Lock()
@@ -184,21 +383,44 @@ class _ReservoirBucket(object):
     if _random is not None:
       self._random = _random
     else:
-      self._random = random.Random(0)
+      self._random = _Lcg64(0)
     self.always_keep_last = always_keep_last
 
+  def _Count(self, item, sign):
+    """Adds an item to the running totals, or with sign -1 takes it out."""
+    self._memory_bytes += sign * self._memory_fn(item)
+
+  def _Append(self, item):
+    self._Count(item, 1)
+    self._slots.append(item)
+    self._index.Append()
+
+  def _RemoveRank(self, rank):
+    slot = self._index.Remove(rank)
+    self._Count(self._slots[slot], -1)
+    self._slots[slot] = _REMOVED
+
+  def _ReplaceLast(self, item):
+    self._Count(self._slots[-1], -1)
+    self._Count(item, 1)
+    self._slots[-1] = item
+
+  def _Compact(self):
+    self._slots = [item for item in self._slots if item is not _REMOVED]
+    self._index.Reset(len(self._slots))
+
   def AddItem(self, item, f=lambda x: x):
     """Add an item to the ReservoirBucket, replacing an old item if necessary.
 
     The new item is guaranteed to be added to the bucket, and to be the last
     element in the bucket. If the bucket has reached capacity, then an old item
     will be replaced. With probability (_max_size/_num_items_seen) a random item
-    in the bucket will be popped out and the new item will be appended
+    in the bucket will be removed and the new item will be appended
     to the end. With probability (1 - _max_size/_num_items_seen)
     the last item in the bucket will be replaced.
 
-    Since the O(n) replacements occur with O(1/_num_items_seen) likelihood,
-    the amortized runtime is O(1).
+    Removed items only leave a mark in their slot until the bucket is
+    compacted, so the runtime is amortized O(log _max_size).
 
     Args:
       item: The item to add to the bucket.
@@ -206,16 +428,35 @@ class _ReservoirBucket(object):
         the reservoir.
     """
     with self._mutex:
-      if len(self.items) < self._max_size or self._max_size == 0:
-        self.items.append(f(item))
-      else:
-        r = self._random.randint(0, self._num_items_seen)
-        if r < self._max_size:
-          self.items.pop(r)
-          self.items.append(f(item))
-        elif self.always_keep_last:
-          self.items[-1] = f(item)
-      self._num_items_seen += 1
+      self._AddItemLocked(item, f)
+
+  def AddItems(self, items, f=lambda x: x):
+    """Add several items to the bucket, as if by calling `AddItem` on each.
+
+    Args:
+      items: An iterable of the items to add, in order.
+      f: A function to transform an item before addition, if it will be kept
+        in the reservoir.
+    """
+    with self._mutex:
+      for item in items:
+        self._AddItemLocked(item, f)
+
+  def _AddItemLocked(self, item, f):
+    index = self._index
+    if index.num_live < self._max_size or self._max_size == 0:
+      self._Append(f(item))
+    else:
+      r = self._random.randint(0, self._num_items_seen)
+      if r < self._max_size:
+        self._RemoveRank(r)
+        self._Append(f(item))
+        if index.ShouldCompact():
+          self._Compact()
+      elif self.always_keep_last:
+        # The last slot always holds the most recently kept item.
+        self._ReplaceLast(f(item))
+    self._num_items_seen += 1
 
   def FilterItems(self, filterFn):
     """Filter items in a ReservoirBucket, using a filtering function.
@@ -237,12 +478,21 @@ class _ReservoirBucket(object):
       The number of items removed from the bucket.
     """
     with self._mutex:
-      size_before = len(self.items)
-      self.items = list(filter(filterFn, self.items))
-      size_diff = size_before - len(self.items)
+      size_before = self._index.num_live
+      kept = []
+      for item in self._slots:
+        if item is _REMOVED:
+          continue
+        if filterFn(item):
+          kept.append(item)
+        else:
+          self._Count(item, -1)
+      self._slots = kept
+      self._index.Reset(len(self._slots))
+      size_diff = size_before - len(self._slots)
 
       # Estimate a correction the number of items seen
-      prop_remaining = len(self.items) / float(
+      prop_remaining = len(self._slots) / float(
           size_before) if size_before > 0 else 0
       self._num_items_seen = int(round(self._num_items_seen * prop_remaining))
       return size_diff
@@ -250,4 +500,766 @@ class _ReservoirBucket(object):
   def Items(self):
     """Get all the items in the bucket."""
     with self._mutex:
-      return list(self.items)
+      return [item for item in self._slots if item is not _REMOVED]
+
+  def NumItems(self):
+    """Returns the number of items in the bucket."""
+    with self._mutex:
+      return self._index.num_live
+
+  def MemoryBytes(self):
+    """Returns the estimated bytes of memory held by the items in the bucket."""
+    return self._memory_bytes
+
+
+class ByteBudget(object):
+  """A cap on the total bytes of the items in a group of reservoirs.
+
+  When the items in all the buckets registered with the budget take more than
+  `max_bytes`, `Enforce` evicts items from the buckets using the most bytes
+  first.
+  """
+
+  def __init__(self, max_bytes):
+    """Creates a ByteBudget.
+
+    Args:
+      max_bytes: The maximum total size of the items, or 0 for no maximum.
+
+    Raises:
+      ValueError: If max_bytes is negative.
+    """
+    if max_bytes < 0:
+      raise ValueError('max_bytes must be nonnegative, was %s' % max_bytes)
+    self._max_bytes = max_bytes
+    self._num_bytes = 0
+    self._buckets = []
+    self._mutex = threading.Lock()
+
+  def NumBytes(self):
+    """Returns the total size of the items in the registered buckets."""
+    with self._mutex:
+      return self._num_bytes
+
+  def _Register(self, bucket):
+    with self._mutex:
+      self._buckets.append(bucket)
+
+  def _Add(self, num_bytes):
+    with self._mutex:
+      self._num_bytes += num_bytes
+
+  def _HasRoom(self, num_bytes):
+    with self._mutex:
+      return not self._max_bytes or (self._num_bytes + num_bytes <=
+                                     self._max_bytes)
+
+  def Enforce(self):
+    """Evicts items until the budget is met or no bucket can give up more.
+
+    This must not be called while holding the lock of any bucket.
+    """
+    while True:
+      with self._mutex:
+        if not self._max_bytes or self._num_bytes <= self._max_bytes:
+          return
+        buckets = sorted(self._buckets, key=lambda b: b.NumBytes(),
+                         reverse=True)
+      if not any(bucket.EvictOne() for bucket in buckets):
+        return
+
+
+class ByteBudgetedReservoir(Reservoir):
+  """A Reservoir that also caps the total size in bytes of the items.
+
+  Each key keeps at most `size` items, like in a `Reservoir`, which take at
+  most `max_bytes_per_key` bytes. If an item pushes a bucket over its byte
+  cap, or the buckets registered with `byte_budget` over theirs, random items
+  other than the most recent one are evicted until the cap is met, and the
+  bucket samples as if its size were the number of items it has left.
+  Evicting random items from a uniform sample leaves a uniform sample, and
+  sampling carries on with the smaller size, so the sample stays unbiased; it
+  just holds fewer items if they are large. Whenever another item of the
+  average size would fit the caps again, the smaller size grows back by one,
+  up to `size`. A bucket always keeps at least one item, even if that alone
+  exceeds the cap.
+  """
+
+  def __init__(self, size, size_fn, max_bytes_per_key=0, byte_budget=None,
+               seed=0, always_keep_last=True, memory_fn=None):
+    """Creates a new byte-budgeted reservoir.
+
+    Args:
+      size: The number of values to keep in the reservoir for each tag. If 0,
+        the number is only limited by the byte caps.
+      size_fn: A function returning the size in bytes of an item.
+      max_bytes_per_key: The maximum total size of the items of each key, or
+        0 for no maximum.
+      byte_budget: An optional `ByteBudget` shared with other reservoirs.
+      seed: The seed of the random number generator to use when sampling.
+      always_keep_last: Whether to always keep the latest seen item in the
+        end of the reservoir.
+      memory_fn: An optional function estimating the bytes of memory an item
+        holds. See `Reservoir.MemoryUsage`.
+
+    Raises:
+      ValueError: If size or max_bytes_per_key is invalid.
+    """
+    if max_bytes_per_key < 0:
+      raise ValueError('max_bytes_per_key must be nonnegative, was %s' %
+                       max_bytes_per_key)
+    self._size_fn = size_fn
+    self._max_bytes_per_key = max_bytes_per_key
+    self._byte_budget = byte_budget
+    super(ByteBudgetedReservoir, self).__init__(size, seed, always_keep_last,
+                                                memory_fn)
+
+  def _MakeBucket(self, size, _random, always_keep_last):
+    return _ByteBudgetedBucket(size, self._size_fn, self._max_bytes_per_key,
+                               self._byte_budget, _random, always_keep_last,
+                               self._memory_fn)
+
+  def AddItem(self, key, item, f=lambda x: x):
+    super(ByteBudgetedReservoir, self).AddItem(key, item, f)
+    if self._byte_budget is not None:
+      self._byte_budget.Enforce()
+
+  def AddItems(self, key, items, f=lambda x: x):
+    super(ByteBudgetedReservoir, self).AddItems(key, items, f)
+    if self._byte_budget is not None:
+      self._byte_budget.Enforce()
+
+  def Generation(self, key):
+    """See `Reservoir.Generation`.
+
+    Items evicted to meet a `ByteBudget` shared with other keys count as
+    changes too.
+    """
+    with self._mutex:
+      bucket = self._buckets.get(key)
+      num_evicted = bucket.num_evicted if bucket is not None else 0
+      return self._generations.get(key, 0) + num_evicted
+
+  def NumBytes(self, key=None):
+    """Returns the size in bytes of the items of a key, or of all keys.
+
+    Args:
+      key: An optional key. If not specified, returns the total of all keys.
+
+    Raises:
+      KeyError: If the key is not found in the reservoir.
+    """
+    with self._mutex:
+      if key is None:
+        return sum(bucket.NumBytes() for bucket in self._buckets.values())
+      if key not in self._buckets:
+        raise KeyError('Key %s was not found in Reservoir' % key)
+      return self._buckets[key].NumBytes()
+
+
+class _ByteBudgetedBucket(_ReservoirBucket):
+  """A _ReservoirBucket that keeps track of the size of its items."""
+
+  def __init__(self, _max_size, size_fn, max_bytes, byte_budget, _random=None,
+               always_keep_last=True, memory_fn=None):
+    super(_ByteBudgetedBucket, self).__init__(_max_size, _random,
+                                              always_keep_last, memory_fn)
+    self._size_fn = size_fn
+    self._max_bytes = max_bytes
+    self._byte_budget = byte_budget
+    self._num_bytes = 0
+    self.num_evicted = 0
+    # The number of items the byte caps leave room for, as of the last
+    # eviction, or None if they have not limited the bucket.
+    self._byte_limited_size = None
+    if byte_budget is not None:
+      byte_budget._Register(self)  # pylint: disable=protected-access
+
+  def _AddBytes(self, num_bytes):
+    self._num_bytes += num_bytes
+    if self._byte_budget is not None:
+      self._byte_budget._Add(num_bytes)  # pylint: disable=protected-access
+
+  def _Count(self, item, sign):
+    self._AddBytes(sign * self._size_fn(item))
+    super(_ByteBudgetedBucket, self)._Count(item, sign)
+
+  def _HasRoomLocked(self):
+    """Returns whether another item of the average size fits the byte caps."""
+    num_live = self._index.num_live
+    average = self._num_bytes // num_live if num_live else 0
+    if self._max_bytes and self._num_bytes + average > self._max_bytes:
+      return False
+    budget = self._byte_budget
+    return budget is None or budget._HasRoom(average)  # pylint: disable=protected-access
+
+  def _SizeLocked(self):
+    """Returns the number of items to sample, or 0 for no limit."""
+    size = self._byte_limited_size
+    if size is None:
+      return self._max_size
+    if self._index.num_live >= size and self._HasRoomLocked():
+      size += 1
+    if self._max_size and size >= self._max_size:
+      # The byte caps no longer limit the bucket.
+      self._byte_limited_size = None
+      return self._max_size
+    self._byte_limited_size = size
+    return size
+
+  def _AddItemLocked(self, item, f):
+    index = self._index
+    size = self._SizeLocked()
+    if index.num_live < size or size == 0:
+      self._Append(f(item))
+    else:
+      r = self._random.randint(0, self._num_items_seen)
+      if r < size:
+        self._RemoveRank(r)
+        self._Append(f(item))
+        if index.ShouldCompact():
+          self._Compact()
+      elif self.always_keep_last:
+        self._ReplaceLast(f(item))
+    self._num_items_seen += 1
+    while (self._max_bytes and self._num_bytes > self._max_bytes and
+           self._EvictLocked()):
+      pass
+
+  def _EvictLocked(self):
+    """Removes a random item, and samples only as many items as are left.
+
+    This leaves `_max_size`, the limit on the number of items, unchanged.
+
+    The newest item is never removed if `always_keep_last` is set.
+
+    Returns:
+      Whether an item was removed.
+    """
+    num_live = self._index.num_live
+    if num_live <= 1:
+      return False
+    last_rank = num_live - 2 if self.always_keep_last else num_live - 1
+    self._RemoveRank(self._random.randint(0, last_rank))
+    self.num_evicted += 1
+    self._byte_limited_size = self._index.num_live
+    if self._index.ShouldCompact():
+      self._Compact()
+    return True
+
+  def EvictOne(self):
+    """Evicts an item as if the bucket had exceeded its byte cap.
+
+    Returns:
+      Whether an item was removed.
+    """
+    with self._mutex:
+      return self._EvictLocked()
+
+  def NumBytes(self):
+    """Returns the total size of the items in the bucket."""
+    return self._num_bytes
+
+
+
+class ScalarReservoir(Reservoir):
+  """A Reservoir of scalars that stores each key's items in numpy arrays.
+
+  Items have `wall_time`, `step` and `value` fields, like
+  `event_accumulator.ScalarEvent`. Rather than keeping one Python object per
+  item, the bucket for each key keeps three parallel arrays of float64 wall
+  times, int64 steps and values, which takes a fraction of the memory. Items
+  are sampled exactly as by a `Reservoir` with the same seed, and `Items`
+  builds instances of `item_type` on demand, so the two are interchangeable.
+  `Columns` gives access to the arrays themselves.
+  """
+
+  def __init__(self, size, item_type, seed=0, always_keep_last=True,
+               value_dtype=np.float64):
+    """Creates a new scalar reservoir.
+
+    Args:
+      size: The number of values to keep in the reservoir for each tag. If 0,
+        all values will be kept.
+      item_type: A namedtuple type with `wall_time`, `step` and `value` fields,
+        which `Items` returns instances of.
+      seed: The seed of the random number generator to use when sampling.
+      always_keep_last: Whether to always keep the latest seen item in the
+        end of the reservoir.
+      value_dtype: The numpy dtype to store values as.
+
+    Raises:
+      ValueError: If size is negative or not an integer.
+    """
+    self._item_type = item_type
+    self._value_dtype = value_dtype
+    super(ScalarReservoir, self).__init__(size, seed, always_keep_last)
+
+  def _MakeBucket(self, size, _random, always_keep_last):
+    return _ScalarReservoirBucket(size, self._item_type, self._value_dtype,
+                                  _random, always_keep_last)
+
+  def Columns(self, key):
+    """Return the items associated with given key as arrays.
+
+    Args:
+      key: The key for which we are finding associated items.
+
+    Raises:
+      KeyError: If the key is not found in the reservoir.
+
+    Returns:
+      A `(wall_times, steps, values)` tuple of numpy arrays, in the order of
+      `Items`. The arrays are copies, so they are not affected by items that
+      are added later.
+    """
+    with self._mutex:
+      if key not in self._buckets:
+        raise KeyError('Key %s was not found in Reservoir' % key)
+      bucket = self._buckets[key]
+    return bucket.Columns()
+
+
+class _ScalarReservoirBucket(object):
+  """A _ReservoirBucket that stores scalars in parallel numpy arrays.
+
+  Like `_ReservoirBucket`, items are kept in slots in arrival order, and the
+  slots of removed items are only dropped when the bucket is compacted. The
+  arrays are grown by doubling their capacity, but a bounded bucket grows to
+  at most `_max_size` slots plus some slack for removed items, and is
+  compacted once those fill up.
+  """
+
+  _INITIAL_CAPACITY = 16
+
+  def __init__(self, _max_size, item_type, value_dtype, _random=None,
+               always_keep_last=True):
+    """Create the _ScalarReservoirBucket.
+
+    Args:
+      _max_size: The maximum size the reservoir bucket may grow to. If size is
+        zero, the bucket has unbounded size.
+      item_type: The namedtuple type of the items.
+      value_dtype: The numpy dtype to store values as.
+      _random: The random number generator to use. If not specified, defaults to
+        a generator seeded with 0.
+      always_keep_last: Whether the latest seen item should always be included
+        in the end of the bucket.
+
+    Raises:
+      ValueError: if the size is not a nonnegative integer.
+    """
+    if _max_size < 0 or _max_size != round(_max_size):
+      raise ValueError('_max_size must be nonegative int, was %s' % _max_size)
+    self._mutex = threading.Lock()
+    self._max_size = _max_size
+    self._num_items_seen = 0
+    if _random is not None:
+      self._random = _random
+    else:
+      self._random = _Lcg64(0)
+    self.always_keep_last = always_keep_last
+    self._item_type = item_type
+    capacity = self._INITIAL_CAPACITY
+    # The slack lets compactions, which cost O(_max_size), happen only every
+    # so many replacements.
+    self._max_capacity = None
+    if _max_size:
+      capacity = min(capacity, _max_size)
+      self._max_capacity = _max_size + max(_max_size // 4,
+                                           self._INITIAL_CAPACITY)
+    self._wall_times = np.empty(capacity, dtype=np.float64)
+    self._steps = np.empty(capacity, dtype=np.int64)
+    self._values = np.empty(capacity, dtype=value_dtype)
+    self._index = _ArrivalIndex()
+
+  def _Append(self, item):
+    num_slots = len(self._index)
+    if num_slots == self._max_capacity:
+      # Reuse the slots of removed items rather than growing any further.
+      self._KeepSlots(self._LiveMask())
+      num_slots = len(self._index)
+    if num_slots == len(self._steps):
+      capacity = max(2 * num_slots, 1)
+      if self._max_capacity is not None:
+        capacity = min(capacity, self._max_capacity)
+      for name in ('_wall_times', '_steps', '_values'):
+        old = getattr(self, name)
+        new = np.empty(capacity, dtype=old.dtype)
+        new[:num_slots] = old[:num_slots]
+        setattr(self, name, new)
+    self._Set(num_slots, item)
+    self._index.Append()
+
+  def _Set(self, slot, item):
+    self._wall_times[slot] = item.wall_time
+    self._steps[slot] = item.step
+    self._values[slot] = item.value
+
+  def _LiveMask(self):
+    return np.frombuffer(self._index.alive, dtype=np.bool_).copy()
+
+  def _KeepSlots(self, keep):
+    """Moves the items in the slots selected by the mask `keep` to the front."""
+    num_kept = 0
+    for name in ('_wall_times', '_steps', '_values'):
+      column = getattr(self, name)
+      kept = column[:len(keep)][keep]
+      column[:len(kept)] = kept
+      num_kept = len(kept)
+    self._index.Reset(num_kept)
+
+  def AddItem(self, item, f=lambda x: x):
+    """Add an item to the bucket, replacing an old item if necessary.
+
+    This samples items exactly like `_ReservoirBucket.AddItem`.
+
+    Args:
+      item: The item to add to the bucket.
+      f: A function to transform item before addition, if it will be kept in
+        the reservoir.
+    """
+    with self._mutex:
+      self._AddItemLocked(item, f)
+
+  def AddItems(self, items, f=lambda x: x):
+    """Add several items to the bucket, as if by calling `AddItem` on each.
+
+    Args:
+      items: An iterable of the items to add, in order.
+      f: A function to transform an item before addition, if it will be kept
+        in the reservoir.
+    """
+    with self._mutex:
+      for item in items:
+        self._AddItemLocked(item, f)
+
+  def _AddItemLocked(self, item, f):
+    index = self._index
+    if index.num_live < self._max_size or self._max_size == 0:
+      self._Append(f(item))
+    else:
+      r = self._random.randint(0, self._num_items_seen)
+      if r < self._max_size:
+        # `_Append` compacts the slots once the slack is used up.
+        index.Remove(r)
+        self._Append(f(item))
+      elif self.always_keep_last:
+        self._Set(len(index) - 1, f(item))
+    self._num_items_seen += 1
+
+  def FilterItems(self, filterFn):
+    """Filter items in the bucket, using a filtering function.
+
+    See `_ReservoirBucket.FilterItems`.
+
+    Args:
+      filterFn: A function that returns True for items to be kept.
+
+    Returns:
+      The number of items removed from the bucket.
+    """
+    with self._mutex:
+      size_before = self._index.num_live
+      keep = self._LiveMask()
+      keep[keep] = [bool(filterFn(item)) for item in self._Items()]
+      self._KeepSlots(keep)
+      size_after = self._index.num_live
+      size_diff = size_before - size_after
+
+      # Estimate a correction the number of items seen
+      prop_remaining = size_after / float(
+          size_before) if size_before > 0 else 0
+      self._num_items_seen = int(round(self._num_items_seen * prop_remaining))
+      return size_diff
+
+  def _Columns(self):
+    num_slots = len(self._index)
+    columns = (self._wall_times[:num_slots], self._steps[:num_slots],
+               self._values[:num_slots])
+    if self._index.num_live == num_slots:
+      return tuple(column.copy() for column in columns)
+    live = self._LiveMask()
+    return tuple(column[live] for column in columns)
+
+  def _Items(self):
+    wall_times, steps, values = self._Columns()
+    return list(map(self._item_type._make,
+                    zip(wall_times.tolist(), steps.tolist(), values.tolist())))
+
+  def Items(self):
+    """Get all the items in the bucket."""
+    with self._mutex:
+      return self._Items()
+
+  def NumItems(self):
+    """Returns the number of items in the bucket."""
+    with self._mutex:
+      return self._index.num_live
+
+  def Columns(self):
+    """Get copies of the `(wall_times, steps, values)` arrays of the bucket."""
+    with self._mutex:
+      return self._Columns()
+
+  def MemoryBytes(self):
+    """Returns the bytes of the arrays taken up by the items in the bucket."""
+    return self._index.num_live * (self._wall_times.itemsize +
+                                   self._steps.itemsize +
+                                   self._values.itemsize)
+
+
+# Size guidance for a StepStratifiedReservoir instead of a uniform one.
+StepStratifiedSize = collections.namedtuple('StepStratifiedSize',
+                                            ['size', 'keep_extrema'])
+
+
+class StepStratifiedReservoir(Reservoir):
+  """A Reservoir that spreads the items it keeps evenly over their steps.
+
+  Uniform reservoir sampling leaves random gaps in long series. Instead, the
+  bucket for each key divides the step axis into bins of equal width, and
+  keeps the first item that falls into each bin, along with the first and the
+  most recent item overall. Once there are more bins than fit in the bucket,
+  the width is doubled and adjacent bins are merged, so the items kept are
+  always spread across the whole run. With `keep_extrema`, each bin also keeps
+  the items with the smallest and largest `value`, so spikes in a curve
+  survive downsampling.
+
+  Items need a `step` attribute, and a `value` attribute for `keep_extrema`.
+  Like in a `Reservoir`, items are returned in the order they were added.
+  """
+
+  def __init__(self, size, keep_extrema=False, memory_fn=None,
+               value_dtype=None):
+    """Creates a new step-stratified reservoir.
+
+    Args:
+      size: The maximum number of items to keep for each key. If 0, all items
+        are kept.
+      keep_extrema: Whether to keep the items with the smallest and largest
+        value in each bin.
+      memory_fn: An optional function estimating the bytes of memory an item
+        holds. See `Reservoir.MemoryUsage`.
+      value_dtype: An optional numpy dtype to store the `value` of items as,
+        like `ScalarReservoir` does, which `Columns` returns values as.
+        Defaults to storing values as they are and returning float64.
+
+    Raises:
+      ValueError: If size is negative or not an integer, or too small to hold
+        the first and last items and one bin.
+    """
+    self._keep_extrema = keep_extrema
+    self._value_dtype = (np.dtype(value_dtype) if value_dtype is not None
+                         else None)
+    super(StepStratifiedReservoir, self).__init__(size, memory_fn=memory_fn)
+    # Make sure the size is valid before any bucket is created.
+    self._MakeBucket(size, None, True)
+
+  def _MakeBucket(self, size, _random, always_keep_last):
+    del _random, always_keep_last  # Unused.
+    return _StepStratifiedBucket(size, self._keep_extrema, self._memory_fn)
+
+  def AddItem(self, key, item, f=lambda x: x):
+    super(StepStratifiedReservoir, self).AddItem(key, item,
+                                                 self._StoredItemFn(f))
+
+  def AddItems(self, key, items, f=lambda x: x):
+    super(StepStratifiedReservoir, self).AddItems(key, items,
+                                                  self._StoredItemFn(f))
+
+  def _StoredItemFn(self, f):
+    """Returns f, followed by rounding the value to `value_dtype` if set."""
+    if self._value_dtype is None:
+      return f
+    to_dtype = self._value_dtype.type
+    return lambda item: _WithValue(f(item), to_dtype)
+
+  def Columns(self, key):
+    """Return the scalars associated with given key as arrays.
+
+    This only applies to items with `wall_time`, `step` and `value` fields.
+
+    Args:
+      key: The key for which we are finding associated items.
+
+    Raises:
+      KeyError: If the key is not found in the reservoir.
+
+    Returns:
+      A `(wall_times, steps, values)` tuple of numpy arrays, like
+      `ScalarReservoir.Columns`.
+    """
+    items = self.Items(key)
+    value_dtype = self._value_dtype
+    if value_dtype is None:
+      value_dtype = np.float64
+    return (np.array([item.wall_time for item in items], dtype=np.float64),
+            np.array([item.step for item in items], dtype=np.int64),
+            np.array([item.value for item in items], dtype=value_dtype))
+
+
+def _WithValue(item, to_dtype):
+  """Returns a namedtuple item with its value rounded by to_dtype."""
+  return item._replace(value=to_dtype(item.value).item())
+
+
+class _StepStratifiedBucket(object):
+  """The bucket of a StepStratifiedReservoir."""
+
+  def __init__(self, _max_size, keep_extrema=False, memory_fn=None):
+    """Create the _StepStratifiedBucket.
+
+    Args:
+      _max_size: The maximum number of items to keep. If zero, the bucket has
+        unbounded size.
+      keep_extrema: Whether to keep the items with the smallest and largest
+        value in each bin.
+      memory_fn: An optional function estimating the bytes of memory an item
+        holds. See `MemoryBytes`.
+
+    Raises:
+      ValueError: if the size is not a nonnegative integer, or too small to
+        hold the first and last items and one bin.
+    """
+    if _max_size < 0 or _max_size != round(_max_size):
+      raise ValueError('_max_size must be nonegative int, was %s' % _max_size)
+    items_per_bin = 3 if keep_extrema else 1
+    if _max_size and _max_size < 2 + items_per_bin:
+      raise ValueError('_max_size must be at least %d, was %s' %
+                       (2 + items_per_bin, _max_size))
+    self._mutex = threading.Lock()
+    self._max_size = _max_size
+    self._items_per_bin = items_per_bin
+    self._max_bins = (_max_size - 2) // items_per_bin if _max_size else None
+    self._keep_extrema = keep_extrema
+    self._memory_fn = memory_fn or _NoMemory
+    self._Reset()
+
+  def _Reset(self):
+    # Items are kept as (arrival number, item) pairs so that they can be
+    # returned in order.
+    self._num_items_seen = 0
+    self._width = 1
+    # Maps the index of each bin to a list of its first item and, with
+    # keep_extrema, the items with the smallest and largest value.
+    self._bins = {}
+    self._first = None
+    self._last = None
+    # All items, if the bucket is unbounded.
+    self._all = []
+
+  def _AddItemLocked(self, item):
+    entry = (self._num_items_seen, item)
+    self._num_items_seen += 1
+    if self._max_bins is None:
+      self._all.append(entry)
+      return
+    if self._first is None:
+      self._first = entry
+    self._last = entry
+    index = item.step // self._width
+    kept = self._bins.get(index)
+    if kept is None:
+      self._bins[index] = [entry, entry, entry] if self._keep_extrema else [
+          entry]
+      if len(self._bins) > self._max_bins:
+        self._MergeBins()
+    elif self._keep_extrema:
+      if item.value < kept[1][1].value:
+        kept[1] = entry
+      if item.value > kept[2][1].value:
+        kept[2] = entry
+
+  def _MergeBins(self):
+    """Doubles the width of the bins until there are few enough of them."""
+    while len(self._bins) > self._max_bins:
+      self._width *= 2
+      merged = {}
+      for index in sorted(self._bins):
+        kept = self._bins[index]
+        into = merged.get(index // 2)
+        if into is None:
+          merged[index // 2] = kept
+        elif self._keep_extrema:
+          # The first item of the lower bin stays the first of the merged one.
+          if kept[1][1].value < into[1][1].value:
+            into[1] = kept[1]
+          if kept[2][1].value > into[2][1].value:
+            into[2] = kept[2]
+      self._bins = merged
+
+  def _Entries(self):
+    if self._max_bins is None:
+      return list(self._all)
+    entries = {}
+    for kept in self._bins.values():
+      for entry in kept:
+        entries[entry[0]] = entry
+    for entry in (self._first, self._last):
+      if entry is not None:
+        entries[entry[0]] = entry
+    return [entries[number] for number in sorted(entries)]
+
+  def AddItem(self, item, f=lambda x: x):
+    """Add an item to the bucket.
+
+    Args:
+      item: The item to add to the bucket.
+      f: A function to transform item before addition. Since the most recent
+        item is always kept, this is applied to every item.
+    """
+    with self._mutex:
+      self._AddItemLocked(f(item))
+
+  def AddItems(self, items, f=lambda x: x):
+    """Add several items to the bucket, as if by calling `AddItem` on each."""
+    with self._mutex:
+      for item in items:
+        self._AddItemLocked(f(item))
+
+  def FilterItems(self, filterFn):
+    """Filter items in the bucket, using a filtering function.
+
+    The bucket is rebuilt from the items that are kept, as if they were the
+    only items ever added.
+
+    Args:
+      filterFn: A function that returns True for items to be kept.
+
+    Returns:
+      The number of items removed from the bucket.
+    """
+    with self._mutex:
+      items = [item for _, item in self._Entries()]
+      kept = [item for item in items if filterFn(item)]
+      self._Reset()
+      for item in kept:
+        self._AddItemLocked(item)
+      return len(items) - len(kept)
+
+  def Items(self):
+    """Get all the items in the bucket."""
+    with self._mutex:
+      return [item for _, item in self._Entries()]
+
+  def NumItems(self):
+    """Returns the number of items in the bucket."""
+    with self._mutex:
+      return len(self._Entries())
+
+  def MemoryBytes(self):
+    """Returns the estimated bytes of memory held by the items in the bucket.
+
+    Bins can share items, so this counts as many items as the bins and the
+    first and last item can hold at most, each the size of the last item.
+    """
+    with self._mutex:
+      if self._max_bins is None:
+        if not self._all:
+          return 0
+        return len(self._all) * self._memory_fn(self._all[-1][1])
+      if self._last is None:
+        return 0
+      num_items = len(self._bins) * self._items_per_bin + 2
+      return num_items * self._memory_fn(self._last[1])
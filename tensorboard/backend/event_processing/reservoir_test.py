@@ -17,6 +17,9 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
+
+import numpy as np
 from six.moves import xrange  # pylint: disable=redefined-builtin
 import tensorflow as tf
 
@@ -92,6 +95,16 @@ class ReservoirTest(tf.test.TestCase):
       r2.AddItem('key', i)
     self.assertNotEqual(r1.Items(key), r2.Items(key))
 
+  def testAddItemsMatchesAddItem(self):
+    for size in (0, 10):
+      r1 = reservoir.Reservoir(size)
+      r2 = reservoir.Reservoir(size)
+      for i in xrange(1000):
+        r1.AddItem('key', i, lambda x: -x)
+      for start in xrange(0, 1000, 100):
+        r2.AddItems('key', xrange(start, start + 100), lambda x: -x)
+      self.assertEqual(r1.Items('key'), r2.Items('key'))
+
   def testFilterItemsByKey(self):
     r = reservoir.Reservoir(100, seed=0)
     for i in xrange(10):
@@ -109,6 +122,329 @@ class ReservoirTest(tf.test.TestCase):
     self.assertEqual(len(r.Items('key1')), 4)
     self.assertEqual(len(r.Items('key2')), 8)
 
+  def testGenerationChangesWithItems(self):
+    r = reservoir.Reservoir(10)
+    self.assertEqual(r.Generation('key1'), 0)
+    r.AddItem('key1', 1)
+    r.AddItems('key1', [2, 3])
+    self.assertEqual(r.Generation('key1'), 2)
+    r.AddItem('key2', 1)
+    self.assertEqual(r.Generation('key1'), 2)
+    r.FilterItems(lambda x: x < 3, 'key1')
+    self.assertEqual(r.Generation('key1'), 3)
+    self.assertEqual(r.Generation('key2'), 1)
+
+  def testNumItems(self):
+    r = reservoir.Reservoir(10)
+    self.assertEqual(r.NumItems('key'), 0)
+    r.AddItems('key', xrange(100))
+    self.assertEqual(r.NumItems('key'), 10)
+    r.FilterItems(lambda x: x < 50, 'key')
+    self.assertEqual(r.NumItems('key'), len(r.Items('key')))
+
+  def testTracksMemoryUsage(self):
+    r = reservoir.Reservoir(10, memory_fn=len)
+    self.assertEqual(r.MemoryUsage(), {})
+    for i in xrange(100):
+      r.AddItem('key1', 'x' * (i % 7))
+    r.AddItem('key2', 'yy')
+    expected = sum(len(item) for item in r.Items('key1'))
+    self.assertEqual(r.MemoryUsage(), {'key1': expected, 'key2': 2})
+    r.FilterItems(lambda item: len(item) < 3, 'key1')
+    expected = sum(len(item) for item in r.Items('key1'))
+    self.assertEqual(r.MemoryUsage(), {'key1': expected, 'key2': 2})
+    r.FilterItems(lambda _: False)
+    self.assertEqual(r.MemoryUsage(), {'key1': 0, 'key2': 0})
+
+
+_Scalar = collections.namedtuple('_Scalar', ['wall_time', 'step', 'value'])
+
+
+class ScalarReservoirTest(tf.test.TestCase):
+
+  def _Scalars(self, n):
+    return [_Scalar(wall_time=1000.0 + i, step=i, value=i / 4.0)
+            for i in xrange(n)]
+
+  def testRespectsSize(self):
+    r = reservoir.ScalarReservoir(42, _Scalar)
+    self.assertEqual(r._buckets['meaning of life']._max_size, 42)
+
+  def testExceptions(self):
+    with self.assertRaises(ValueError):
+      reservoir.ScalarReservoir(-1, _Scalar)
+    r = reservoir.ScalarReservoir(12, _Scalar)
+    with self.assertRaises(KeyError):
+      r.Items('missing key')
+    with self.assertRaises(KeyError):
+      r.Columns('missing key')
+
+  def testSamplesLikeReservoir(self):
+    for size in (0, 1, 10):
+      for always_keep_last in (True, False):
+        expected = reservoir.Reservoir(
+            size, seed=3, always_keep_last=always_keep_last)
+        actual = reservoir.ScalarReservoir(
+            size, _Scalar, seed=3, always_keep_last=always_keep_last)
+        for item in self._Scalars(1000):
+          expected.AddItem('key', item)
+          actual.AddItem('key', item)
+        self.assertEqual(expected.Items('key'), actual.Items('key'))
+
+  def testFilterItemsLikeReservoir(self):
+    expected = reservoir.Reservoir(20)
+    actual = reservoir.ScalarReservoir(20, _Scalar)
+    for item in self._Scalars(100):
+      expected.AddItem('key', item)
+      actual.AddItem('key', item)
+    keep = lambda x: x.step < 50
+    self.assertEqual(expected.FilterItems(keep), actual.FilterItems(keep))
+    for item in self._Scalars(100)[60:]:
+      expected.AddItem('key', item)
+      actual.AddItem('key', item)
+    self.assertEqual(expected.Items('key'), actual.Items('key'))
+
+  def testColumns(self):
+    r = reservoir.ScalarReservoir(0, _Scalar, value_dtype=np.float32)
+    for item in self._Scalars(40):
+      r.AddItem('key', item)
+    wall_times, steps, values = r.Columns('key')
+    self.assertEqual(wall_times.dtype, np.float64)
+    self.assertEqual(steps.dtype, np.int64)
+    self.assertEqual(values.dtype, np.float32)
+    self.assertEqual(steps.tolist(), list(xrange(40)))
+    self.assertEqual(values.tolist(), [i / 4.0 for i in xrange(40)])
+    # The columns are copies.
+    steps[0] = -1
+    self.assertEqual(r.Items('key')[0].step, 0)
+
+  def testAddItemsMatchesAddItem(self):
+    r1 = reservoir.ScalarReservoir(10, _Scalar)
+    r2 = reservoir.ScalarReservoir(10, _Scalar)
+    items = self._Scalars(1000)
+    for item in items:
+      r1.AddItem('key', item)
+    r2.AddItems('key', items[:500])
+    r2.AddItems('key', iter(items[500:]))
+    self.assertEqual(r1.Items('key'), r2.Items('key'))
+
+  def testBoundsCapacity(self):
+    r = reservoir.ScalarReservoir(100, _Scalar)
+    r.AddItems('key', self._Scalars(100000))
+    bucket = r._buckets['key']
+    self.assertEqual(len(r.Items('key')), 100)
+    self.assertLessEqual(len(bucket._steps), 100 + 25)
+
+  def testNumItems(self):
+    r = reservoir.ScalarReservoir(10, _Scalar)
+    r.AddItems('key', self._Scalars(100))
+    self.assertEqual(r.NumItems('key'), 10)
+
+  def testMemoryUsage(self):
+    r = reservoir.ScalarReservoir(10, _Scalar, value_dtype=np.float32)
+    r.AddItems('key', self._Scalars(100))
+    # float64 wall times, int64 steps and float32 values.
+    self.assertEqual(r.MemoryUsage(), {'key': 10 * 20})
+
+  def testAppliesFunctionToKeptItems(self):
+    r = reservoir.ScalarReservoir(0, _Scalar)
+    r.AddItem('key', _Scalar(1.0, 2, 3.0), lambda x: x._replace(value=-1.0))
+    self.assertEqual(r.Items('key'), [_Scalar(1.0, 2, -1.0)])
+
+
+class StepStratifiedReservoirTest(tf.test.TestCase):
+
+  def _Scalars(self, steps, value_fn=float):
+    return [_Scalar(wall_time=float(step), step=step, value=value_fn(step))
+            for step in steps]
+
+  def testExceptions(self):
+    with self.assertRaises(ValueError):
+      reservoir.StepStratifiedReservoir(-1)
+    with self.assertRaises(ValueError):
+      reservoir.StepStratifiedReservoir(2)
+    with self.assertRaises(ValueError):
+      reservoir.StepStratifiedReservoir(4, keep_extrema=True)
+    with self.assertRaises(KeyError):
+      reservoir.StepStratifiedReservoir(10).Items('missing key')
+
+  def testKeepsEverythingUntilFull(self):
+    r = reservoir.StepStratifiedReservoir(10)
+    items = self._Scalars(xrange(8))
+    r.AddItems('key', items)
+    self.assertEqual(r.Items('key'), items)
+
+  def testSizeZeroKeepsEverything(self):
+    r = reservoir.StepStratifiedReservoir(0)
+    items = self._Scalars([1, 1, 2, 0] * 100)
+    r.AddItems('key', items)
+    self.assertEqual(r.Items('key'), items)
+
+  def testNumItems(self):
+    r = reservoir.StepStratifiedReservoir(10, keep_extrema=True)
+    r.AddItems('key', self._Scalars(xrange(1000), value_fn=lambda s: s % 7))
+    self.assertEqual(r.NumItems('key'), len(r.Items('key')))
+
+  def testSpreadsItemsEvenlyOverSteps(self):
+    r = reservoir.StepStratifiedReservoir(66)
+    for item in self._Scalars(xrange(100000)):
+      r.AddItem('key', item)
+    steps = [item.step for item in r.Items('key')]
+    self.assertLessEqual(len(steps), 66)
+    self.assertEqual(steps[0], 0)
+    self.assertEqual(steps[-1], 99999)
+    # The bins are 2048 steps wide by now, and each keeps its first item.
+    gaps = set(b - a for a, b in zip(steps[1:-2], steps[2:-1]))
+    self.assertEqual(gaps, set([2048]))
+    self.assertEqual(steps, sorted(steps))
+
+  def testKeepsExtrema(self):
+    r = reservoir.StepStratifiedReservoir(32, keep_extrema=True)
+    spikes = {12345: 1e6, 54321: -1e6}
+    items = self._Scalars(xrange(100000),
+                          lambda step: spikes.get(step, step % 10))
+    r.AddItems('key', items)
+    kept = r.Items('key')
+    self.assertLessEqual(len(kept), 32)
+    values = [item.value for item in kept]
+    self.assertIn(1e6, values)
+    self.assertIn(-1e6, values)
+    self.assertEqual(kept[-1].step, 99999)
+
+  def testFilterItems(self):
+    r = reservoir.StepStratifiedReservoir(10)
+    r.AddItems('key', self._Scalars(xrange(100)))
+    num_before = len(r.Items('key'))
+    removed = r.FilterItems(lambda x: x.step < 50, 'key')
+    items = r.Items('key')
+    self.assertEqual(removed, num_before - len(items))
+    self.assertTrue(all(item.step < 50 for item in items))
+    r.AddItem('key', _Scalar(0.0, 50, 0.0))
+    self.assertEqual(r.Items('key')[-1].step, 50)
+
+  def testColumns(self):
+    r = reservoir.StepStratifiedReservoir(10)
+    r.AddItems('key', self._Scalars(xrange(5)))
+    wall_times, steps, values = r.Columns('key')
+    self.assertEqual(steps.tolist(), list(xrange(5)))
+    self.assertEqual(steps.dtype, np.int64)
+    self.assertEqual(values.tolist(), [float(i) for i in xrange(5)])
+    self.assertEqual(wall_times.tolist(), [float(i) for i in xrange(5)])
+
+  def testStoresValuesAsValueDtype(self):
+    r = reservoir.StepStratifiedReservoir(10, value_dtype=np.float32)
+    r.AddItems('key', self._Scalars(xrange(5), value_fn=lambda s: s / 10.0))
+    _, _, values = r.Columns('key')
+    self.assertEqual(values.dtype, np.float32)
+    expected = [float(np.float32(s / 10.0)) for s in xrange(5)]
+    self.assertEqual(values.tolist(), expected)
+    self.assertEqual([item.value for item in r.Items('key')], expected)
+
+
+class ByteBudgetedReservoirTest(tf.test.TestCase):
+
+  def testBehavesLikeReservoirWithinBudget(self):
+    expected = reservoir.Reservoir(10)
+    actual = reservoir.ByteBudgetedReservoir(10, len, max_bytes_per_key=1000)
+    for i in xrange(100):
+      expected.AddItem('key', 'x' * (i % 7))
+      actual.AddItem('key', 'x' * (i % 7))
+    self.assertEqual(expected.Items('key'), actual.Items('key'))
+    self.assertEqual(actual.NumBytes('key'),
+                     sum(len(item) for item in actual.Items('key')))
+
+  def testRespectsMaxBytesPerKey(self):
+    r = reservoir.ByteBudgetedReservoir(0, len, max_bytes_per_key=100)
+    for i in xrange(1000):
+      r.AddItem('key', '%010d' % i)
+    items = r.Items('key')
+    self.assertLessEqual(r.NumBytes('key'), 100)
+    self.assertEqual(len(items), 10)
+    self.assertEqual(items[-1], '%010d' % 999)
+    self.assertEqual(items, sorted(items))
+
+  def testKeepsOneItemAboveTheCap(self):
+    r = reservoir.ByteBudgetedReservoir(5, len, max_bytes_per_key=10)
+    r.AddItem('key', 'x' * 100)
+    self.assertEqual(r.Items('key'), ['x' * 100])
+    r.AddItem('key', 'y' * 100)
+    self.assertEqual(r.Items('key'), ['y' * 100])
+
+  def testGrowsBackOnceItemsGetSmaller(self):
+    r = reservoir.ByteBudgetedReservoir(20, len, max_bytes_per_key=100)
+    for _ in xrange(10):
+      r.AddItem('key', 'x' * 50)
+    self.assertEqual(len(r.Items('key')), 2)
+    for _ in xrange(1000):
+      r.AddItem('key', 'y')
+    self.assertEqual(len(r.Items('key')), 20)
+    self.assertEqual(r._buckets['key']._max_size, 20)
+
+  def testSharedBudgetEvictsFromLargestKeyFirst(self):
+    budget = reservoir.ByteBudget(100)
+    r1 = reservoir.ByteBudgetedReservoir(0, len, byte_budget=budget)
+    r2 = reservoir.ByteBudgetedReservoir(0, len, byte_budget=budget)
+    for _ in xrange(4):
+      r1.AddItem('small', 'x' * 5)
+    for _ in xrange(20):
+      r2.AddItem('large', 'x' * 10)
+    self.assertLessEqual(budget.NumBytes(), 100)
+    self.assertEqual(budget.NumBytes(), r1.NumBytes() + r2.NumBytes())
+    self.assertEqual(len(r1.Items('small')), 4)
+    self.assertEqual(len(r2.Items('large')), 8)
+
+  def testEvictionsUpdateMemoryUsage(self):
+    r = reservoir.ByteBudgetedReservoir(0, len, max_bytes_per_key=50,
+                                        memory_fn=lambda item: len(item) + 1)
+    for i in xrange(30):
+      r.AddItem('key', 'x' * (i % 9))
+    items = r.Items('key')
+    self.assertEqual(r.NumBytes('key'), sum(len(item) for item in items))
+    self.assertEqual(r.MemoryUsage(),
+                     {'key': sum(len(item) + 1 for item in items)})
+
+  def testEvictionsChangeGeneration(self):
+    budget = reservoir.ByteBudget(10)
+    r1 = reservoir.ByteBudgetedReservoir(0, len, byte_budget=budget)
+    r2 = reservoir.ByteBudgetedReservoir(0, len, byte_budget=budget)
+    r1.AddItem('key', 'x' * 5)
+    r1.AddItem('key', 'x' * 5)
+    generation = r1.Generation('key')
+    r2.AddItem('key', 'x' * 5)
+    self.assertGreater(r1.Generation('key'), generation)
+
+  def testFilterItemsUpdatesBytes(self):
+    budget = reservoir.ByteBudget(0)
+    r = reservoir.ByteBudgetedReservoir(0, len, byte_budget=budget)
+    for i in xrange(10):
+      r.AddItem('key', 'x' * i)
+    r.FilterItems(lambda x: len(x) < 5)
+    self.assertEqual(r.NumBytes('key'), 0 + 1 + 2 + 3 + 4)
+    self.assertEqual(budget.NumBytes(), 10)
+
+  def testSamplesUniformly(self):
+    # Items are sampled uniformly even when the byte cap, not the item count,
+    # limits the sample.
+    counts = [0] * 10
+    for seed in xrange(300):
+      r = reservoir.ByteBudgetedReservoir(0, len, max_bytes_per_key=30,
+                                          seed=seed)
+      for i in xrange(100):
+        r.AddItem('key', '%02d' % i)
+      for item in r.Items('key')[:-1]:
+        counts[int(item) // 10] += 1
+    mean = sum(counts) / 10.0
+    for count in counts:
+      self.assertLess(abs(count - mean), 0.2 * mean)
+
+  def testExceptions(self):
+    with self.assertRaises(ValueError):
+      reservoir.ByteBudgetedReservoir(10, len, max_bytes_per_key=-1)
+    with self.assertRaises(ValueError):
+      reservoir.ByteBudget(-1)
+    with self.assertRaises(KeyError):
+      reservoir.ByteBudgetedReservoir(10, len).NumBytes('missing key')
+
 
 class ReservoirBucketTest(tf.test.TestCase):
 
@@ -228,6 +564,80 @@ class ReservoirBucketTest(tf.test.TestCase):
     self.assertEqual(incrementer.n, 1000)
     self.assertEqual(b.Items(), [x * 2 for x in xrange(99)] + [999 * 2])
 
+  def testMatchesPoppingFromAList(self):
+    for size in (1, 7, 100):
+      for always_keep_last in (True, False):
+        b = reservoir._ReservoirBucket(
+            size, reservoir._Lcg64(5), always_keep_last=always_keep_last)
+        rng = reservoir._Lcg64(5)
+        expected = []
+        for i in xrange(5000):
+          b.AddItem(i)
+          if len(expected) < size:
+            expected.append(i)
+          else:
+            r = rng.randint(0, i)
+            if r < size:
+              expected.pop(r)
+              expected.append(i)
+            elif always_keep_last:
+              expected[-1] = i
+        self.assertEqual(b.Items(), expected)
+
+  def testCompactsRemovedSlots(self):
+    b = reservoir._ReservoirBucket(50)
+    for i in xrange(100000):
+      b.AddItem(i)
+    self.assertEqual(len(b.Items()), 50)
+    self.assertLessEqual(len(b._slots), 2 * 50 + 1)
+
+
+class ArrivalIndexTest(tf.test.TestCase):
+
+  def testRemovesByRank(self):
+    index = reservoir._ArrivalIndex()
+    for _ in xrange(10):
+      index.Append()
+    self.assertEqual(index.Remove(3), 3)
+    self.assertEqual(index.Remove(3), 4)
+    self.assertEqual(index.Remove(0), 0)
+    self.assertEqual(index.Remove(6), 9)
+    index.Append()
+    self.assertEqual(index.Remove(6), 10)
+    self.assertEqual(index.num_live, 6)
+    self.assertEqual(list(index.alive), [0, 1, 1, 0, 0, 1, 1, 1, 1, 0, 0])
+
+  def testMatchesList(self):
+    rng = reservoir._Lcg64(1)
+    index = reservoir._ArrivalIndex(5)
+    live = list(xrange(5))
+    next_slot = 5
+    for _ in xrange(2000):
+      if live and rng.randint(0, 2) == 0:
+        rank = rng.randint(0, len(live) - 1)
+        self.assertEqual(index.Remove(rank), live.pop(rank))
+      else:
+        index.Append()
+        live.append(next_slot)
+        next_slot += 1
+    self.assertEqual(index.num_live, len(live))
+
+
+class Lcg64Test(tf.test.TestCase):
+
+  def testDeterministic(self):
+    a = reservoir._Lcg64(42)
+    b = reservoir._Lcg64(42)
+    self.assertEqual([a.randint(0, 1000) for _ in xrange(100)],
+                     [b.randint(0, 1000) for _ in xrange(100)])
+
+  def testStaysInRange(self):
+    rng = reservoir._Lcg64(0)
+    values = set(rng.randint(3, 7) for _ in xrange(1000))
+    self.assertEqual(values, set(xrange(3, 8)))
+    with self.assertRaises(ValueError):
+      rng.randint(1, 0)
+
 
 class ReservoirBucketStatisticalDistributionTest(tf.test.TestCase):
 
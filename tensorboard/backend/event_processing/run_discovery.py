@@ -0,0 +1,134 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Finds the run directories of a logdir without walking it every time."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import os
+import time
+
+import tensorflow as tf
+
+from tensorboard.backend.event_processing import io_wrapper
+
+# A directory whose modification time is this close to the current time may
+# still change within the same mtime tick, so its listing isn't trusted.
+_RACY_MTIME_SECS = 2
+
+# What is known about a directory as of its modification time `mtime_nsec`.
+_DirectoryListing = collections.namedtuple(
+    '_DirectoryListing', ['mtime_nsec', 'subdirectories', 'has_run_files'])
+
+
+class RunDiscoverer(object):
+  """Caches the directory tree of a logdir along with directory mtimes.
+
+  Adding or removing an entry in a directory changes the modification time of
+  that directory, so `ListRunDirectories` only lists directories whose mtime
+  changed since the last call, and stats the others. On a deep logdir this
+  replaces a listing plus a stat per entry with a single stat per directory.
+
+  Directories on filesystems that don't report modification times, such as
+  GCS, are listed every time.
+  """
+
+  def __init__(self, top, run_file_filter, clock=time.time):
+    """Constructs a `RunDiscoverer`.
+
+    Args:
+      top: The logdir to search.
+      run_file_filter: A function taking a file path and returning whether the
+        directory containing it is a run, such as
+        `event_accumulator.IsTensorFlowEventsFile`.
+      clock: A function returning the current time in seconds.
+    """
+    self._top = top
+    self._run_file_filter = run_file_filter
+    self._clock = clock
+    self._cache = {}
+    self._use_mtimes = io_wrapper.IsLocalPath(top)
+
+  def ListRunDirectories(self):
+    """Returns the directories under the logdir that contain run files.
+
+    Directories are returned top-down, in sorted order. A logdir that doesn't
+    exist has no run directories.
+
+    Returns:
+      A list of directory paths, starting with the logdir itself if it is a run.
+
+    Raises:
+      ValueError: If the logdir is a file.
+    """
+    if tf.gfile.Exists(self._top) and not tf.gfile.IsDirectory(self._top):
+      raise ValueError('ListRunDirectories: path exists and is not a '
+                       'directory, %s' % self._top)
+    seen = set()
+    runs = []
+    pending = [self._top]
+    while pending:
+      directory = pending.pop()
+      listing = self._List(directory)
+      if listing is None:
+        continue
+      seen.add(directory)
+      if listing.has_run_files:
+        runs.append(directory)
+      pending.extend(reversed(listing.subdirectories))
+    for directory in list(self._cache):
+      if directory not in seen:
+        del self._cache[directory]
+    return runs
+
+  def _List(self, directory):
+    """Returns the `_DirectoryListing` of a directory, or None if it's gone."""
+    mtime_nsec = None
+    if self._use_mtimes:
+      try:
+        mtime_nsec = tf.gfile.Stat(directory).mtime_nsec
+      except tf.errors.OpError:
+        self._cache.pop(directory, None)
+        return None
+      cached = self._cache.get(directory)
+      if cached is not None and cached.mtime_nsec == mtime_nsec:
+        return cached
+
+    try:
+      names = tf.gfile.ListDirectory(directory)
+    except tf.errors.OpError:
+      self._cache.pop(directory, None)
+      return None
+    subdirectories = []
+    has_run_files = False
+    for name in sorted(names):
+      name = name.rstrip('/')
+      path = os.path.join(directory, name)
+      if tf.gfile.IsDirectory(path):
+        subdirectories.append(path)
+      elif self._run_file_filter(path):
+        has_run_files = True
+
+    if mtime_nsec is not None and mtime_nsec < (
+        self._clock() - _RACY_MTIME_SECS) * 1e9:
+      listing = _DirectoryListing(mtime_nsec, subdirectories, has_run_files)
+    else:
+      # Entries added later in the same mtime tick wouldn't change the mtime,
+      # so list the directory again next time.
+      listing = _DirectoryListing(None, subdirectories, has_run_files)
+    self._cache[directory] = listing
+    return listing
@@ -0,0 +1,107 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for run_discovery."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import time
+
+import tensorflow as tf
+
+from tensorboard.backend.event_processing import run_discovery
+
+
+def _IsEventsFile(path):
+  return 'tfevents' in os.path.basename(path)
+
+
+class RunDiscovererTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(RunDiscovererTest, self).setUp()
+    self.stubs = tf.test.StubOutForTesting()
+    self._logdir = os.path.join(self.get_temp_dir(), self.id())
+    os.makedirs(self._logdir)
+    self._now = time.time() + 100
+    self._discoverer = run_discovery.RunDiscoverer(
+        self._logdir, _IsEventsFile, clock=lambda: self._now)
+    self._listed = []
+    list_directory = tf.gfile.ListDirectory
+
+    def ListDirectory(directory):
+      self._listed.append(os.path.relpath(directory, self._logdir))
+      return list_directory(directory)
+
+    self.stubs.Set(tf.gfile, 'ListDirectory', ListDirectory)
+
+  def tearDown(self):
+    self.stubs.CleanUp()
+    super(RunDiscovererTest, self).tearDown()
+
+  def _AddEvents(self, *path):
+    directory = os.path.join(self._logdir, *path)
+    if not os.path.isdir(directory):
+      os.makedirs(directory)
+    open(os.path.join(directory, 'events.out.tfevents.1'), 'a').close()
+
+  def _SetMTime(self, directory, mtime):
+    os.utime(os.path.join(self._logdir, directory), (mtime, mtime))
+
+  def _Discover(self):
+    del self._listed[:]
+    return [os.path.relpath(run, self._logdir)
+            for run in self._discoverer.ListRunDirectories()]
+
+  def testOnlyListsChangedDirectories(self):
+    self._AddEvents('a')
+    self._AddEvents('b', 'c')
+    self.assertEqual(self._Discover(), ['a', 'b/c'])
+    self.assertItemsEqual(self._listed, ['.', 'a', 'b', 'b/c'])
+    self.assertEqual(self._Discover(), ['a', 'b/c'])
+    self.assertEqual(self._listed, [])
+
+    self._AddEvents('b', 'd')
+    self._SetMTime('b', self._now)
+    self.assertEqual(self._Discover(), ['a', 'b/c', 'b/d'])
+    self.assertItemsEqual(self._listed, ['b', 'b/d'])
+
+    shutil.rmtree(os.path.join(self._logdir, 'a'))
+    self._SetMTime('.', self._now + 1)
+    self.assertEqual(self._Discover(), ['b/c', 'b/d'])
+
+  def testRelistsRecentlyModifiedDirectories(self):
+    self._AddEvents('a')
+    self._SetMTime('.', self._now)
+    self._Discover()
+    self.assertEqual(self._Discover(), ['a'])
+    self.assertEqual(self._listed, ['.'])
+
+  def testMissingLogdirHasNoRuns(self):
+    shutil.rmtree(self._logdir)
+    self.assertEqual(self._Discover(), [])
+
+  def testRaisesForFile(self):
+    path = os.path.join(self._logdir, 'file')
+    open(path, 'w').close()
+    with self.assertRaises(ValueError):
+      run_discovery.RunDiscoverer(path, _IsEventsFile).ListRunDirectories()
+
+
+if __name__ == '__main__':
+  tf.test.main()
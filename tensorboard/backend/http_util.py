@@ -19,13 +19,19 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import collections
 import gzip
+import itertools
 import json
+import random
 import re
+import threading
 import time
 import wsgiref.handlers
+import zlib
 
 import six
+from six.moves import queue
 import tensorflow as tf
 from werkzeug import wrappers
 
@@ -58,6 +64,31 @@ _JSON_MIMETYPES = set([
     'application/json+protobuf',
 ])
 
+# The default most bytes of response bodies the process keeps in memory. See
+# `SetResponseCacheBytes`.
+DEFAULT_RESPONSE_CACHE_BYTES = 128 << 20
+
+# Smaller bodies are sent as they are: they fit in a few packets anyway, and
+# the gzip header and the work on both ends would outweigh the savings.
+_MIN_GZIP_BYTES = 512
+
+# The level to compress bodies at while a request waits for them.
+_FAST_GZIP_LEVEL = 3
+
+# Cached bodies at least this large are compressed once, and then compressed
+# again at _BEST_GZIP_LEVEL in the background for later requests.
+_MIN_CACHED_GZIP_BYTES = 64 << 10
+_BEST_GZIP_LEVEL = 9
+
+# The most background compressions that may wait for the compression thread.
+_MAX_PENDING_COMPRESSIONS = 16
+
+# The number of rows JsonArrayChunks serializes at once.
+_ROWS_PER_CHUNK = 4096
+
+# Distinguishes the entity tags of this process from those of earlier ones.
+_PROCESS_TAG = '%x' % random.getrandbits(32)
+
 
 def Respond(request,
             content,
@@ -65,7 +96,8 @@ def Respond(request,
             code=200,
             expires=0,
             content_encoding=None,
-            encoding='utf-8'):
+            encoding='utf-8',
+            etag=None):
   """Construct a werkzeug Response.
 
   Responses are transmitted to the browser with compression if: a) the browser
@@ -101,11 +133,37 @@ def Respond(request,
     expires: Second duration for browser caching.
     content_encoding: Encoding if content is already encoded, e.g. 'gzip'.
     encoding: Input charset if content parameter has byte strings.
+    etag: An optional entity tag for the content, as returned by `ETag`.
 
   Returns:
     A werkzeug Response object (a WSGI application).
   """
+  content, content_type, content_encoding = _Encode(
+      request, content, content_type, content_encoding, encoding)
+  return _MakeResponse(request, content, content_type, code, expires,
+                       content_encoding, etag)
+
+
+def _Encode(request, content, content_type, content_encoding, encoding):
+  """Serializes and compresses content like `Respond` does.
 
+  Returns:
+    A (content, content_type, content_encoding) tuple, where content is bytes.
+  """
+  content, content_type, textual = _Serialize(content, content_type, encoding)
+  if not content_encoding and _ShouldGzip(request, content, textual):
+    content = _Gzip(content, _FAST_GZIP_LEVEL)
+    content_encoding = 'gzip'
+  return content, content_type, content_encoding
+
+
+def _Serialize(content, content_type, encoding):
+  """Turns content into bytes in the charset of content_type.
+
+  Returns:
+    A (content, content_type, textual) tuple, where content is bytes and
+    textual is whether the media type is worth compressing.
+  """
   mimetype = _EXTRACT_MIMETYPE_PATTERN.search(content_type).group(0)
   charset_match = _EXTRACT_CHARSET_PATTERN.search(content_type)
   charset = charset_match.group(1) if charset_match else encoding
@@ -121,21 +179,75 @@ def Respond(request,
   content = tf.compat.as_bytes(content, charset)
   if textual and not charset_match and mimetype not in _JSON_MIMETYPES:
     content_type += '; charset=' + charset
-  if (not content_encoding and textual and
-      _ALLOWS_GZIP_PATTERN.search(request.headers.get('Accept-Encoding', ''))):
-    out = six.BytesIO()
-    f = gzip.GzipFile(fileobj=out, mode='wb', compresslevel=3)
-    f.write(content)
-    f.close()
-    content = out.getvalue()
-    content_encoding = 'gzip'
+  return content, content_type, bool(textual)
+
+
+def _AllowsGzip(request):
+  return bool(
+      _ALLOWS_GZIP_PATTERN.search(request.headers.get('Accept-Encoding', '')))
+
+
+def _ShouldGzip(request, content, textual):
+  return textual and len(content) >= _MIN_GZIP_BYTES and _AllowsGzip(request)
+
+
+def _Gzip(content, level):
+  out = six.BytesIO()
+  f = gzip.GzipFile(fileobj=out, mode='wb', compresslevel=level)
+  f.write(content)
+  f.close()
+  return out.getvalue()
+
+
+def _CompressLater(cache, key, build_fn):
+  """Puts the value returned by build_fn into cache, on a background thread.
+
+  Compressions are dropped if too many are already waiting.
+  """
+  global _compression_thread
+  with _compression_thread_mutex:
+    if _compression_thread is None:
+      _compression_thread = threading.Thread(target=_CompressForever,
+                                             name='http_util.Compress')
+      _compression_thread.daemon = True
+      _compression_thread.start()
+  try:
+    _compression_queue.put_nowait((cache, key, build_fn))
+  except queue.Full:
+    pass
+
+
+def _CompressForever():
+  while True:
+    cache, key, build_fn = _compression_queue.get()
+    try:
+      cache.Put(key, build_fn())
+    except Exception as e:  # pylint: disable=broad-except
+      tf.logging.error('Compressing a response in the background failed: %s',
+                       e)
+    finally:
+      _compression_queue.task_done()
+
+
+def _MakeResponse(request, content, content_type, code, expires,
+                  content_encoding, etag, accept_variant=None):
   if request.method == 'HEAD':
     content = ''
-  headers = []
+  headers = [('Content-Length', str(len(content)))]
+  headers.extend(_Headers(expires, content_encoding, etag, accept_variant))
+  return wrappers.Response(
+      response=content, status=code, headers=headers, content_type=content_type)
+
 
-  headers.append(('Content-Length', str(len(content))))
+def _Headers(expires, content_encoding=None, etag=None, accept_variant=None):
+  headers = []
   if content_encoding:
     headers.append(('Content-Encoding', content_encoding))
+  if etag is not None:
+    headers.append(('ETag', etag))
+  if accept_variant is not None:
+    # Caches must not answer a request accepting another format with this.
+    headers.append(('Vary', 'Accept'))
   if expires > 0:
     e = wsgiref.handlers.format_date_time(time.time() + float(expires))
     headers.append(('Expires', e))
@@ -143,6 +255,346 @@ def Respond(request,
   else:
     headers.append(('Expires', '0'))
     headers.append(('Cache-Control', 'no-cache, must-revalidate'))
+  return headers
+
+
+# Static content compressed ahead of time. See `Precompress`.
+PrecompressedContent = collections.namedtuple(
+    'PrecompressedContent', ['content', 'content_type', 'gzipped'])
+
+
+def Precompress(content, content_type, encoding='utf-8'):
+  """Serializes and compresses content once, to serve it many times.
+
+  Args:
+    content: Payload data, as taken by `Respond`.
+    content_type: Media type and optionally an output charset.
+    encoding: Input charset if content parameter has byte strings.
+
+  Returns:
+    A `PrecompressedContent` to pass to `RespondPrecompressed`, whose gzipped
+    field is None if compressing the content isn't worthwhile.
+  """
+  content, content_type, textual = _Serialize(content, content_type, encoding)
+  gzipped = None
+  if textual and len(content) >= _MIN_GZIP_BYTES:
+    gzipped = _Gzip(content, _BEST_GZIP_LEVEL)
+    if len(gzipped) >= len(content):
+      gzipped = None
+  return PrecompressedContent(content, content_type, gzipped)
+
+
+def RespondPrecompressed(request, precompressed, code=200, expires=0):
+  """Construct a werkzeug Response for content returned by `Precompress`.
+
+  Args:
+    request: A werkzeug Request object.
+    precompressed: A `PrecompressedContent`.
+    code: Numeric HTTP status code to use.
+    expires: Second duration for browser caching.
+
+  Returns:
+    A werkzeug Response object (a WSGI application).
+  """
+  if precompressed.gzipped is not None and _AllowsGzip(request):
+    return _MakeResponse(request, precompressed.gzipped,
+                         precompressed.content_type, code, expires, 'gzip',
+                         None)
+  return _MakeResponse(request, precompressed.content,
+                       precompressed.content_type, code, expires, None, None)
+
+
+def RespondStream(request, chunks, content_type, code=200, expires=0,
+                  etag=None, accept_variant=None):
+  """Construct a werkzeug Response whose body is produced as it is sent.
+
+  The body is encoded and compressed one chunk at a time and sent without a
+  Content-Length, so that the server uses chunked transfer encoding. Only a
+  chunk at a time is held in memory, however large the whole body is. Unlike
+  `RespondWithETag`, the body is not cached.
+
+  Args:
+    request: A werkzeug Request object.
+    chunks: An iterable of byte or unicode strings making up the body, such
+      as returned by `JsonArrayChunks`. Byte strings must be UTF-8.
+    content_type: Media type and optionally an output charset.
+    code: Numeric HTTP status code to use.
+    expires: Second duration for browser caching.
+    etag: An optional entity tag for the content, as returned by `ETag`. If
+      the browser already has the content, chunks isn't iterated at all.
+    accept_variant: See `RespondWithETag`.
+
+  Returns:
+    A werkzeug Response object (a WSGI application).
+  """
+  not_modified = NotModified(request, etag, accept_variant)
+  if not_modified is not None:
+    return not_modified
+  _, content_type, textual = _Serialize(b'', content_type, 'utf-8')
+  gzip_ok = textual and _AllowsGzip(request)
+  headers = _Headers(expires, 'gzip' if gzip_ok else None, etag,
+                     accept_variant)
+  if request.method == 'HEAD':
+    body = []
+  else:
+    body = _EncodeChunks(chunks, content_type, gzip_ok)
+  return wrappers.Response(
+      response=body, status=code, headers=headers, content_type=content_type)
+
+
+def _EncodeChunks(chunks, content_type, gzip_ok):
+  compressor = None
+  if gzip_ok:
+    # A window of 16 + MAX_WBITS makes zlib write a gzip header and trailer.
+    compressor = zlib.compressobj(_FAST_GZIP_LEVEL, zlib.DEFLATED,
+                                  16 + zlib.MAX_WBITS)
+  for chunk in chunks:
+    chunk, _, _ = _Serialize(chunk, content_type, 'utf-8')
+    if compressor is not None:
+      chunk = compressor.compress(chunk)
+    if chunk:
+      yield chunk
+  if compressor is not None:
+    yield compressor.flush()
+
+
+def JsonArrayChunks(rows, rows_per_chunk=_ROWS_PER_CHUNK):
+  """Serializes a JSON array a few rows at a time, for `RespondStream`.
+
+  Rows are passed through `json_util.Cleanse` like the content of `Respond`.
+
+  Args:
+    rows: An iterable of JSON-serializable rows, which is consumed lazily.
+    rows_per_chunk: The number of rows to serialize into each chunk.
+
+  Yields:
+    Unicode strings which together make up the JSON array of the rows.
+  """
+  rows = iter(rows)
+  separator = '['
+  while True:
+    batch = list(itertools.islice(rows, rows_per_chunk))
+    if not batch:
+      break
+    # Serialize the batch as an array, and splice its items into the whole.
+    yield separator + json.dumps(json_util.Cleanse(batch))[1:-1]
+    separator = ', '
+  yield ']' if separator == ', ' else '[]'
+
+
+def LazyItems(items_fn):
+  """Yields the items returned by items_fn, only calling it once iterated.
+
+  This defers reading the rows passed to `JsonArrayChunks` until the response
+  is streamed.
+
+  Args:
+    items_fn: A function with no arguments returning an iterable.
+
+  Yields:
+    The items returned by items_fn.
+  """
+  for item in items_fn():
+    yield item
+
+
+def SetResponseCacheBytes(max_bytes):
+  """Sets the most bytes of response bodies the process keeps in memory.
+
+  These are the encoded bodies of `RespondWithETag`.
+
+  Args:
+    max_bytes: The number of bytes, or 0 to keep no bodies.
+  """
+  _DEFAULT_RESPONSE_CACHE.SetMaxBytes(max_bytes)
+
+
+def ETag(*parts):
+  """Returns an entity tag made of parts, such as data generations.
+
+  Entity tags made by other server processes never match, since generations
+  start over when the server restarts.
+  """
+  return '"%s"' % '-'.join(str(part) for part in (_PROCESS_TAG,) + parts)
+
+
+def RespondWithETag(request, etag, content_fn, cache=None,
+                    accept_variant=None):
+  """Construct a werkzeug Response, skipping the work if it was done before.
+
+  If the request carries etag in its If-None-Match header, the browser already
+  has the content, and a 304 response without a body is returned. Otherwise,
+  the encoded body is looked up in cache by etag and URL, and only built with
+  content_fn if it is missing, so that identical requests, including
+  concurrent ones, share one serialization and compression.
 
+  Args:
+    request: A werkzeug Request object.
+    etag: The entity tag of the content, as returned by `ETag`, which must
+      change whenever content_fn would return different content. If None,
+      this is the same as calling `Respond` with the result of content_fn.
+    content_fn: A function with no arguments returning a (content,
+      content_type) tuple, as taken by `Respond`.
+    cache: The `ResponseCache` to use. Defaults to a cache shared by the
+      process.
+    accept_variant: If the format of the content was negotiated from the
+      Accept header of request, the media type that was chosen, such as
+      returned by `column_format.Negotiate`. The response then carries a
+      `Vary: Accept` header, and each media type is cached separately.
+
+  Returns:
+    A werkzeug Response object (a WSGI application).
+  """
+  if etag is None:
+    content, content_type = content_fn()
+    response = Respond(request, content, content_type)
+    if accept_variant is not None:
+      response.headers.add('Vary', 'Accept')
+    return response
+  not_modified = NotModified(request, etag, accept_variant)
+  if not_modified is not None:
+    return not_modified
+
+  def _EncodeContent():
+    content, content_type = content_fn()
+    content, content_type, textual = _Serialize(content, content_type, 'utf-8')
+    if not (gzip_ok and textual and len(content) >= _MIN_GZIP_BYTES):
+      return content, content_type, None
+    if len(content) >= _MIN_CACHED_GZIP_BYTES:
+      _CompressLater(cache, key, lambda: (
+          _Gzip(content, _BEST_GZIP_LEVEL), content_type, 'gzip'))
+    return _Gzip(content, _FAST_GZIP_LEVEL), content_type, 'gzip'
+
+  gzip_ok = _AllowsGzip(request)
+  if cache is None:
+    cache = _DEFAULT_RESPONSE_CACHE
+  key = (etag, request.full_path, gzip_ok, accept_variant)
+  content, content_type, content_encoding = cache.Get(key, _EncodeContent)
+  return _MakeResponse(request, content, content_type, 200, 0,
+                       content_encoding, etag, accept_variant)
+
+
+def NotModified(request, etag, accept_variant=None):
+  """Returns a 304 response if the browser already has the content.
+
+  Args:
+    request: A werkzeug Request object.
+    etag: The entity tag of the content, as returned by `ETag`, or None.
+    accept_variant: See `RespondWithETag`.
+
+  Returns:
+    A werkzeug Response object without a body if the If-None-Match header of
+    request matches etag, or else None.
+  """
+  if etag is None:
+    return None
+  if_none_match = _ParseETags(request.headers.get('If-None-Match', ''))
+  if etag not in if_none_match and '*' not in if_none_match:
+    return None
   return wrappers.Response(
-      response=content, status=code, headers=headers, content_type=content_type)
+      status=304, headers=_Headers(0, etag=etag, accept_variant=accept_variant))
+
+
+def _ParseETags(header):
+  return set(tag.strip()[2:] if tag.strip().startswith('W/') else tag.strip()
+             for tag in header.split(','))
+
+
+class ResponseCache(object):
+  """A thread-safe LRU cache of encoded response bodies, capped in bytes.
+
+  When several threads ask for the same missing key at once, only one builds
+  the value while the others wait for it.
+  """
+
+  def __init__(self, max_bytes=DEFAULT_RESPONSE_CACHE_BYTES):
+    """Creates a ResponseCache.
+
+    Args:
+      max_bytes: The most bytes of content to keep. Larger bodies are built
+        but not kept.
+    """
+    self._max_bytes = max_bytes
+    self._num_bytes = 0
+    self._entries = collections.OrderedDict()
+    self._building = {}
+    self._mutex = threading.Lock()
+
+  def NumBytes(self):
+    """Returns the number of bytes of content kept."""
+    with self._mutex:
+      return self._num_bytes
+
+  def SetMaxBytes(self, max_bytes):
+    """Sets the most bytes of content to keep, dropping entries if needed."""
+    with self._mutex:
+      self._max_bytes = max_bytes
+      self._EvictLocked()
+
+  def Get(self, key, build_fn):
+    """Returns the value of a key, building it with build_fn if missing.
+
+    Args:
+      key: A hashable key.
+      build_fn: A function with no arguments returning the value, a tuple
+        whose first item is the content, in bytes, such as a (content,
+        content_type, content_encoding) tuple.
+
+    Returns:
+      The value.
+    """
+    while True:
+      with self._mutex:
+        value = self._entries.get(key)
+        if value is not None:
+          # Move the entry to the most recently used end.
+          del self._entries[key]
+          self._entries[key] = value
+          return value
+        building = self._building.get(key)
+        if building is None:
+          building = threading.Event()
+          self._building[key] = building
+          break
+      # Another thread builds the value. If it fails, try building it here.
+      building.wait()
+
+    try:
+      value = build_fn()
+      self.Put(key, value)
+    finally:
+      with self._mutex:
+        del self._building[key]
+      building.set()
+    return value
+
+  def Put(self, key, value):
+    """Sets the value of a key, replacing any earlier value.
+
+    Args:
+      key: A hashable key.
+      value: A tuple whose first item is the content, in bytes.
+    """
+    num_bytes = len(value[0])
+    with self._mutex:
+      old_value = self._entries.pop(key, None)
+      if old_value is not None:
+        self._num_bytes -= len(old_value[0])
+      if num_bytes > self._max_bytes:
+        return
+      self._entries[key] = value
+      self._num_bytes += num_bytes
+      self._EvictLocked()
+
+  def _EvictLocked(self):
+    """Drops the least recently used entries until the content fits."""
+    while self._num_bytes > self._max_bytes:
+      _, evicted = self._entries.popitem(last=False)
+      self._num_bytes -= len(evicted[0])
+
+# The size of this is set with `SetResponseCacheBytes`.
+_DEFAULT_RESPONSE_CACHE = ResponseCache(DEFAULT_RESPONSE_CACHE_BYTES)
+
+_compression_queue = queue.Queue(maxsize=_MAX_PENDING_COMPRESSIONS)
+_compression_thread = None
+_compression_thread_mutex = threading.Lock()
@@ -21,12 +21,15 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import gzip
+import json
+import threading
 
 import six
 import tensorflow as tf
 from werkzeug import test as wtest
 from werkzeug import wrappers
 from tensorboard.backend import http_util
+from tensorboard.backend import json_util
 
 
 class RespondTest(tf.test.TestCase):
@@ -147,6 +150,272 @@ class RespondTest(tf.test.TestCase):
     r = http_util.Respond(q, '<b>hello world</b>', 'text/html', expires=60)
     self.assertEqual(r.headers.get('Cache-Control'), 'private, max-age=60')
 
+  def testSmallBodies_areNotCompressed(self):
+    e = wtest.EnvironBuilder(headers={'Accept-Encoding': 'gzip'}).get_environ()
+    r = http_util.Respond(wrappers.Request(e), 'hello', 'text/plain')
+    self.assertIsNone(r.headers.get('Content-Encoding'))
+    self.assertEqual(r.response[0], b'hello')
+
+  def testLargeBodies_areCompressedFastWithoutCaching(self):
+    e = wtest.EnvironBuilder(headers={'Accept-Encoding': 'gzip'}).get_environ()
+    q = wrappers.Request(e)
+    content = ' '.join(str(i) for i in range(100000))
+    gzip_calls = []
+    real_gzip = http_util._Gzip
+
+    def _CountingGzip(content, level):
+      gzip_calls.append(level)
+      return real_gzip(content, level)
+
+    self.stubs = tf.test.StubOutForTesting()
+    self.addCleanup(self.stubs.CleanUp)
+    self.stubs.Set(http_util, '_Gzip', _CountingGzip)
+    http_util.Respond(q, content, 'text/plain')
+    http_util._compression_queue.join()
+    r = http_util.Respond(q, content, 'text/plain')
+    self.assertEqual(_gunzip(r.response[0]), content.encode('utf-8'))
+    self.assertEqual(gzip_calls, [http_util._FAST_GZIP_LEVEL,
+                                  http_util._FAST_GZIP_LEVEL])
+
+  def testPrecompressed(self):
+    content = 'hello ' * 1000
+    precompressed = http_util.Precompress(content, 'text/plain')
+    e = wtest.EnvironBuilder(headers={'Accept-Encoding': 'gzip'}).get_environ()
+    r = http_util.RespondPrecompressed(wrappers.Request(e), precompressed)
+    self.assertEqual(r.headers.get('Content-Encoding'), 'gzip')
+    self.assertEqual(r.headers.get('Content-Type'), 'text/plain; charset=utf-8')
+    self.assertEqual(_gunzip(r.response[0]), content.encode('utf-8'))
+    q = wrappers.Request(wtest.EnvironBuilder().get_environ())
+    r = http_util.RespondPrecompressed(q, precompressed)
+    self.assertIsNone(r.headers.get('Content-Encoding'))
+    self.assertEqual(r.response[0], content.encode('utf-8'))
+
+
+class RespondWithETagTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(RespondWithETagTest, self).setUp()
+    self.cache = http_util.ResponseCache()
+    self.content = [1, 2, 3]
+    self.num_calls = 0
+
+  def _Content(self):
+    self.num_calls += 1
+    return self.content, 'application/json'
+
+  def _Respond(self, etag, headers=None, accept_variant=None):
+    q = wrappers.Request(
+        wtest.EnvironBuilder(path='/data', headers=headers).get_environ())
+    return http_util.RespondWithETag(q, etag, self._Content, cache=self.cache,
+                                     accept_variant=accept_variant)
+
+  def testSetsETag(self):
+    etag = http_util.ETag(1, 2)
+    r = self._Respond(etag)
+    self.assertEqual(r.status_code, 200)
+    self.assertEqual(r.headers.get('ETag'), etag)
+    self.assertEqual(r.response[0], b'[1, 2, 3]')
+
+  def testAcceptVariant_variesByAcceptAndIsCachedSeparately(self):
+    etag = http_util.ETag(1, 2)
+    r = self._Respond(etag)
+    self.assertIsNone(r.headers.get('Vary'))
+    r = self._Respond(etag, accept_variant='application/json')
+    self.assertEqual(r.headers.get('Vary'), 'Accept')
+    self._Respond(etag, accept_variant='application/json')
+    self.assertEqual(self.num_calls, 2)
+    self._Respond(etag, accept_variant='text/csv')
+    self.assertEqual(self.num_calls, 3)
+    r = self._Respond(etag, {'If-None-Match': etag},
+                      accept_variant='application/json')
+    self.assertEqual(r.status_code, 304)
+    self.assertEqual(r.headers.get('Vary'), 'Accept')
+    r = self._Respond(None, accept_variant='application/json')
+    self.assertEqual(r.headers.get('Vary'), 'Accept')
+
+  def testETagsDependOnParts(self):
+    self.assertEqual(http_util.ETag(1, 2), http_util.ETag(1, 2))
+    self.assertNotEqual(http_util.ETag(1, 2), http_util.ETag(1, 3))
+
+  def testMatchingETag_returnsNotModifiedWithoutContent(self):
+    etag = http_util.ETag(1, 2)
+    for if_none_match in (etag, 'W/' + etag, '"other", ' + etag, '*'):
+      r = self._Respond(etag, {'If-None-Match': if_none_match})
+      self.assertEqual(r.status_code, 304)
+      self.assertEqual(r.headers.get('ETag'), etag)
+    self.assertEqual(self.num_calls, 0)
+
+  def testStaleETag_returnsContent(self):
+    r = self._Respond(http_util.ETag(1, 3),
+                      {'If-None-Match': http_util.ETag(1, 2)})
+    self.assertEqual(r.status_code, 200)
+    self.assertEqual(self.num_calls, 1)
+
+  def testSameETag_buildsContentOnce(self):
+    etag = http_util.ETag(1, 2)
+    self._Respond(etag)
+    r = self._Respond(etag)
+    self.assertEqual(r.response[0], b'[1, 2, 3]')
+    self.assertEqual(self.num_calls, 1)
+    self._Respond(http_util.ETag(1, 3))
+    self.assertEqual(self.num_calls, 2)
+
+  def testGzip_isCachedSeparately(self):
+    etag = http_util.ETag(1, 2)
+    content = list(range(1000))
+    self.content = content
+    self._Respond(etag)
+    r = self._Respond(etag, {'Accept-Encoding': 'gzip'})
+    self.assertEqual(r.headers.get('Content-Encoding'), 'gzip')
+    self.assertEqual(json.loads(_gunzip(r.response[0]).decode('utf-8')),
+                     content)
+    self.assertEqual(self.num_calls, 2)
+
+  def testLargeBodies_areCompressedAgainInTheBackground(self):
+    etag = http_util.ETag(1, 2)
+    self.content = [str(i) for i in range(100000)]
+    headers = {'Accept-Encoding': 'gzip'}
+    fast = self._Respond(etag, headers).response[0]
+    http_util._compression_queue.join()
+    best = self._Respond(etag, headers).response[0]
+    self.assertLess(len(best), len(fast))
+    self.assertEqual(_gunzip(best), _gunzip(fast))
+    self.assertEqual(self.num_calls, 1)
+
+  def testNoETag_buildsContentEveryTime(self):
+    self._Respond(None)
+    r = self._Respond(None)
+    self.assertIsNone(r.headers.get('ETag'))
+    self.assertEqual(self.num_calls, 2)
+
+
+class RespondStreamTest(tf.test.TestCase):
+
+  def _Request(self, headers=None, method='GET'):
+    return wrappers.Request(
+        wtest.EnvironBuilder(headers=headers, method=method).get_environ())
+
+  def testJsonArrayChunks_matchJsonDumps(self):
+    for rows in ([], [[1, 2]], [[i, float('nan')] for i in range(10)]):
+      chunks = list(http_util.JsonArrayChunks(rows, rows_per_chunk=3))
+      self.assertEqual(''.join(chunks),
+                       json.dumps(json_util.Cleanse(rows)))
+    self.assertEqual(
+        len(list(http_util.JsonArrayChunks(range(10), rows_per_chunk=3))), 5)
+
+  def testJsonArrayChunks_consumeRowsLazily(self):
+    consumed = []
+
+    def Rows():
+      for i in range(10):
+        consumed.append(i)
+        yield i
+
+    chunks = http_util.JsonArrayChunks(Rows(), rows_per_chunk=4)
+    next(chunks)
+    self.assertEqual(consumed, [0, 1, 2, 3])
+
+  def testLazyItems_onlyCallsItemsFnWhenIterated(self):
+    calls = []
+
+    def Items():
+      calls.append(None)
+      return [1, 2, 3]
+
+    items = http_util.LazyItems(Items)
+    self.assertEqual(calls, [])
+    self.assertEqual(list(items), [1, 2, 3])
+    self.assertEqual(len(calls), 1)
+
+  def testStreamsWithoutContentLength(self):
+    rows = [[i, i * 2] for i in range(1000)]
+    r = http_util.RespondStream(
+        self._Request(), http_util.JsonArrayChunks(rows, rows_per_chunk=10),
+        'application/json', etag=http_util.ETag(1))
+    self.assertEqual(r.status_code, 200)
+    self.assertIsNone(r.headers.get('Content-Length'))
+    self.assertEqual(r.headers.get('ETag'), http_util.ETag(1))
+    self.assertEqual(json.loads(r.get_data().decode('utf-8')), rows)
+
+  def testCompressesIncrementally(self):
+    content = ['line %d\n' % i for i in range(1000)]
+    r = http_util.RespondStream(
+        self._Request({'Accept-Encoding': 'gzip'}), content, 'text/plain')
+    self.assertEqual(r.headers.get('Content-Encoding'), 'gzip')
+    self.assertEqual(r.headers.get('Content-Type'), 'text/plain; charset=utf-8')
+    self.assertEqual(_gunzip(r.get_data()), ''.join(content).encode('utf-8'))
+
+  def testMatchingETag_doesNotConsumeChunks(self):
+    etag = http_util.ETag(1)
+
+    def Chunks():
+      self.fail('chunks were consumed')
+      yield ''
+
+    r = http_util.RespondStream(
+        self._Request({'If-None-Match': etag}), Chunks(), 'text/plain',
+        etag=etag)
+    self.assertEqual(r.status_code, 304)
+
+  def testHeadRequest_doesNotWrite(self):
+    r = http_util.RespondStream(
+        self._Request(method='HEAD'), ['hello'], 'text/plain')
+    self.assertEqual(r.get_data(), b'')
+
+
+class ResponseCacheTest(tf.test.TestCase):
+
+  def testEvictsLeastRecentlyUsed(self):
+    cache = http_util.ResponseCache(max_bytes=10)
+    cache.Get('a', lambda: (b'aaaa', 'text/plain', None))
+    cache.Get('b', lambda: (b'bbbb', 'text/plain', None))
+    cache.Get('a', lambda: self.fail('a was evicted'))
+    cache.Get('c', lambda: (b'cccc', 'text/plain', None))
+    self.assertEqual(cache.NumBytes(), 8)
+    cache.Get('a', lambda: self.fail('a was evicted'))
+    self.assertEqual(cache.Get('b', lambda: (b'BB', 'text/plain', None))[0],
+                     b'BB')
+
+  def testDoesNotKeepLargeContent(self):
+    cache = http_util.ResponseCache(max_bytes=10)
+    cache.Get('a', lambda: (b'a' * 11, 'text/plain', None))
+    self.assertEqual(cache.NumBytes(), 0)
+
+  def testSetMaxBytes_dropsEntriesThatNoLongerFit(self):
+    cache = http_util.ResponseCache(max_bytes=10)
+    cache.Get('a', lambda: (b'aaaa', 'text/plain', None))
+    cache.Get('b', lambda: (b'bbbb', 'text/plain', None))
+    cache.SetMaxBytes(5)
+    self.assertEqual(cache.NumBytes(), 4)
+    cache.Get('b', lambda: self.fail('b was evicted'))
+    cache.SetMaxBytes(0)
+    self.assertEqual(cache.NumBytes(), 0)
+
+  def testConcurrentRequests_buildContentOnce(self):
+    cache = http_util.ResponseCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def Build():
+      calls.append(1)
+      started.set()
+      release.wait()
+      return (b'content', 'text/plain', None)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        cache.Get('key', Build))) for _ in range(4)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+      thread.start()
+    release.set()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(len(calls), 1)
+    self.assertEqual([r[0] for r in results], [b'content'] * 4)
+
 
 def _gunzip(bs):
   return gzip.GzipFile('', 'rb', 9, six.BytesIO(bs)).read()
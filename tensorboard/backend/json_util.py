@@ -27,14 +27,23 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import itertools
 import math
 
+import numpy as np
 import tensorflow as tf
 
 
 _INFINITY = float('inf')
 _NEGATIVE_INFINITY = float('-inf')
 
+# Shorter lists are cleansed element by element, since building a numpy array
+# for them costs more than it saves.
+_MIN_VECTORIZED_LENGTH = 16
+
+# The exact types of the values that numeric sequences may hold.
+_NUMERIC_TYPES = frozenset([bool, int, float])
+
 
 def Cleanse(obj, encoding='utf-8'):
   """Makes Python object appropriate for JSON serialization.
@@ -43,6 +52,11 @@ def Cleanse(obj, encoding='utf-8'):
   - Turns byte strings into unicode strings.
   - Turns sets into sorted lists.
   - Turns tuples into lists.
+  - Turns numpy arrays and scalars into lists and Python numbers.
+
+  Long lists of numbers, or of tuples of numbers such as `ScalarEvent`s, are
+  checked for non-finite values with numpy in one pass, and only the values
+  found are replaced.
 
   Args:
     obj: Python data structure.
@@ -54,21 +68,98 @@ def Cleanse(obj, encoding='utf-8'):
   if isinstance(obj, int):
     return obj
   elif isinstance(obj, float):
-    if obj == _INFINITY:
-      return 'Infinity'
-    elif obj == _NEGATIVE_INFINITY:
-      return '-Infinity'
-    elif math.isnan(obj):
-      return 'NaN'
-    else:
-      return obj
+    return _CleanseFloat(obj)
   elif isinstance(obj, bytes):
     return tf.compat.as_text(obj, encoding)
   elif isinstance(obj, list) or isinstance(obj, tuple):
+    if len(obj) >= _MIN_VECTORIZED_LENGTH and _IsNumericRow(obj[0]):
+      cleansed = _CleanseNumericSequence(obj)
+      if cleansed is not None:
+        return cleansed
     return [Cleanse(i, encoding) for i in obj]
+  elif isinstance(obj, np.ndarray):
+    return _CleanseArray(obj, encoding)
+  elif isinstance(obj, np.generic):
+    return Cleanse(obj.item(), encoding)
   elif isinstance(obj, set):
     return [Cleanse(i, encoding) for i in sorted(obj)]
   elif isinstance(obj, dict):
     return {Cleanse(k, encoding): Cleanse(v, encoding) for k, v in obj.items()}
   else:
     return obj
+
+
+def _CleanseFloat(value):
+  if value == _INFINITY:
+    return 'Infinity'
+  elif value == _NEGATIVE_INFINITY:
+    return '-Infinity'
+  elif math.isnan(value):
+    return 'NaN'
+  else:
+    return value
+
+
+def _IsNumericRow(obj):
+  """Returns whether obj is a number, or a flat list or tuple of numbers."""
+  if type(obj) in _NUMERIC_TYPES:
+    return True
+  if isinstance(obj, (list, tuple)):
+    return all(type(value) in _NUMERIC_TYPES for value in obj)
+  return False
+
+
+def _CleanseNumericSequence(obj):
+  """Cleanses a list of numbers, or of equally long rows of numbers.
+
+  The values are checked and converted to a numpy array by C loops, so that
+  the only per-row work done in Python is copying the rows into lists.
+
+  Args:
+    obj: A list or tuple, whose first item passes `_IsNumericRow`.
+
+  Returns:
+    The cleansed list, or None if obj turned out not to be homogeneous.
+  """
+  if type(obj[0]) in _NUMERIC_TYPES:
+    row_length = None
+    values = obj
+  else:
+    row_lengths = set(map(len, obj))
+    if len(row_lengths) != 1:
+      return None
+    row_length = row_lengths.pop()
+    values = list(itertools.chain.from_iterable(obj))
+  if not set(map(type, values)) <= _NUMERIC_TYPES:
+    return None
+  try:
+    values = np.fromiter(values, dtype=np.float64, count=len(values))
+  except OverflowError:
+    return None
+
+  if row_length is None:
+    cleansed = list(obj)
+  else:
+    cleansed = list(map(list, obj))
+  for index in np.flatnonzero(~np.isfinite(values)).tolist():
+    if row_length is None:
+      cleansed[index] = _CleanseFloat(cleansed[index])
+    else:
+      row = cleansed[index // row_length]
+      row[index % row_length] = _CleanseFloat(row[index % row_length])
+  return cleansed
+
+
+def _CleanseArray(array, encoding):
+  """Cleanses a numpy array of any shape into nested lists."""
+  if array.dtype.kind in 'biu':
+    return array.tolist()
+  if array.dtype.kind != 'f':
+    return Cleanse(array.tolist(), encoding)
+  if np.isfinite(array).all():
+    return array.tolist()
+  cleansed = array.astype(object)
+  cleansed[np.isnan(array)] = 'NaN'
+  cleansed[array == _INFINITY] = 'Infinity'
+  cleansed[array == _NEGATIVE_INFINITY] = '-Infinity'
+  return cleansed.tolist()
@@ -0,0 +1,124 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmarks json_util.Cleanse against a purely recursive implementation.
+
+Both implementations cleanse the same payloads, shaped like the responses of
+the scalars and histograms routes, so the reported wall times are directly
+comparable. Run with:
+
+  bazel run //tensorboard/backend:json_util_benchmark -- --benchmarks=.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import math
+import time
+
+from six.moves import xrange  # pylint: disable=redefined-builtin
+import tensorflow as tf
+
+from tensorboard.backend import json_util
+
+_NUM_SCALARS = 1000000
+_NUM_HISTOGRAMS = 1000
+_NUM_BUCKETS = 500
+
+_ScalarEvent = collections.namedtuple(
+    '_ScalarEvent', ['wall_time', 'step', 'value'])
+_HistogramValue = collections.namedtuple(
+    '_HistogramValue',
+    ['min', 'max', 'num', 'sum', 'sum_squares', 'bucket_limit', 'bucket'])
+_HistogramEvent = collections.namedtuple(
+    '_HistogramEvent', ['wall_time', 'step', 'histogram_value'])
+
+
+def _RecursiveCleanse(obj, encoding='utf-8'):
+  """json_util.Cleanse as it was before numeric sequences were vectorized."""
+  if isinstance(obj, int):
+    return obj
+  elif isinstance(obj, float):
+    if obj == float('inf'):
+      return 'Infinity'
+    elif obj == float('-inf'):
+      return '-Infinity'
+    elif math.isnan(obj):
+      return 'NaN'
+    else:
+      return obj
+  elif isinstance(obj, bytes):
+    return tf.compat.as_text(obj, encoding)
+  elif isinstance(obj, list) or isinstance(obj, tuple):
+    return [_RecursiveCleanse(i, encoding) for i in obj]
+  elif isinstance(obj, set):
+    return [_RecursiveCleanse(i, encoding) for i in sorted(obj)]
+  elif isinstance(obj, dict):
+    return {_RecursiveCleanse(k, encoding): _RecursiveCleanse(v, encoding)
+            for k, v in obj.items()}
+  else:
+    return obj
+
+
+def _Scalars(nan_every=None):
+  """Returns a list of `_ScalarEvent`s, with a NaN value every so often."""
+  events = []
+  for i in xrange(_NUM_SCALARS):
+    value = float('nan') if nan_every and i % nan_every == 0 else 1.0 / (i + 1)
+    events.append(_ScalarEvent(1500000000.0 + i, i, value))
+  return events
+
+
+def _Histograms():
+  """Returns a list of `_HistogramEvent`s whose last bucket limit is inf."""
+  bucket_limit = [1.1 ** i for i in xrange(_NUM_BUCKETS - 1)] + [float('inf')]
+  bucket = [float(i % 7) for i in xrange(_NUM_BUCKETS)]
+  return [
+      _HistogramEvent(1500000000.0 + i, i, _HistogramValue(
+          0.0, 1.0, 100.0, 50.0, 25.0, list(bucket_limit), list(bucket)))
+      for i in xrange(_NUM_HISTOGRAMS)
+  ]
+
+
+class CleanseBenchmark(tf.test.Benchmark):
+
+  def _Benchmark(self, name, payload, iters=3):
+    expected = _RecursiveCleanse(payload)
+    for cleanse_name, cleanse in (('recursive', _RecursiveCleanse),
+                                  ('vectorized', json_util.Cleanse)):
+      wall_times = []
+      for _ in xrange(iters):
+        start = time.time()
+        cleansed = cleanse(payload)
+        wall_times.append(time.time() - start)
+      assert repr(cleansed) == repr(expected), cleanse_name
+      self.report_benchmark(
+          iters=iters,
+          wall_time=min(wall_times),
+          name='%s_%s' % (name, cleanse_name))
+
+  def benchmarkFiniteScalars(self):
+    self._Benchmark('finite_scalars', _Scalars())
+
+  def benchmarkScalarsWithNaNs(self):
+    self._Benchmark('scalars_with_nans', _Scalars(nan_every=100))
+
+  def benchmarkHistograms(self):
+    self._Benchmark('histograms', _Histograms())
+
+
+if __name__ == '__main__':
+  tf.test.main()
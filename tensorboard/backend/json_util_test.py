@@ -17,8 +17,10 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-import tensorflow as tf
+import collections
 
+import numpy as np
+import tensorflow as tf
 
 from tensorboard.backend import json_util
 
@@ -62,5 +64,50 @@ class FloatWrapperTest(tf.test.TestCase):
     self.assertEqual(json_util.Cleanse(b'\xc2\xa3'), u'\u00a3')  # is # sterling
 
 
+class VectorizedCleanseTest(tf.test.TestCase):
+
+  def testLongListOfFloats(self):
+    values = [float(i) for i in range(100)]
+    values[3] = _INFINITY
+    values[50] = -_INFINITY
+    values[99] = float('nan')
+    expected = [float(i) for i in range(100)]
+    expected[3] = 'Infinity'
+    expected[50] = '-Infinity'
+    expected[99] = 'NaN'
+    self.assertEqual(json_util.Cleanse(values), expected)
+    self.assertEqual(json_util.Cleanse(tuple(values)), expected)
+
+  def testLongListOfRows_keepsIntegers(self):
+    ScalarEvent = collections.namedtuple(  # pylint: disable=invalid-name
+        'ScalarEvent', ['wall_time', 'step', 'value'])
+    events = [ScalarEvent(1.5, i, i / 2) for i in range(100)]
+    events[7] = ScalarEvent(1.5, 7, float('nan'))
+    cleansed = json_util.Cleanse(events)
+    self.assertEqual(cleansed[7], [1.5, 7, 'NaN'])
+    self.assertEqual(cleansed[8], [1.5, 8, 4.0])
+    self.assertIsInstance(cleansed[8][1], int)
+    self.assertIsInstance(cleansed[8], list)
+
+  def testMixedLists_fallBackToRecursion(self):
+    values = [1.0] * 20 + [b'\xc2\xa3', _INFINITY]
+    self.assertEqual(json_util.Cleanse(values),
+                     [1.0] * 20 + [u'\u00a3', 'Infinity'])
+    ragged = [[1.0, 2.0]] * 20 + [[_INFINITY]]
+    self.assertEqual(json_util.Cleanse(ragged),
+                     [[1.0, 2.0]] * 20 + [['Infinity']])
+
+  def testNumpyArrays(self):
+    array = np.array([[1.0, np.nan], [np.inf, -np.inf]], dtype=np.float32)
+    self.assertEqual(json_util.Cleanse(array),
+                     [[1.0, 'NaN'], ['Infinity', '-Infinity']])
+    self.assertEqual(json_util.Cleanse(np.arange(3)), [0, 1, 2])
+    self.assertEqual(json_util.Cleanse(np.array([b'a'])), [u'a'])
+
+  def testNumpyScalars(self):
+    self.assertEqual(json_util.Cleanse(np.float32(np.nan)), 'NaN')
+    self.assertIsInstance(json_util.Cleanse(np.int64(3)), int)
+
+
 if __name__ == '__main__':
   tf.test.main()
@@ -30,7 +30,9 @@ import tensorflow as tf
 from werkzeug import serving
 
 from tensorboard.backend import application
+from tensorboard.backend import http_util
 from tensorboard.backend.event_processing import event_file_inspector as efi
+from tensorboard.backend.event_processing import event_multiplexer
 from tensorboard.plugins.audio import audio_plugin
 from tensorboard.plugins.core import core_plugin
 from tensorboard.plugins.distributions import distributions_plugin
@@ -72,6 +74,82 @@ tf.flags.DEFINE_integer('reload_interval', 5,
                         'How often the backend should load '
                         'more data.')
 
+tf.flags.DEFINE_integer(
+    'max_reload_threads', 1, 'How many runs the backend should reload '
+    'concurrently. The time each reload takes is logged, which helps to size '
+    'this for logdirs with many runs.')
+
+tf.flags.DEFINE_string(
+    'record_reader', 'pywrap', 'How event files are read: "pywrap" reads one '
+    'record at a time through TensorFlow, "buffered" reads large blocks and '
+    'frames the records in Python, and "mmap" memory-maps local event files '
+    'and reads remote ones like "buffered".')
+
+tf.flags.DEFINE_boolean(
+    'payload_views', False, 'Whether image and audio data is kept as views '
+    'into the records it was read from rather than copied. With '
+    '--record_reader=mmap, it then stays in the page cache instead of the '
+    'Python heap. Cannot be combined with --decode_processes.')
+
+tf.flags.DEFINE_integer(
+    'decode_processes', 0, 'If positive, event files are read and parsed in '
+    'this many worker processes, which keeps the server responsive while '
+    'large logdirs load. Scalar summaries are sent back in compact batches.')
+
+tf.flags.DEFINE_integer(
+    'max_payload_bytes_per_tag', 0, 'If positive, the most bytes of image, '
+    'audio or tensor data kept for each tag, in addition to the item counts '
+    'of the size guidance. Samples stay unbiased but hold fewer items when '
+    'the items are large.')
+
+tf.flags.DEFINE_integer(
+    'max_payload_bytes_per_run', 0, 'If positive, the most bytes of image, '
+    'audio and tensor data kept for each run. Tags using the most bytes give '
+    'up items first.')
+
+tf.flags.DEFINE_integer(
+    'max_memory_bytes', 0, 'If positive, an estimate of the most bytes of '
+    'memory all runs may hold together. The runs viewed least recently shed '
+    'their distributions and images first, then are unloaded entirely, and '
+    'are loaded again when they are next viewed.')
+
+tf.flags.DEFINE_integer(
+    'max_resident_runs', 0, 'If positive, runs are only indexed until they '
+    'are first viewed, and only this many runs, the ones viewed most '
+    'recently, stay loaded. Useful for logdirs with many more runs than '
+    'anyone looks at.')
+
+tf.flags.DEFINE_integer(
+    'stale_run_secs', 0, 'If positive, runs that nobody viewed for this many '
+    'seconds are stale. Runs viewed more recently are reloaded first, and '
+    'stale runs only every --stale_run_reload_secs seconds.')
+
+tf.flags.DEFINE_integer(
+    'stale_run_reload_secs', event_multiplexer.DEFAULT_STALE_RUN_RELOAD_SECS,
+    'How often, in seconds, runs are reloaded once they are stale. See '
+    '--stale_run_secs.')
+
+tf.flags.DEFINE_integer(
+    'max_reload_interval', 60, 'Runs are reloaded every --reload_interval '
+    'seconds while they are written to. Runs that are not are reloaded less '
+    'and less often, down to once every this many seconds.')
+
+tf.flags.DEFINE_integer(
+    'discovery_interval', 0, 'How often, in seconds, to look for new runs in '
+    'the logdir. Defaults to --reload_interval.')
+
+tf.flags.DEFINE_boolean(
+    'watch_changes', False, 'Whether to watch a local logdir for changes '
+    'with inotify, where supported, so that runs are reloaded as soon as they '
+    'are written to and the logdir is only searched for runs again after '
+    'directories or event files are added. Falls back to polling otherwise.')
+
+tf.flags.DEFINE_integer(
+    'response_cache_bytes', http_util.DEFAULT_RESPONSE_CACHE_BYTES,
+    'The most bytes of encoded and compressed responses kept in memory, so '
+    'that repeated requests for data that did not change are answered '
+    'without serializing it again. 0 disables the cache.')
+
 # Inspect Mode flags
 
 tf.flags.DEFINE_boolean('inspect', False, """Use this flag to print out a digest
@@ -119,7 +197,21 @@ def create_tb_app(plugins):
       logdir=logdir,
       purge_orphaned_data=FLAGS.purge_orphaned_data,
       reload_interval=FLAGS.reload_interval,
-      plugins=plugins)
+      plugins=plugins,
+      max_reload_threads=FLAGS.max_reload_threads,
+      record_reader=FLAGS.record_reader,
+      payload_views=FLAGS.payload_views,
+      decode_processes=FLAGS.decode_processes,
+      max_payload_bytes_per_tag=FLAGS.max_payload_bytes_per_tag,
+      max_payload_bytes_per_run=FLAGS.max_payload_bytes_per_run,
+      max_memory_bytes=FLAGS.max_memory_bytes,
+      max_resident_runs=FLAGS.max_resident_runs,
+      stale_run_secs=FLAGS.stale_run_secs,
+      stale_run_reload_secs=FLAGS.stale_run_reload_secs,
+      max_reload_interval=FLAGS.max_reload_interval,
+      discovery_interval=FLAGS.discovery_interval,
+      watch_changes=FLAGS.watch_changes,
+      response_cache_bytes=FLAGS.response_cache_bytes)
 
 
 def make_simple_server(tb_app, host, port):
@@ -50,14 +50,11 @@ class AudioPlugin(base_plugin.TBPlugin):
 
   def is_active(self):
     """The audio plugin is active iff any run has at least one relevant tag."""
-    return bool(self._multiplexer) and any(self._index_impl().values())
+    return (bool(self._multiplexer) and
+            self._multiplexer.HasTags(event_accumulator.AUDIO))
 
   def _index_impl(self):
-    return {
-        run_name: run_data[event_accumulator.AUDIO]
-        for (run_name, run_data) in self._multiplexer.Runs().items()
-        if event_accumulator.AUDIO in run_data
-    }
+    return self._multiplexer.RunTagIndex(event_accumulator.AUDIO)
 
   @wrappers.Request.application
   def _serve_audio_metadata(self, request):
@@ -133,8 +130,12 @@ class AudioPlugin(base_plugin.TBPlugin):
     run = request.args.get('run')
     index = int(request.args.get('index'))
     audio = self._multiplexer.Audio(run, tag)[index]
+    encoded_audio_string = audio.encoded_audio_string
+    if isinstance(encoded_audio_string, memoryview):
+      # The accumulator may keep payloads as views into the event file.
+      encoded_audio_string = encoded_audio_string.tobytes()
     return http_util.Respond(
-        request, audio.encoded_audio_string, audio.content_type)
+        request, encoded_audio_string, audio.content_type)
 
   @wrappers.Request.application
   def _serve_tags(self, request):
@@ -48,6 +48,7 @@ class CorePlugin(base_plugin.TBPlugin):
     self._logdir = context.logdir
     self._multiplexer = context.multiplexer
     self._assets_zip_provider = context.assets_zip_provider
+    self._assets = {}
 
   def is_active(self):
     return True
@@ -68,6 +69,11 @@ class CorePlugin(base_plugin.TBPlugin):
         with zipfile.ZipFile(fp) as zip_:
           for info in zip_.infolist():
             path = info.filename
+            # Assets never change, so they are compressed once, up front.
+            mimetype = (mimetypes.guess_type(path)[0] or
+                        'application/octet-stream')
+            self._assets[path] = http_util.Precompress(
+                zip_.read(path), mimetype)
             apps['/' + path] = functools.partial(self._serve_asset, path)
     return apps
 
@@ -78,12 +84,8 @@ class CorePlugin(base_plugin.TBPlugin):
   @wrappers.Request.application
   def _serve_asset(self, path, request):
     """Serves a static asset from the zip file."""
-    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
-    with self._assets_zip_provider() as fp:
-      with zipfile.ZipFile(fp) as zip_:
-        with zip_.open(path) as file_:
-          html = file_.read()
-    return http_util.Respond(request, html, mimetype, expires=3600)
+    return http_util.RespondPrecompressed(
+        request, self._assets[path], expires=3600)
 
   @wrappers.Request.application
   def _serve_logdir(self, request):
@@ -19,10 +19,12 @@ from __future__ import division
 from __future__ import print_function
 
 import collections
+import gzip
 import json
 import os
 import shutil
 
+import six
 import tensorflow as tf
 from werkzeug import test as werkzeug_test
 from werkzeug import wrappers
@@ -78,6 +80,13 @@ class CorePluginTest(tf.test.TestCase):
     response = self.server.get('/')
     self.assertNotEqual('0', response.headers.get('Expires'))
 
+  def testIndex_isPrecompressed(self):
+    """Test that assets are served compressed to browsers that accept it."""
+    response = self.server.get('/', headers={'Accept-Encoding': 'gzip'})
+    self.assertEqual('gzip', response.headers.get('Content-Encoding'))
+    html = gzip.GzipFile(fileobj=six.BytesIO(response.get_data())).read()
+    self.assertStartsWith(html, b'<!doctype html>')
+
   def testLogdir(self):
     """Test the format of the data/logdir endpoint."""
     parsed_object = self._get_json('/data/logdir')
@@ -18,14 +18,27 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import itertools
+
+import numpy as np
 from werkzeug import wrappers
 
+from tensorboard.backend import column_format
 from tensorboard.backend import http_util
 from tensorboard.backend.event_processing import event_accumulator
 from tensorboard.plugins import base_plugin
 
 _PLUGIN_PREFIX_ROUTE = event_accumulator.COMPRESSED_HISTOGRAMS
 
+# Responses with more events than this are streamed, rather than serialized
+# and cached whole, to bound the memory used by a request. Streamed responses
+# still carry an entity tag, but bypass the response and gzip caches of
+# `http_util`.
+_MAX_BUFFERED_EVENTS = 1000
+
+# The number of events serialized at once when streaming.
+_EVENTS_PER_CHUNK = 64
+
 
 class DistributionsPlugin(base_plugin.TBPlugin):
   """Distributions Plugin for TensorBoard."""
@@ -48,20 +61,48 @@ class DistributionsPlugin(base_plugin.TBPlugin):
 
   def is_active(self):
     """This plugin is active iff any run has at least one relevant tag."""
-    return bool(self._multiplexer) and any(self.index_impl().values())
+    return (bool(self._multiplexer) and
+            self._multiplexer.HasTags(event_accumulator.COMPRESSED_HISTOGRAMS))
 
   def index_impl(self):
-    return {
-        run_name: run_data[event_accumulator.COMPRESSED_HISTOGRAMS]
-        for (run_name, run_data) in self._multiplexer.Runs().items()
-        if event_accumulator.COMPRESSED_HISTOGRAMS in run_data
-    }
+    return self._multiplexer.RunTagIndex(
+        event_accumulator.COMPRESSED_HISTOGRAMS)
 
   def distributions_impl(self, tag, run):
     """Result of the form `(body, mime_type)`."""
     values = self._multiplexer.CompressedHistograms(run, tag)
     return (values, 'application/json')
 
+  def distributions_columns_impl(self, tag, run):
+    """Result of the form `(body, mime_type)`, in `column_format`.
+
+    The compressed values of all histograms are concatenated into the
+    `basis_point` and `value` columns, and `num_values` holds the number of
+    values of each histogram.
+    """
+    events = self._multiplexer.CompressedHistograms(run, tag)
+    values = [event.compressed_histogram_values for event in events]
+    body = column_format.Serialize([
+        ('wall_time', column_format.Column(events, 'wall_time', np.float64)),
+        ('step', column_format.Column(events, 'step', np.int64)),
+        ('num_values', np.array([len(v) for v in values], dtype=np.int64)),
+        ('basis_point', column_format.Column(
+            itertools.chain.from_iterable(values), 'basis_point', np.int64)),
+        ('value', column_format.Column(
+            itertools.chain.from_iterable(values), 'value', np.float64)),
+    ])
+    return (body, column_format.MIME_TYPE)
+
+  def distributions_stream_impl(self, tag, run):
+    """Result of the form `(chunks, mime_type)`, for `RespondStream`.
+
+    The events are only read once the chunks are iterated.
+    """
+    events = http_util.LazyItems(
+        lambda: self._multiplexer.CompressedHistograms(run, tag))
+    chunks = http_util.JsonArrayChunks(events, rows_per_chunk=_EVENTS_PER_CHUNK)
+    return (chunks, 'application/json')
+
   @wrappers.Request.application
   def tags_route(self, request):
     index = self.index_impl()
@@ -72,5 +113,28 @@ class DistributionsPlugin(base_plugin.TBPlugin):
     """Given a tag and single run, return array of compressed histograms."""
     tag = request.args.get('tag')
     run = request.args.get('run')
-    (body, mime_type) = self.distributions_impl(tag, run)
-    return http_util.Respond(request, body, mime_type)
+    accept_variant = column_format.Negotiate(request, 'application/json')
+    use_columns = accept_variant == column_format.MIME_TYPE
+    try:
+      # JSON and columns are served at the same URL, so their tags differ.
+      etag = http_util.ETag(use_columns, *self._multiplexer.Generation(
+          run, event_accumulator.COMPRESSED_HISTOGRAMS, tag))
+    except KeyError:
+      etag = None
+    not_modified = http_util.NotModified(request, etag, accept_variant)
+    if not_modified is not None:
+      return not_modified
+    if use_columns:
+      return http_util.RespondWithETag(
+          request, etag, lambda: self.distributions_columns_impl(tag, run),
+          accept_variant=accept_variant)
+    if etag is not None:
+      num_events = self._multiplexer.NumItems(
+          run, event_accumulator.COMPRESSED_HISTOGRAMS, tag)
+      if num_events > _MAX_BUFFERED_EVENTS:
+        (chunks, mime_type) = self.distributions_stream_impl(tag, run)
+        return http_util.RespondStream(request, chunks, mime_type, etag=etag,
+                                       accept_variant=accept_variant)
+    return http_util.RespondWithETag(
+        request, etag, lambda: self.distributions_impl(tag, run),
+        accept_variant=accept_variant)
@@ -25,6 +25,7 @@ import os.path
 from six.moves import xrange  # pylint: disable=redefined-builtin
 import tensorflow as tf
 
+from tensorboard.backend import column_format
 from tensorboard.backend.event_processing import event_accumulator
 from tensorboard.backend.event_processing import event_multiplexer
 from tensorboard.plugins import base_plugin
@@ -110,6 +111,24 @@ class DistributionsPluginTest(tf.test.TestCase):
         self.plugin.distributions_impl(
             self._DISTRIBUTION_TAG, run_name)
 
+  def test_distributions_columns(self):
+    self.set_up_with_runs([self._RUN_WITH_DISTRIBUTION])
+    (data, _) = self.plugin.distributions_impl(
+        self._DISTRIBUTION_TAG, self._RUN_WITH_DISTRIBUTION)
+    (body, mime_type) = self.plugin.distributions_columns_impl(
+        self._DISTRIBUTION_TAG, self._RUN_WITH_DISTRIBUTION)
+    self.assertEqual(column_format.MIME_TYPE, mime_type)
+    columns = column_format.Parse(body)
+    self.assertAllEqual(columns['step'], [frame.step for frame in data])
+    values = [value for frame in data
+              for value in frame.compressed_histogram_values]
+    self.assertAllEqual(columns['num_values'],
+                        [len(frame.compressed_histogram_values)
+                         for frame in data])
+    self.assertAllEqual(columns['basis_point'],
+                        [value.basis_point for value in values])
+    self.assertAllEqual(columns['value'], [value.value for value in values])
+
   def test_distributions_json_with_scalars(self):
     self._test_distributions_json(self._RUN_WITH_DISTRIBUTION, True)
 
@@ -51,21 +51,19 @@ class GraphsPlugin(base_plugin.TBPlugin):
 
   def is_active(self):
     """The graphs plugin is active iff any run has a graph."""
-    return bool(self._multiplexer and self.index_impl())
+    return bool(self._multiplexer and
+                self._multiplexer.HasTags(event_accumulator.GRAPH))
 
   def index_impl(self):
     """Returns a list of all runs that have a graph."""
     return [run_name
-            for (run_name, run_data) in self._multiplexer.Runs().items()
-            if run_data.get(event_accumulator.GRAPH)]
+            for (run_name, has_graph) in self._multiplexer.RunTagIndex(
+                event_accumulator.GRAPH).items()
+            if has_graph]
 
   def run_metadata_index_impl(self):
     """Returns a run-to-tag mapping for metadata."""
-    return {
-        run_name: run_data[event_accumulator.RUN_METADATA]
-        for (run_name, run_data) in self._multiplexer.Runs().items()
-        if event_accumulator.RUN_METADATA in run_data
-    }
+    return self._multiplexer.RunTagIndex(event_accumulator.RUN_METADATA)
 
   def graph_impl(self, run, limit_attr_size=None, large_attrs_key=None):
     """Result of the form `(body, mime_type)`, or `None` if no graph exists."""
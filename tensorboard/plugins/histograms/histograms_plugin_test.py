@@ -20,11 +20,13 @@ from __future__ import division
 from __future__ import print_function
 
 import collections
+import json
 import os.path
 
 from six.moves import xrange  # pylint: disable=redefined-builtin
 import tensorflow as tf
 
+from tensorboard.backend import column_format
 from tensorboard.backend.event_processing import event_accumulator
 from tensorboard.backend.event_processing import event_multiplexer
 from tensorboard.plugins import base_plugin
@@ -113,6 +115,38 @@ class HistogramsPluginTest(tf.test.TestCase):
       with self.assertRaises(KeyError):
         self.plugin.histograms_impl(self._HISTOGRAM_TAG, run_name)
 
+  def test_histograms_columns(self):
+    self.set_up_with_runs([self._RUN_WITH_HISTOGRAM])
+    (data, _) = self.plugin.histograms_impl(self._HISTOGRAM_TAG,
+                                            self._RUN_WITH_HISTOGRAM)
+    (body, mime_type) = self.plugin.histograms_columns_impl(
+        self._HISTOGRAM_TAG, self._RUN_WITH_HISTOGRAM)
+    self.assertEqual(column_format.MIME_TYPE, mime_type)
+    columns = column_format.Parse(body)
+    self.assertAllEqual(columns['step'], [frame.step for frame in data])
+    self.assertAllEqual(columns['min'],
+                        [frame.histogram_value.min for frame in data])
+    self.assertAllEqual(columns['num_buckets'],
+                        [len(frame.histogram_value.bucket) for frame in data])
+    self.assertAllEqual(
+        columns['bucket'],
+        [x for frame in data for x in frame.histogram_value.bucket])
+
+  def test_histograms_stream_matches_histograms(self):
+    self.set_up_with_runs([self._RUN_WITH_HISTOGRAM])
+    (data, _) = self.plugin.histograms_impl(self._HISTOGRAM_TAG,
+                                            self._RUN_WITH_HISTOGRAM)
+    (chunks, mime_type) = self.plugin.histograms_stream_impl(
+        self._HISTOGRAM_TAG, self._RUN_WITH_HISTOGRAM)
+    self.assertEqual('application/json', mime_type)
+    self.assertEqual(json.loads(''.join(chunks)),
+                     json.loads(json.dumps(data)))
+    self.assertEqual(
+        self.plugin._multiplexer.NumItems(self._RUN_WITH_HISTOGRAM,
+                                          event_accumulator.HISTOGRAMS,
+                                          self._HISTOGRAM_TAG),
+        len(data))
+
   def test_histograms_with_scalars(self):
     self._test_histograms(self._RUN_WITH_HISTOGRAM, True)
 
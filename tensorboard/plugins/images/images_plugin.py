@@ -61,14 +61,11 @@ class ImagesPlugin(base_plugin.TBPlugin):
 
   def is_active(self):
     """The images plugin is active iff any run has at least one relevant tag."""
-    return bool(self._multiplexer) and any(self._index_impl().values())
+    return (bool(self._multiplexer) and
+            self._multiplexer.HasTags(event_accumulator.IMAGES))
 
   def _index_impl(self):
-    return {
-        run_name: run_data[event_accumulator.IMAGES]
-        for (run_name, run_data) in self._multiplexer.Runs().items()
-        if event_accumulator.IMAGES in run_data
-    }
+    return self._multiplexer.RunTagIndex(event_accumulator.IMAGES)
 
   @wrappers.Request.application
   def _serve_image_metadata(self, request):
@@ -147,9 +144,13 @@ class ImagesPlugin(base_plugin.TBPlugin):
     run = request.args.get('run')
     index = int(request.args.get('index'))
     image = self._multiplexer.Images(run, tag)[index]
-    image_type = imghdr.what(None, image.encoded_image_string)
+    encoded_image_string = image.encoded_image_string
+    if isinstance(encoded_image_string, memoryview):
+      # The accumulator may keep payloads as views into the event file.
+      encoded_image_string = encoded_image_string.tobytes()
+    image_type = imghdr.what(None, encoded_image_string)
     content_type = _IMGHDR_TO_MIMETYPE.get(image_type, _DEFAULT_IMAGE_MIMETYPE)
-    return http_util.Respond(request, image.encoded_image_string, content_type)
+    return http_util.Respond(request, encoded_image_string, content_type)
 
   @wrappers.Request.application
   def _serve_tags(self, request):
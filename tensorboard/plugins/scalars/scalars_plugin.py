@@ -19,16 +19,26 @@ from __future__ import division
 from __future__ import print_function
 
 import csv
+import itertools
 
 from six import StringIO
 from werkzeug import wrappers
 
+from tensorboard.backend import column_format
 from tensorboard.backend import http_util
 from tensorboard.backend.event_processing import event_accumulator
 from tensorboard.plugins import base_plugin
 
 _PLUGIN_PREFIX_ROUTE = event_accumulator.SCALARS
 
+# Series with more points than this are streamed, rather than serialized and
+# cached whole, to bound the memory used by a request. Streamed responses still
+# carry an entity tag, but bypass the response and gzip caches of `http_util`.
+_MAX_BUFFERED_POINTS = 100000
+
+# The number of points converted to Python objects at once when streaming.
+_POINTS_PER_CHUNK = 4096
+
 
 class OutputFormat(object):
   """An enum used to list the valid output formats for API calls."""
@@ -57,14 +67,11 @@ class ScalarsPlugin(base_plugin.TBPlugin):
 
   def is_active(self):
     """The scalars plugin is active iff any run has at least one scalar tag."""
-    return bool(self._multiplexer) and any(self.index_impl().values())
+    return (bool(self._multiplexer) and
+            self._multiplexer.HasTags(event_accumulator.SCALARS))
 
   def index_impl(self):
-    return {
-        run_name: run_data[event_accumulator.SCALARS]
-        for (run_name, run_data) in self._multiplexer.Runs().items()
-        if event_accumulator.SCALARS in run_data
-    }
+    return self._multiplexer.RunTagIndex(event_accumulator.SCALARS)
 
   def scalars_impl(self, tag, run, output_format):
     """Result of the form `(body, mime_type)`."""
@@ -78,6 +85,27 @@ class ScalarsPlugin(base_plugin.TBPlugin):
     else:
       return (values, 'application/json')
 
+  def scalars_columns_impl(self, tag, run):
+    """Result of the form `(body, mime_type)`, in `column_format`."""
+    columns = self._multiplexer.ScalarColumns(run, tag)
+    body = column_format.Serialize([
+        ('wall_time', columns.wall_times),
+        ('step', columns.steps),
+        ('value', columns.values),
+    ])
+    return (body, column_format.MIME_TYPE)
+
+  def scalars_stream_impl(self, tag, run, output_format):
+    """Result of the form `(chunks, mime_type)`, for `RespondStream`.
+
+    The scalars are only read once the chunks are iterated.
+    """
+    rows = _ScalarRows(self._multiplexer, run, tag)
+    if output_format == OutputFormat.CSV:
+      return (_CsvChunks(rows), 'text/csv')
+    else:
+      return (http_util.JsonArrayChunks(rows), 'application/json')
+
   @wrappers.Request.application
   def tags_route(self, request):
     index = self.index_impl()
@@ -90,5 +118,53 @@ class ScalarsPlugin(base_plugin.TBPlugin):
     tag = request.args.get('tag')
     run = request.args.get('run')
     output_format = request.args.get('format')
-    (body, mime_type) = self.scalars_impl(tag, run, output_format)
-    return http_util.Respond(request, body, mime_type)
+    # CSV is asked for in the URL, other formats with the Accept header.
+    accept_variant = None
+    if output_format != OutputFormat.CSV:
+      accept_variant = column_format.Negotiate(request, 'application/json')
+    use_columns = accept_variant == column_format.MIME_TYPE
+    try:
+      # JSON and columns are served at the same URL, so their tags differ.
+      etag = http_util.ETag(use_columns, *self._multiplexer.Generation(
+          run, event_accumulator.SCALARS, tag))
+    except KeyError:
+      etag = None
+    not_modified = http_util.NotModified(request, etag, accept_variant)
+    if not_modified is not None:
+      return not_modified
+    if use_columns:
+      return http_util.RespondWithETag(
+          request, etag, lambda: self.scalars_columns_impl(tag, run),
+          accept_variant=accept_variant)
+    if etag is not None:
+      num_points = self._multiplexer.NumItems(
+          run, event_accumulator.SCALARS, tag)
+      if num_points > _MAX_BUFFERED_POINTS:
+        (chunks, mime_type) = self.scalars_stream_impl(tag, run, output_format)
+        return http_util.RespondStream(request, chunks, mime_type, etag=etag,
+                                       accept_variant=accept_variant)
+    return http_util.RespondWithETag(
+        request, etag, lambda: self.scalars_impl(tag, run, output_format),
+        accept_variant=accept_variant)
+
+
+def _ScalarRows(multiplexer, run, tag):
+  """Yields the [wall_time, step, value] rows of the scalars of a tag."""
+  columns = multiplexer.ScalarColumns(run, tag)
+  for start in range(0, len(columns.steps), _POINTS_PER_CHUNK):
+    end = start + _POINTS_PER_CHUNK
+    for row in zip(columns.wall_times[start:end].tolist(),
+                   columns.steps[start:end].tolist(),
+                   columns.values[start:end].tolist()):
+      yield row
+
+
+def _CsvChunks(rows):
+  """Yields the lines of a CSV file of scalar rows, a batch at a time."""
+  rows = iter(rows)
+  batch = [['Wall time', 'Step', 'Value']]
+  while batch:
+    string_io = StringIO()
+    csv.writer(string_io).writerows(batch)
+    yield string_io.getvalue()
+    batch = list(itertools.islice(rows, _POINTS_PER_CHUNK))
@@ -21,12 +21,14 @@ from __future__ import print_function
 
 import collections
 import csv
+import json
 import os.path
 
 from six import StringIO
 from six.moves import xrange  # pylint: disable=redefined-builtin
 import tensorflow as tf
 
+from tensorboard.backend import column_format
 from tensorboard.backend.event_processing import event_multiplexer
 from tensorboard.plugins import base_plugin
 from tensorboard.plugins.scalars import scalars_plugin
@@ -123,6 +125,41 @@ class ScalarsPluginTest(tf.test.TestCase):
         self.plugin.scalars_impl(self._SCALAR_TAG, run_name,
                                  scalars_plugin.OutputFormat.CSV)
 
+  def test_scalars_stream_matches_scalars(self):
+    self.set_up_with_runs([self._RUN_WITH_SCALARS])
+    (data, _) = self.plugin.scalars_impl(
+        self._SCALAR_TAG, self._RUN_WITH_SCALARS,
+        scalars_plugin.OutputFormat.JSON)
+    (chunks, mime_type) = self.plugin.scalars_stream_impl(
+        self._SCALAR_TAG, self._RUN_WITH_SCALARS,
+        scalars_plugin.OutputFormat.JSON)
+    self.assertEqual('application/json', mime_type)
+    self.assertEqual(json.loads(''.join(chunks)),
+                     [list(event) for event in data])
+
+    (data, _) = self.plugin.scalars_impl(
+        self._SCALAR_TAG, self._RUN_WITH_SCALARS,
+        scalars_plugin.OutputFormat.CSV)
+    (chunks, mime_type) = self.plugin.scalars_stream_impl(
+        self._SCALAR_TAG, self._RUN_WITH_SCALARS,
+        scalars_plugin.OutputFormat.CSV)
+    self.assertEqual('text/csv', mime_type)
+    self.assertEqual(''.join(chunks), data)
+
+  def test_scalars_columns(self):
+    self.set_up_with_runs([self._RUN_WITH_SCALARS])
+    (data, _) = self.plugin.scalars_impl(
+        self._SCALAR_TAG, self._RUN_WITH_SCALARS,
+        scalars_plugin.OutputFormat.JSON)
+    (body, mime_type) = self.plugin.scalars_columns_impl(
+        self._SCALAR_TAG, self._RUN_WITH_SCALARS)
+    self.assertEqual(column_format.MIME_TYPE, mime_type)
+    columns = column_format.Parse(body)
+    self.assertEqual(list(columns), ['wall_time', 'step', 'value'])
+    self.assertAllEqual(columns['wall_time'], [e.wall_time for e in data])
+    self.assertAllEqual(columns['step'], [e.step for e in data])
+    self.assertAllEqual(columns['value'], [e.value for e in data])
+
   def test_scalars_json_with_scalars(self):
     self._test_scalars_json(self._RUN_WITH_SCALARS, True)
 